@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Zástupná služba net.hadess.SensorProxy pro vývoj a testy bez akcelerometru.
+# Standardně se registruje na session bus (OrientationClient(bus=SessionBus())),
+# s --system na systémový. Orientace se mění řádkem na stdin:
+#   normal | left-up | right-up | bottom-up
+import sys
+import time
+
+from gi.repository import GLib
+from pydbus import SessionBus, SystemBus
+from pydbus.generic import signal
+
+IFACE = "net.hadess.SensorProxy"
+
+
+class FakeSensorProxy:
+    """
+    <node>
+      <interface name="net.hadess.SensorProxy">
+        <method name="ClaimAccelerometer"/>
+        <method name="ReleaseAccelerometer"/>
+        <property name="HasAccelerometer" type="b" access="read"/>
+        <property name="AccelerometerOrientation" type="s" access="read"/>
+      </interface>
+    </node>
+    """
+    PropertiesChanged = signal()
+
+    def __init__(self):
+        self.orientation = "normal"
+        self.claims = 0
+
+    @property
+    def HasAccelerometer(self): return True
+
+    @property
+    def AccelerometerOrientation(self): return self.orientation
+
+    def ClaimAccelerometer(self):
+        self.claims += 1
+        print(f"claim ({self.claims})", flush=True)
+
+    def ReleaseAccelerometer(self):
+        self.claims = max(0, self.claims - 1)
+        print(f"release ({self.claims})", flush=True)
+
+    def set_orientation(self, orientation):
+        self.orientation = orientation
+        # Časová značka odeslání pro měření latence na straně klienta
+        print(f"{time.monotonic():.6f} orientation {orientation}", flush=True)
+        self.PropertiesChanged(IFACE, {"AccelerometerOrientation": orientation}, [])
+
+
+def main():
+    bus = SystemBus() if "--system" in sys.argv else SessionBus()
+    proxy = FakeSensorProxy()
+    bus.publish("net.hadess.SensorProxy", ("/net/hadess/SensorProxy", proxy))
+
+    def on_stdin(fd, condition):
+        line = sys.stdin.readline()
+        if not line:
+            loop.quit()
+            return False
+        if line.strip():
+            proxy.set_orientation(line.strip())
+        return True
+
+    loop = GLib.MainLoop()
+    GLib.io_add_watch(sys.stdin, GLib.IO_IN | GLib.IO_HUP, on_stdin)
+    loop.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,8 @@ echo "1. Extrahování řetězců..."
 
 # Vytvoření šablony (.pot)
 # Python soubory
-xgettext -L Python -k_ --from-code=UTF-8 -o "$PO_DIR/$DOMAIN.pot" "$SRC_DIR"/*.py
+xgettext -L Python -k_ --from-code=UTF-8 -o "$PO_DIR/$DOMAIN.pot" "$SRC_DIR"/*.py \
+    asus-screen-toggle/usr/lib/asus-screen-toggle/asus_screen_toggle/*.py
 
 # Bash soubory (připojíme k existující šabloně pomocí -j)
 xgettext -L Shell -k_ --from-code=UTF-8 -j -o "$PO_DIR/$DOMAIN.pot" "$SRC_DIR"/*.sh
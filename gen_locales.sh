@@ -3,7 +3,7 @@
 
 DOMAIN="asus-screen-toggle"
 LOCALE_DIR="po"
-FILES_PY="asus-screen-toggle/usr/bin/*.py"
+FILES_PY="asus-screen-toggle/usr/bin/*.py asus-screen-toggle/usr/lib/asus-screen-toggle/asus_screen_toggle/*.py"
 FILES_SH="asus-screen-toggle/usr/bin/*.sh"
 
 mkdir -p "$LOCALE_DIR"
@@ -1,9 +1,13 @@
 if [[ "${ENABLE_DBUS:-false}" == "true" ]]; then
-    if sudo -u "$user" DBUS_SESSION_BUS_ADDRESS="$dbus_address" \
-        dbus-send --session --print-reply --reply-timeout=1000 \
+    # Odpověď přijde až po aplikaci rozložení - úspěch je jen "boolean true"
+    # v první hodnotě odpovědi (ok), jinak se zkusí další kanál
+    if reply=$(sudo -u "$user" DBUS_SESSION_BUS_ADDRESS="$dbus_address" \
+        dbus-send --session --print-reply --reply-timeout=4000 \
         --dest=org.asus.ScreenToggle \
-        /org/asus/ScreenToggle org.asus.ScreenToggle.Trigger \
-        > /dev/null 2>&1; then
+        /org/asus/ScreenToggle org.asus.ScreenToggle.Wait.TriggerAndWait \
+        string:"$REASON" uint32:3000 \
+        2> /dev/null) && \
+        [[ "$(sed -n '2{s/^[[:space:]]*//;p;q}' <<< "$reply")" == "boolean true" ]]; then
         exit 0
     fi
 fi
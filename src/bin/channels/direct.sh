@@ -1,7 +1,7 @@
 if [[ "${ENABLE_DIRECT_CALL:-false}" == "true" ]]; then
 
     if [[ "$type" == "x11" ]]; then
-        display=$(loginctl show-session "$sid" -p Display --value)
+        [[ -n "$display" ]] || display=$(loginctl show-session "$sid" -p Display --value)
         xauth_file="/home/$user/.Xauthority"
         [[ -f "$xauth_file" ]] || return 1
 
@@ -12,11 +12,12 @@ if [[ "${ENABLE_DIRECT_CALL:-false}" == "true" ]]; then
                 XDG_CURRENT_DESKTOP="$desktop" \
                 XDG_RUNTIME_DIR="$runtime_path" \
                 DBUS_SESSION_BUS_ADDRESS="$dbus_address" \
+                ASUS_TRACE_REASON="$REASON" \
             "$USER_BIN"
     fi
 
     if [[ "$type" == "wayland" ]]; then
-        wayland_disp=$(loginctl show-session "$sid" -p WaylandDisplay --value)
+        [[ -n "$wayland_disp" ]] || wayland_disp=$(loginctl show-session "$sid" -p WaylandDisplay --value)
         [[ -z "$wayland_disp" ]] && wayland_disp="wayland-0"
 
         sudo -u "$user" \
@@ -26,6 +27,7 @@ if [[ "${ENABLE_DIRECT_CALL:-false}" == "true" ]]; then
                 XDG_CURRENT_DESKTOP="$desktop" \
                 XDG_RUNTIME_DIR="$runtime_path" \
                 DBUS_SESSION_BUS_ADDRESS="$dbus_address" \
+                ASUS_TRACE_REASON="$REASON" \
             "$USER_BIN"
     fi
 fi
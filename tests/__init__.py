@@ -0,0 +1,8 @@
+# Jednotkové testy čisté logiky sdíleného balíčku (bez GLib, D-Bus a displeje).
+#
+#   python3 -m unittest discover -s tests -t .     (nebo make test)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "usr", "lib",
+                                "asus-screen-toggle"))
@@ -0,0 +1,45 @@
+# Zástupné časovače a hodiny pro třídy s injektovatelným
+# `timer_add(ms, cb)` / `timer_remove(id)` / `clock()` (TriggerScheduler,
+# ReasonDebouncer, OrientationFilter) - čas běží jen přes advance().
+
+
+class FakeTimers:
+    def __init__(self):
+        self.now = 0.0
+        self._next_id = 1
+        self._timers = {}
+
+    def clock(self):
+        return self.now
+
+    def add(self, ms, callback):
+        timer_id = self._next_id
+        self._next_id += 1
+        self._timers[timer_id] = (self.now + ms / 1000.0, callback)
+        return timer_id
+
+    def remove(self, timer_id):
+        self._timers.pop(timer_id, None)
+
+    @property
+    def pending(self):
+        return len(self._timers)
+
+    def advance(self, ms):
+        """Posune čas o `ms` a spustí časovače, které mezitím vyprší (v pořadí)."""
+        end = self.now + ms / 1000.0
+        while True:
+            due = sorted((at, timer_id) for timer_id, (at, _cb) in self._timers.items() if at <= end + 1e-9)
+            if not due:
+                break
+            at, timer_id = due[0]
+            self.now = max(self.now, at)
+            _at, callback = self._timers.pop(timer_id)
+            callback()
+        self.now = end
+
+    def kwargs(self, clock=True):
+        timers = {"timer_add": self.add, "timer_remove": self.remove}
+        if clock:
+            timers["clock"] = self.clock
+        return timers
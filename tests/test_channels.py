@@ -0,0 +1,180 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from asus_screen_toggle import channels
+from asus_screen_toggle.channels import EXIT_NO_SESSIONS, TIMEOUT, ChannelRouter, ChildSet, dbus_reply_ok, fan_out
+from asus_screen_toggle.sessions import Session, SessionCache
+
+
+def session(sid="1", uid=1000):
+    s = Session(sid, f"/org/freedesktop/login1/session/_3{sid}")
+    s.update({"Name": "alice", "Type": "wayland", "State": "active", "User": (uid, "")})
+    return s
+
+
+class Channels:
+    """Zástupné kanály: výsledek podle `self.ok[jméno]`, volání se zapisují."""
+
+    def __init__(self, **ok):
+        self.ok = ok
+        self.calls = []
+
+    def table(self):
+        return {name: (lambda s, reason, name=name: self._call(name)) for name in self.ok}
+
+    def _call(self, name):
+        self.calls.append(name)
+        return self.ok[name]
+
+
+class ChannelRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.channels = Channels(systemd=False, dbus=True, signal=True)
+        self.router = ChannelRouter(state_path="", channels=self.channels.table(), clock=lambda: self.now)
+        self.session = session()
+        self.order = ["systemd", "dbus", "signal"]
+
+    def test_last_good_channel_goes_first(self):
+        self.assertEqual(self.router.dispatch(self.session, self.order), "dbus")
+        self.assertEqual(self.channels.calls, ["systemd", "dbus"])
+        key = ChannelRouter.session_key(self.session)
+        self.assertEqual(self.router.order(key, self.order)[0], ["dbus", "signal"])
+
+    def test_failed_channel_is_skipped_during_backoff(self):
+        self.router.dispatch(self.session, self.order)
+        self.channels.calls.clear()
+        self.channels.ok["dbus"] = False
+        self.assertEqual(self.router.dispatch(self.session, self.order), "signal")
+        self.assertEqual(self.channels.calls, ["dbus", "signal"])
+        self.assertEqual(self.router.stats()["systemd"]["skipped"], 1)
+
+    def test_backoff_doubles_on_repeated_failure(self):
+        key = ChannelRouter.session_key(self.session)
+        self.router.dispatch(self.session, self.order)
+        backoff = self.router.sessions[key]["backoff"]["systemd"]
+        self.assertEqual((backoff["delay"], backoff["until"]), (5.0, 1005.0))
+        self.now += 5.0
+        self.router.dispatch(self.session, ["systemd"])
+        self.assertEqual(self.router.sessions[key]["backoff"]["systemd"]["delay"], 10.0)
+
+    def test_all_channels_in_backoff_are_still_tried(self):
+        for name in self.channels.ok:
+            self.channels.ok[name] = False
+        self.assertIsNone(self.router.dispatch(self.session, self.order))
+        self.channels.calls.clear()
+        self.assertIsNone(self.router.dispatch(self.session, self.order))
+        self.assertEqual(self.channels.calls, self.order)
+
+    def test_state_survives_between_runs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "channels.json")
+            router = ChannelRouter(state_path=path, channels=self.channels.table(), clock=lambda: self.now)
+            router.dispatch(self.session, self.order)
+            router.save()
+            reloaded = ChannelRouter(state_path=path, channels=self.channels.table(), clock=lambda: self.now)
+            key = ChannelRouter.session_key(self.session)
+            self.assertEqual(reloaded.order(key, self.order), (["dbus", "signal"], ["systemd"]))
+
+
+class MainExitStatusTest(unittest.TestCase):
+    """Dispatcher přepne na skriptové kanály jen na EXIT_NO_SESSIONS."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.sent = []
+        # Stav routeru v dočasném runtime adresáři, jediný zástupný kanál (CHANNELS je default routeru)
+        for patcher in (mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": tmp.name}),
+                        mock.patch.dict(channels.CHANNELS, {"dbus": self.send}, clear=True),
+                        mock.patch.object(channels, "enabled_channels", lambda config, built: ["dbus"]),
+                        mock.patch.object(SessionCache, "load_snapshot", lambda cache: False),
+                        mock.patch("sys.stdout"), mock.patch("sys.stderr")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, s, reason):
+        self.sent.append(s.sid)
+        return True
+
+    def run_main(self, refresh):
+        with mock.patch.object(SessionCache, "refresh", refresh):
+            return channels.main(["USB_ADD"])
+
+    @staticmethod
+    def one_session(cache):
+        cache.sessions = {"7": session("7")}
+
+    def test_logind_unreachable_asks_for_script_fallback(self):
+        def unreachable(cache):
+            raise OSError("logind nedostupný")
+        self.assertEqual(self.run_main(unreachable), EXIT_NO_SESSIONS)
+        self.assertEqual(self.sent, [])
+
+    def test_successful_dispatch_exits_zero(self):
+        self.assertEqual(self.run_main(self.one_session), 0)
+        self.assertEqual(self.sent, ["7"])
+
+    def test_failure_after_dispatch_is_not_a_fallback(self):
+        with mock.patch.object(ChannelRouter, "save", side_effect=OSError("read-only")):
+            status = self.run_main(self.one_session)
+        self.assertEqual(self.sent, ["7"])
+        self.assertNotIn(status, (0, EXIT_NO_SESSIONS))
+
+
+class FanOutTest(unittest.TestCase):
+    def test_slow_session_times_out_without_delaying_others(self):
+        release = threading.Event()
+
+        def slow(s, reason):
+            if s.sid == "slow":
+                release.wait(2)
+            return True
+
+        router = ChannelRouter(state_path="", channels={"dbus": slow})
+        sessions = [session("slow"), session("2"), session("3")]
+        start = time.monotonic()
+        threading.Timer(0.5, release.set).start()
+        report = fan_out(router, sessions, ["dbus"], workers=2, deadline_ms=200)
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual([result for _s, result, _ms in report], [TIMEOUT, "dbus", "dbus"])
+
+
+class ChildSetTest(unittest.TestCase):
+    def test_kill_terminates_the_whole_process_group(self):
+        children = ChildSet()
+        result = []
+        thread = threading.Thread(target=lambda: result.append(children.run(["sh", "-c", "sleep 30 & wait"], 30)))
+        thread.start()
+        while not children._procs:
+            time.sleep(0.01)
+        pgid = next(iter(children._procs)).pid
+        children.kill()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(result, [None])
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            try:
+                os.killpg(pgid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        self.assertRaises(ProcessLookupError, os.killpg, pgid, 0)
+        self.assertIsNone(children.run(["true"], 1))
+
+
+class DbusReplyTest(unittest.TestCase):
+    def test_only_true_reply_counts(self):
+        self.assertTrue(dbus_reply_ok("method return time=1 sender=:1.5 -> destination=:1.9\n   boolean true\n"))
+        self.assertFalse(dbus_reply_ok("method return time=1 sender=:1.5 -> destination=:1.9\n   boolean false\n"))
+        self.assertFalse(dbus_reply_ok("method return time=1 sender=:1.5 -> destination=:1.9\n"))
+        self.assertFalse(dbus_reply_ok(""))
+        self.assertFalse(dbus_reply_ok(None))
+
+if __name__ == "__main__":
+    unittest.main()
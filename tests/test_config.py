@@ -0,0 +1,99 @@
+import glob
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from asus_screen_toggle.config import (KEYS, POLICY_KEYS, Config, ConfigStore, merge_layers, parse_config_file,
+                                       write_env_snapshot)
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+SHELL_SOURCES = ("src/bin/*.in", "src/bin/channels/*.sh", "usr/bin/*.sh", "usr/lib/asus-screen-toggle/dispatcher/*.sh")
+_SHELL_DEFAULT_RE = re.compile(r"\$\{([A-Z_]+):-([^}]*)\}")
+
+
+def shell_defaults():
+    """{KLÍČ: default} ze všech ${KLÍČ:-default} ve skriptech, jen klíče konfigurace."""
+    defaults = {}
+    for pattern in SHELL_SOURCES:
+        for path in glob.glob(os.path.join(ROOT, pattern)):
+            with open(path, 'r') as f:
+                for key, value in _SHELL_DEFAULT_RE.findall(f.read()):
+                    if key in KEYS:
+                        defaults.setdefault(key, set()).add(value)
+    return defaults
+
+
+class DefaultsTest(unittest.TestCase):
+    def test_python_defaults_match_shell_defaults(self):
+        env = Config().to_env()
+        defaults = shell_defaults()
+        self.assertIn("ENABLE_DBUS", defaults)
+        for key, values in defaults.items():
+            with self.subTest(key=key):
+                self.assertEqual(values, {env[key]})
+
+
+class MergeLayersTest(unittest.TestCase):
+    def test_later_layers_win(self):
+        config = merge_layers([{"PREFERRED_MODE": "enforce-desktop", "TRIGGER_QUIET_MS": "80"},
+                               {"PREFERRED_MODE": "automatic-disabled"}])
+        self.assertEqual((config.preferred_mode, config.trigger_quiet_ms), ("automatic-disabled", 80))
+
+    def test_policy_key_disabled_in_etc_cannot_be_enabled_by_user(self):
+        config = merge_layers([{"ENABLE_DBUS": False}, {"ENABLE_DBUS": True}])
+        self.assertFalse(config.enable_dbus)
+
+    def test_policy_key_missing_in_etc_follows_the_default(self):
+        for key in POLICY_KEYS:
+            with self.subTest(key=key):
+                self.assertFalse(getattr(merge_layers([{}, {key: True}]), KEYS[key]))
+
+    def test_policy_key_enabled_in_etc_can_be_disabled_by_user(self):
+        self.assertTrue(merge_layers([{"ENABLE_SIGNAL": True}]).enable_signal)
+        self.assertFalse(merge_layers([{"ENABLE_SIGNAL": True}, {"ENABLE_SIGNAL": False}]).enable_signal)
+
+    def test_unknown_keys_and_bad_values_are_ignored(self):
+        self.assertEqual(merge_layers([{"NOPE": "1", "DISPATCH_WORKERS": "many"}]), Config())
+
+
+class EnvSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "run", "config.env")
+        self.config = Config(primary_display="HDMI-A-1", enable_dbus=True, dispatch_workers=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshot_round_trips_through_the_parser(self):
+        write_env_snapshot(self.config, self.path)
+        self.assertEqual(merge_layers([parse_config_file(self.path)]), self.config)
+
+    def test_snapshot_writes_every_key(self):
+        write_env_snapshot(Config(), self.path)
+        self.assertEqual(set(parse_config_file(self.path)), set(KEYS))
+
+    @unittest.skipUnless(shutil.which("bash"), "bash není k dispozici")
+    def test_snapshot_is_sourceable_by_the_shell(self):
+        write_env_snapshot(self.config, self.path)
+        out = subprocess.run(["bash", "-c", 'source "$1"; printf "%s|%s" "$PRIMARY_DISPLAY_NAME" "$ENABLE_DBUS"',
+                              "bash", self.path], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out, "HDMI-A-1|true")
+
+    def test_store_reloads_on_change_and_rewrites_snapshot(self):
+        conf = os.path.join(self.tmp.name, "asus-screen-toggle.conf")
+        with open(conf, 'w') as f:
+            f.write("PREFERRED_MODE=enforce-desktop\n")
+        store = ConfigStore((conf,), env_path=self.path)
+        self.assertEqual(store.get().preferred_mode, "enforce-desktop")
+        with open(conf, 'w') as f:
+            f.write("PREFERRED_MODE=automatic-disabled\nDISPATCH_WORKERS=3\n")
+        self.assertEqual(store.get().dispatch_workers, 3)
+        self.assertEqual(parse_config_file(self.path)["PREFERRED_MODE"], "automatic-disabled")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from asus_screen_toggle.deferred import ERROR_FAILED, ERROR_UNKNOWN_METHOD, DeferredInterface, PendingReply
+
+
+class FakeInvocation:
+    def __init__(self):
+        self.errors = []
+
+    def return_dbus_error(self, name, message):
+        self.errors.append((name, message))
+
+
+class PendingReplyTest(unittest.TestCase):
+    def test_error_is_sent_at_most_once(self):
+        invocation = FakeInvocation()
+        pending = PendingReply(invocation, "(b)")
+        self.assertTrue(pending.error("timeout"))
+        self.assertFalse(pending.error("shutdown"))
+        self.assertFalse(pending.reply(True))
+        self.assertEqual(invocation.errors, [(ERROR_FAILED, "timeout")])
+        self.assertTrue(pending.done)
+
+
+class DeferredInterfaceTest(unittest.TestCase):
+    def test_unknown_method_is_an_error(self):
+        invocation = FakeInvocation()
+        iface = DeferredInterface(None, "/org/asus/ScreenToggle", "<node/>", {})
+        iface._on_call(None, ":1.1", "/org/asus/ScreenToggle", "org.asus.ScreenToggle.Wait", "Nope", None, invocation)
+        self.assertEqual(invocation.errors, [(ERROR_UNKNOWN_METHOD, "Nope")])
+
+
+if __name__ == "__main__":
+    unittest.main()
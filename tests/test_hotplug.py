@@ -0,0 +1,122 @@
+import unittest
+
+from asus_screen_toggle.hotplug import DRM_CHANGE, USB_ADD, USB_REMOVE, HotplugDispatcher, ReasonDebouncer
+
+from tests.fakes import FakeTimers
+
+
+class ReasonDebouncerTest(unittest.TestCase):
+    def setUp(self):
+        self.timers = FakeTimers()
+        self.settled = []
+        self.debouncer = ReasonDebouncer(self.settled.append, **self.timers.kwargs())
+
+    def test_burst_of_one_reason_settles_once_after_its_window(self):
+        for _i in range(5):
+            self.debouncer.event(DRM_CHANGE)
+            self.timers.advance(100)
+        self.assertEqual(self.settled, [])
+        self.timers.advance(500)
+        self.assertEqual(self.settled, [DRM_CHANGE])
+        self.assertEqual(self.debouncer.stats(), {"events": {DRM_CHANGE: 5}, "settled": {DRM_CHANGE: 1}})
+
+    def test_reasons_have_independent_windows(self):
+        self.debouncer.event(DRM_CHANGE)
+        self.debouncer.event(USB_ADD)
+        self.timers.advance(200)
+        self.assertEqual(self.settled, [USB_ADD])
+        self.timers.advance(300)
+        self.assertEqual(self.settled, [USB_ADD, DRM_CHANGE])
+
+    def test_last_event_of_a_burst_is_never_lost(self):
+        self.debouncer.event(USB_REMOVE)
+        self.timers.advance(200)
+        self.debouncer.event(USB_REMOVE)
+        self.timers.advance(200)
+        self.assertEqual(self.settled, [USB_REMOVE, USB_REMOVE])
+
+    def test_continuous_events_settle_within_max_wait(self):
+        settled_at = []
+        debouncer = ReasonDebouncer(lambda reason: settled_at.append(self.timers.now), **self.timers.kwargs())
+        while not settled_at:
+            debouncer.event(DRM_CHANGE)
+            self.timers.advance(100)
+        self.assertLessEqual(settled_at[0], 2.0 + 1e-6)
+
+    def test_unknown_reason_passes_through(self):
+        self.debouncer.event("ROTATION")
+        self.assertEqual(self.settled, ["ROTATION"])
+
+
+class FakeKeyboard:
+    def __init__(self):
+        self.listeners = []
+
+    def connect(self, callback):
+        self.listeners.append(callback)
+
+    def plug(self, connected):
+        for callback in self.listeners:
+            callback(connected)
+
+
+class FakeDrmSource:
+    def __init__(self, fail=True):
+        self.fail = fail
+        self.callback = None
+
+    def subscribe(self, callback):
+        if self.fail:
+            raise ValueError("netlink nedostupný")
+        self.callback = callback
+
+    def close(self):
+        self.callback = None
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.reasons = []
+
+    def trigger(self, reason):
+        self.reasons.append(reason)
+
+
+class HotplugDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.timers = FakeTimers()
+        self.keyboard = FakeKeyboard()
+        self.drm = FakeDrmSource()
+        self.scheduler = FakeScheduler()
+        self.dispatcher = HotplugDispatcher(self.keyboard, self.scheduler, drm_source=self.drm)
+        self.dispatcher.debouncer = ReasonDebouncer(self.dispatcher._on_settled, **self.timers.kwargs())
+
+    def test_failed_subscription_leaves_dispatcher_disabled(self):
+        self.assertFalse(self.dispatcher.set_enabled(True))
+        self.assertFalse(self.dispatcher.enabled)
+        self.keyboard.plug(True)
+        self.timers.advance(1000)
+        self.assertEqual(self.scheduler.reasons, [])
+
+    def test_enable_is_retried_after_a_failure(self):
+        self.dispatcher.set_enabled(True)
+        self.drm.fail = False
+        self.assertTrue(self.dispatcher.set_enabled(True))
+        self.assertIsNotNone(self.drm.callback)
+        self.keyboard.plug(True)
+        self.drm.callback("change", "card0")
+        self.timers.advance(1000)
+        self.assertEqual(sorted(self.scheduler.reasons), [DRM_CHANGE, USB_ADD])
+
+    def test_disable_closes_the_drm_source(self):
+        self.drm.fail = False
+        self.dispatcher.set_enabled(True)
+        self.assertFalse(self.dispatcher.set_enabled(False))
+        self.assertIsNone(self.drm.callback)
+        self.keyboard.plug(False)
+        self.timers.advance(1000)
+        self.assertEqual(self.scheduler.reasons, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from asus_screen_toggle.ipc import AgentSocketServer, _Connection, parse_request, peer_credentials, request
+
+
+class ParseRequestTest(unittest.TestCase):
+    def test_command_and_argument(self):
+        self.assertEqual(parse_request("trigger USB_ADD.00ff+Rotation\n"), ("TRIGGER", "USB_ADD.00ff+Rotation"))
+        self.assertEqual(parse_request("PING"), ("PING", ""))
+
+    def test_invalid_lines_are_rejected(self):
+        for line in ("", "   ", "42 x", "TRIGGER a;rm -rf", "TRIGGER $(id)"):
+            with self.subTest(line=line):
+                self.assertEqual(parse_request(line), (None, None))
+
+
+class PeerCredentialsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "agent.sock")
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(self.listener.close)
+        self.listener.bind(self.path)
+        self.listener.listen(1)
+        self.handled = []
+        self.server = AgentSocketServer(lambda command, arg, creds: self.handled.append(command) or (True, "x"),
+                                        path=self.path, allowed_uids={os.getuid() + 1})
+        self.server.sock = self.listener
+
+    def test_connection_from_foreign_uid_is_rejected(self):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.connect(self.path)
+        with mock.patch("sys.stdout"):
+            self.assertTrue(self.server._on_accept(self.listener.fileno(), 0))
+        self.assertEqual(self.server.rejected, 1)
+        self.assertEqual(self.handled, [])
+        client.settimeout(1)
+        self.assertEqual(client.recv(64), b"")
+
+    def test_default_allows_owner_and_root(self):
+        server = AgentSocketServer(lambda *args: (True, ""), path=self.path)
+        self.assertEqual(server.allowed_uids, {os.getuid(), 0})
+
+    def test_peer_credentials_report_the_connecting_process(self):
+        a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        with a, b:
+            self.assertEqual(peer_credentials(a), (os.getpid(), os.getuid(), os.getgid()))
+
+    def test_client_refuses_socket_of_another_user(self):
+        def serve():
+            conn, _addr = self.listener.accept()
+            conn.close()
+        thread = threading.Thread(target=serve)
+        thread.start()
+        self.assertEqual(request(self.path, "PING", expected_uid=os.getuid() + 1),
+                         (False, "socket owned by another user"))
+        thread.join()
+
+
+class RespondTest(unittest.TestCase):
+    def test_request_reply_round_trip(self):
+        server = AgentSocketServer(lambda command, arg, creds: (command == "MODE", f"{command} {arg}".strip()),
+                                   path="/nonexistent")
+        a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        with a, b:
+            conn = _Connection(a, peer_credentials(a))
+            server._respond(conn, b"MODE")
+            server._respond(conn, b"PING")
+            server._respond(conn, b"bad request!")
+            b.settimeout(1)
+            self.assertEqual(b.recv(256), b"OK MODE\nERR PING\nERR bad request\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
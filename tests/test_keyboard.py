@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+
+from asus_screen_toggle.keyboard import scan_sysfs
+
+
+class ScanSysfsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def device(self, name, vendor=None, product=None):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(path)
+        for attr, value in (("idVendor", vendor), ("idProduct", product)):
+            if value is not None:
+                with open(os.path.join(path, attr), 'w') as f:
+                    f.write(value + "\n")
+
+    def test_matches_vendor_and_product_case_insensitively(self):
+        self.device("3-2", "0b05", "1b2c")
+        self.device("3-3", "0b05", "ffff")
+        self.device("usb3")
+        self.assertEqual(scan_sysfs("0B05", "1B2C", sysfs_root=self.tmp.name), {"3-2"})
+
+    def test_empty_tree(self):
+        self.assertEqual(scan_sysfs("0b05", "1b2c", sysfs_root=self.tmp.name), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import itertools
+import unittest
+
+from asus_screen_toggle.layout import (USER_MODES, compute_plan, parse_orientation, session_backend,
+                                       uses_orientation)
+
+ORIENTATION_INPUTS = ("", "normal", "bottom-up", "left-up", "right-up")
+
+
+def baseline_matrix(keyboard, mode, direction, preferred="automatic-enabled"):
+    """
+    Přepis "Matrix" z původního asus-check-keyboard-user.sh (baseline) -
+    (režim, zapnutý primární, zapnutý spodní, zrcadlení, rotace primárního,
+    rotace spodního, DISPLAY_ROTATION).
+    """
+    disable_rotation = keyboard
+    force_mirror = force_reverse = False
+    enable_primary = True
+    if keyboard and mode.startswith("temp-"):
+        mode = preferred
+    enable_bottom = not keyboard
+    if mode == "automatic-disabled":
+        enable_bottom, disable_rotation = False, True
+    elif mode in ("temp-desktop", "enforce-desktop"):
+        enable_bottom = True
+    elif mode == "temp-mirror":
+        enable_bottom, force_mirror = True, True
+    elif mode == "temp-reverse-mirror":
+        enable_bottom, force_mirror, force_reverse, disable_rotation = True, True, True, True
+    elif mode == "temp-rotated-desktop":
+        enable_bottom, force_reverse, disable_rotation = True, True, True
+    elif mode == "temp-primary-only":
+        enable_bottom = False
+    elif mode == "temp-secondary-only":
+        enable_bottom, enable_primary = True, False
+
+    rotation = primary = secondary = "normal"
+    if disable_rotation or force_reverse:
+        if force_reverse:
+            primary = "inverted"
+    else:
+        rotation = {"normal": "normal", "bottom-up": "inverted",
+                    "left-up": "left", "right-up": "right"}.get(direction, "normal")
+        primary = secondary = rotation
+    return mode, enable_primary, enable_bottom, force_mirror, primary, secondary, rotation
+
+
+class ComputePlanMatrixTest(unittest.TestCase):
+    def test_matches_baseline_for_every_input(self):
+        for keyboard, mode, direction in itertools.product((False, True), USER_MODES, ORIENTATION_INPUTS):
+            with self.subTest(keyboard=keyboard, mode=mode, orientation=direction):
+                plan = compute_plan(keyboard, mode, direction, "x11")
+                expected = baseline_matrix(keyboard, mode, direction)
+                self.assertEqual((plan.mode, plan.enable_primary, plan.enable_secondary, plan.mirror,
+                                  plan.primary_rotation, plan.secondary_rotation, plan.rotation), expected)
+
+    def test_keyboard_reverts_temporary_modes_to_preferred(self):
+        plan = compute_plan(True, "temp-mirror", "left-up", "kde", preferred_mode="enforce-desktop")
+        self.assertEqual(plan.mode, "enforce-desktop")
+        self.assertEqual(plan.revert_to, "enforce-desktop")
+        self.assertTrue(plan.enable_secondary)
+        self.assertEqual(plan.rotation, "normal")
+
+    def test_no_revert_outside_temporary_modes(self):
+        self.assertEqual(compute_plan(True, "enforce-desktop", "", "x11").revert_to, "")
+        self.assertEqual(compute_plan(False, "temp-mirror", "", "x11").revert_to, "")
+
+    def test_dual_placement_follows_rotation(self):
+        # Baseline xrandr: left -> --right-of, right -> --left-of, inverted -> --below, normal -> --above
+        for direction, placement in (("left-up", "right-of"), ("right-up", "left-of"),
+                                     ("bottom-up", "below"), ("normal", "above"), ("", "above")):
+            with self.subTest(orientation=direction):
+                plan = compute_plan(False, "automatic-enabled", direction, "x11")
+                self.assertTrue(plan.dual)
+                self.assertEqual(plan.placement, placement)
+
+    def test_mirror_and_single_screen_placement(self):
+        self.assertEqual(compute_plan(False, "temp-mirror", "left-up", "x11").placement, "same-as")
+        self.assertFalse(compute_plan(False, "temp-mirror", "", "x11").dual)
+        self.assertEqual(compute_plan(True, "automatic-enabled", "", "x11").placement, "")
+        self.assertEqual(compute_plan(False, "temp-secondary-only", "", "x11").placement, "")
+
+    def test_output_names_and_backend_pass_through(self):
+        plan = compute_plan(False, "automatic-enabled", "", None, primary="DP-1", secondary="DP-2")
+        self.assertEqual((plan.primary, plan.secondary, plan.backend), ("DP-1", "DP-2", ""))
+
+
+class HelpersTest(unittest.TestCase):
+    def test_uses_orientation_only_when_rotation_applies(self):
+        for keyboard, mode, direction in itertools.product((False, True), USER_MODES, ("left-up",)):
+            with self.subTest(keyboard=keyboard, mode=mode):
+                rotated = compute_plan(keyboard, mode, direction, "x11").rotation != "normal"
+                self.assertEqual(uses_orientation(keyboard, mode), rotated)
+
+    def test_parse_orientation(self):
+        self.assertEqual(parse_orientation("=== Accelerometer orientation changed: left-up"), "left-up")
+        self.assertEqual(parse_orientation("DIR=bottom-up"), "bottom-up")
+        self.assertEqual(parse_orientation("undefined"), "")
+        self.assertEqual(parse_orientation(None), "")
+
+    def test_session_backend(self):
+        self.assertEqual(session_backend("x11", "XFCE"), "x11")
+        self.assertEqual(session_backend("wayland", "KDE"), "kde")
+        self.assertEqual(session_backend("wayland", "sway"), "wlr")
+        self.assertIsNone(session_backend("tty", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,240 @@
+import os
+import subprocess
+import tempfile
+import unittest
+
+from asus_screen_toggle.orientation import (SENSOR_PROXY_NAME, OrientationClient, OrientationFilter,
+                                            OrientationPublisher, OrientationState, current_orientation,
+                                            read_orientation_state, write_orientation_state)
+
+from tests.fakes import FakeTimers
+
+
+class FakeSensorProxy:
+    def __init__(self, orientation="normal"):
+        self.HasAccelerometer = True
+        self.AccelerometerOrientation = orientation
+        self.claims = 0
+
+    def ClaimAccelerometer(self):
+        self.claims += 1
+
+    def ReleaseAccelerometer(self):
+        self.claims -= 1
+
+
+class Handle:
+    def __init__(self):
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
+
+    unwatch = unsubscribe
+
+
+class FakeSystemBus:
+    """Podmnožina pydbus.Bus pro OrientationClient; proxy jde "spustit" a "zastavit"."""
+
+    def __init__(self, proxy=None):
+        self.proxy = proxy
+        self.watches = []
+
+    def get(self, name, path):
+        if self.proxy is None:
+            raise RuntimeError(f"{name} není na sběrnici")
+        return self.proxy
+
+    def subscribe(self, **kwargs):
+        return Handle()
+
+    def watch_name(self, name, name_appeared=None, name_vanished=None):
+        self.watches.append((name, name_appeared, name_vanished))
+        return Handle()
+
+    def start(self, proxy):
+        self.proxy = proxy
+        for name, appeared, _vanished in self.watches:
+            if name == SENSOR_PROXY_NAME:
+                appeared(name)
+
+    def stop(self):
+        self.proxy = None
+        for name, _appeared, vanished in self.watches:
+            if name == SENSOR_PROXY_NAME:
+                vanished(name)
+
+
+class OrientationClientTest(unittest.TestCase):
+    def setUp(self):
+        self.received = []
+        self.claims = []
+
+    def test_proxy_started_after_a_failed_claim_is_claimed(self):
+        bus = FakeSystemBus()
+        client = OrientationClient(self.received.append, bus=bus)
+        self.assertRaises(RuntimeError, client.claim)
+        self.assertFalse(client.claimed)
+        self.assertEqual(len(bus.watches), 1)
+        proxy = FakeSensorProxy("left-up")
+        bus.start(proxy)
+        self.assertTrue(client.claimed)
+        self.assertEqual(proxy.claims, 1)
+        self.assertEqual(self.received, ["left-up"])
+
+    def test_initial_appearance_keeps_a_valid_claim(self):
+        proxy = FakeSensorProxy()
+        bus = FakeSystemBus(proxy)
+        client = OrientationClient(self.received.append, bus=bus)
+        client.claim()
+        bus.start(proxy)
+        self.assertEqual(proxy.claims, 1)
+
+    def test_claim_is_restored_after_proxy_restart(self):
+        bus = FakeSystemBus(FakeSensorProxy())
+        client = OrientationClient(self.received.append, bus=bus)
+        client.claim()
+        bus.stop()
+        restarted = FakeSensorProxy("right-up")
+        bus.start(restarted)
+        self.assertTrue(client.claimed)
+        self.assertEqual(restarted.claims, 1)
+        self.assertEqual(self.received, ["normal", "right-up"])
+
+    def test_vanished_proxy_clears_the_claim_and_reports_it(self):
+        bus = FakeSystemBus(FakeSensorProxy())
+        client = OrientationClient(self.received.append, bus=bus, claim_changed=self.claims.append)
+        client.claim()
+        bus.stop()
+        self.assertFalse(client.claimed)
+        self.assertTrue(client.wanted)
+        bus.start(FakeSensorProxy())
+        self.assertTrue(client.claimed)
+        self.assertEqual(self.claims, [False, True])
+
+    def test_released_client_does_not_claim_on_appearance(self):
+        bus = FakeSystemBus()
+        client = OrientationClient(self.received.append, bus=bus)
+        self.assertRaises(RuntimeError, client.claim)
+        client.release()
+        proxy = FakeSensorProxy()
+        bus.start(proxy)
+        self.assertFalse(client.claimed)
+        self.assertEqual(proxy.claims, 0)
+
+
+class OrientationFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.timers = FakeTimers()
+        self.forwarded = []
+        self.relevant = True
+        self.filter = OrientationFilter(self.forwarded.append, stable_ms=300, hysteresis_ms=700,
+                                        relevant=lambda: self.relevant, **self.timers.kwargs())
+        # První hodnota po claimu se předá hned
+        self.filter.feed("normal")
+
+    def test_first_value_is_forwarded_immediately(self):
+        self.assertEqual(self.forwarded, ["normal"])
+        self.assertEqual(self.timers.pending, 0)
+
+    def test_new_orientation_waits_for_stable_window(self):
+        self.filter.feed("left-up")
+        self.timers.advance(299)
+        self.assertEqual(self.forwarded, ["normal"])
+        self.timers.advance(1)
+        self.assertEqual(self.forwarded, ["normal", "left-up"])
+
+    def test_bounce_back_within_window_is_filtered(self):
+        self.filter.feed("left-up")
+        self.timers.advance(100)
+        self.filter.feed("normal")
+        self.timers.advance(1000)
+        self.assertEqual(self.forwarded, ["normal"])
+        self.assertEqual(self.filter.stats()["filtered"], 1)
+
+    def test_return_to_previous_orientation_needs_hysteresis(self):
+        self.filter.feed("left-up")
+        self.timers.advance(300)
+        self.filter.feed("normal")
+        self.assertEqual(self.filter.required_ms("normal"), 1000)
+        self.timers.advance(999)
+        self.assertEqual(self.forwarded, ["normal", "left-up"])
+        self.timers.advance(1)
+        self.assertEqual(self.forwarded, ["normal", "left-up", "normal"])
+
+    def test_changing_candidate_restarts_the_window(self):
+        self.filter.feed("left-up")
+        self.timers.advance(200)
+        self.filter.feed("right-up")
+        self.timers.advance(200)
+        self.assertEqual(self.forwarded, ["normal"])
+        self.timers.advance(100)
+        self.assertEqual(self.forwarded, ["normal", "right-up"])
+
+    def test_irrelevant_values_are_suppressed_until_resync(self):
+        self.relevant = False
+        self.filter.feed("left-up")
+        self.timers.advance(1000)
+        self.assertEqual(self.forwarded, ["normal"])
+        self.assertEqual(self.filter.stats()["suppressed"], 1)
+        self.relevant = True
+        self.filter.resync()
+        self.assertEqual(self.forwarded, ["normal", "left-up"])
+        self.filter.resync()
+        self.assertEqual(len(self.forwarded), 2)
+
+
+class OrientationStateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "orientation")
+        self.timers = FakeTimers()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        write_orientation_state("left-up", True, self.path, clock=lambda: 42.0)
+        self.assertEqual(read_orientation_state(self.path), OrientationState("left-up", True, os.getpid(), 42.0))
+        self.assertTrue(read_orientation_state(self.path).live)
+
+    def test_released_sensor_is_not_live(self):
+        write_orientation_state("normal", False, self.path)
+        self.assertFalse(read_orientation_state(self.path).live)
+        self.assertEqual(current_orientation([self.path]), "")
+
+    def test_dead_owner_is_not_live(self):
+        proc = subprocess.Popen(["true"])
+        proc.wait()
+        write_orientation_state("normal", True, self.path)
+        with open(self.path, 'r+b') as f:
+            f.seek(8)
+            f.write(proc.pid.to_bytes(4, "little", signed=True))
+        self.assertFalse(read_orientation_state(self.path).live)
+
+    def test_record_not_refreshed_within_max_age_is_ignored(self):
+        write_orientation_state("left-up", True, self.path, clock=lambda: 0.0)
+        self.assertEqual(current_orientation([self.path], max_age=None), "left-up")
+        self.assertEqual(current_orientation([self.path], max_age=1), "")
+
+    def test_missing_or_foreign_file_reads_as_none(self):
+        self.assertIsNone(read_orientation_state(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b"XXXX" + bytes(16))
+        self.assertIsNone(read_orientation_state(self.path))
+
+    def test_publisher_refreshes_the_record_while_claimed(self):
+        publisher = OrientationPublisher(self.path, heartbeat_s=10, **self.timers.kwargs())
+        publisher.publish("normal", True)
+        self.timers.advance(25000)
+        self.assertEqual(read_orientation_state(self.path).updated, 20.0)
+        publisher.publish("normal", False)
+        self.assertEqual(self.timers.pending, 0)
+        publisher.publish("normal", True)
+        publisher.close()
+        self.assertEqual(self.timers.pending, 0)
+        self.assertIsNone(read_orientation_state(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
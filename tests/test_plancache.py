@@ -0,0 +1,67 @@
+import itertools
+import os
+import tempfile
+import unittest
+
+from asus_screen_toggle.backends import OutputState, target_layout
+from asus_screen_toggle.config import Config
+from asus_screen_toggle.layout import ORIENTATIONS, USER_MODES, compute_plan, uses_orientation
+from asus_screen_toggle.plancache import PlanCache, cache_key
+
+
+def outputs(width=2880, height=1800):
+    return {name: OutputState(name, width=width, height=height, x=0, y=y)
+            for name, y in (("eDP-1", 0), ("eDP-2", height))}
+
+
+class PlanCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "plan-cache.json")
+        self.config = Config()
+        self.cache = PlanCache("kde", self.config, path=self.path)
+        self.cache.load()
+
+    def test_lookup_matches_compute_plan_for_every_input(self):
+        for keyboard, mode, orientation in itertools.product((False, True), USER_MODES, ("",) + tuple(ORIENTATIONS)):
+            with self.subTest(keyboard=keyboard, mode=mode, orientation=orientation):
+                # Orientace, kterou plán nepoužije, se v klíči (a tedy v plánu) nerozlišuje
+                used = orientation if uses_orientation(keyboard, mode) else ""
+                self.assertEqual(self.cache.lookup(keyboard, mode, orientation),
+                                 compute_plan(keyboard, mode, used, "kde"))
+
+    def test_ignored_orientation_shares_a_key(self):
+        self.assertEqual(cache_key(True, "automatic-enabled", "left-up"), cache_key(True, "automatic-enabled", ""))
+        self.assertNotEqual(cache_key(False, "automatic-enabled", "left-up"),
+                            cache_key(False, "automatic-enabled", ""))
+
+    def test_unknown_mode_is_a_miss(self):
+        self.assertIsNone(self.cache.lookup(False, "no-such-mode", ""))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_targets_follow_the_topology(self):
+        plan = self.cache.lookup(False, "automatic-enabled", "left-up")
+        self.assertEqual(self.cache.target(plan, outputs()), target_layout(plan, outputs()))
+        builds = self.cache.stats()["builds"]
+        self.cache.target(plan, outputs())
+        self.assertEqual(self.cache.stats()["builds"], builds)
+        self.assertEqual(self.cache.target(plan, outputs(1920, 1200)), target_layout(plan, outputs(1920, 1200)))
+        self.assertEqual(self.cache.stats()["builds"], builds + 1)
+
+    def test_saved_cache_is_reused_only_for_same_backend_and_config(self):
+        plan = self.cache.lookup(False, "temp-mirror", "")
+        self.cache.target(plan, outputs())
+        reloaded = PlanCache("kde", self.config, path=self.path)
+        self.assertTrue(reloaded.load())
+        self.assertEqual(reloaded.target(plan, outputs()), self.cache.target(plan, outputs()))
+        self.assertFalse(PlanCache("x11", self.config, path=self.path).load())
+        self.assertFalse(PlanCache("kde", Config(primary_display="DP-1"), path=self.path).load())
+
+    def test_config_change_rebuilds_plans(self):
+        self.cache.set_config(Config(primary_display="DP-1", secondary_display="DP-2"))
+        self.assertEqual(self.cache.lookup(False, "automatic-enabled", "").primary, "DP-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
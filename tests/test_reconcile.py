@@ -0,0 +1,102 @@
+import unittest
+
+from asus_screen_toggle.backends import FakeBackend, OutputState, parse_kscreen_config, parse_xrandr_query
+from asus_screen_toggle.layout import compute_plan
+from asus_screen_toggle.reconcile import Reconciler, diff_layout, output_matches
+
+
+def panels(**positions):
+    """eDP-1 / eDP-2 2880x1800 na daných pozicích (None = vypnutý)."""
+    outputs = []
+    for name, pos in (("eDP-1", positions.get("primary", (0, 0))), ("eDP-2", positions.get("secondary"))):
+        if pos is None:
+            outputs.append(OutputState(name, enabled=False, width=2880, height=1800))
+        else:
+            outputs.append(OutputState(name, width=2880, height=1800, x=pos[0], y=pos[1]))
+    return outputs
+
+
+class DiffLayoutTest(unittest.TestCase):
+    def test_identical_layout_has_no_delta(self):
+        target = {"eDP-1": OutputState("eDP-1", x=0, y=0), "eDP-2": OutputState("eDP-2", x=0, y=1800)}
+        actual = {"eDP-1": OutputState("eDP-1", x=0, y=0), "eDP-2": OutputState("eDP-2", x=0, y=1800)}
+        self.assertEqual(diff_layout(target, actual), {})
+
+    def test_only_changed_outputs_are_returned(self):
+        target = {"eDP-1": OutputState("eDP-1", x=0, y=0), "eDP-2": OutputState("eDP-2", enabled=False)}
+        actual = {"eDP-1": OutputState("eDP-1", x=0, y=0), "eDP-2": OutputState("eDP-2", x=0, y=1800)}
+        self.assertEqual(list(diff_layout(target, actual)), ["eDP-2"])
+
+    def test_rotation_position_and_missing_outputs_differ(self):
+        self.assertFalse(output_matches(OutputState("a", rotation="left", x=0, y=0),
+                                        OutputState("a", x=0, y=0)))
+        self.assertFalse(output_matches(OutputState("a", x=0, y=0), OutputState("a", x=10, y=0)))
+        self.assertFalse(output_matches(OutputState("a", x=0, y=0), None))
+
+    def test_disabled_output_ignores_geometry(self):
+        self.assertTrue(output_matches(OutputState("a", enabled=False), OutputState("a", enabled=False, x=5)))
+
+    def test_unknown_target_position_always_applies(self):
+        self.assertFalse(output_matches(OutputState("a"), OutputState("a", x=0, y=0)))
+
+    def test_mirror_compared_only_when_backend_reports_it(self):
+        target = {"eDP-2": OutputState("eDP-2", x=0, y=0, mirror_of="eDP-1")}
+        overlap = {"eDP-2": OutputState("eDP-2", x=0, y=0)}
+        self.assertEqual(diff_layout(target, overlap), {})
+        self.assertEqual(list(diff_layout(target, overlap, compare_mirror=True)), ["eDP-2"])
+        mirrored = {"eDP-2": OutputState("eDP-2", x=0, y=0, mirror_of="eDP-1")}
+        self.assertEqual(diff_layout(target, mirrored, compare_mirror=True), {})
+
+
+class ReconcilerTest(unittest.TestCase):
+    def test_second_apply_of_same_plan_is_skipped(self):
+        backend = FakeBackend(panels(secondary=(0, 1800)))
+        reconciler = Reconciler(backend)
+        plan = compute_plan(True, "automatic-enabled", "", "fake")
+        self.assertTrue(reconciler.apply_plan(plan))
+        self.assertTrue(reconciler.apply_plan(plan))
+        self.assertEqual(len(backend.log), 1)
+        self.assertEqual(reconciler.stats()["skipped"], 1)
+
+    def test_only_the_changed_output_is_sent(self):
+        backend = FakeBackend(panels(secondary=(0, 1800)))
+        reconciler = Reconciler(backend)
+        reconciler.apply_plan(compute_plan(True, "automatic-enabled", "", "fake"))
+        self.assertEqual(list(backend.log[0]), ["eDP-2"])
+        self.assertEqual(reconciler.stats()["reduced"], 1)
+
+    def test_overlap_is_not_taken_for_a_mirror(self):
+        backend = FakeBackend(panels(secondary=(0, 0)))
+        reconciler = Reconciler(backend)
+        plan = compute_plan(False, "temp-mirror", "", "fake")
+        reconciler.apply_plan(plan)
+        self.assertEqual(backend.log[-1]["eDP-2"].mirror_of, "eDP-1")
+        reconciler.apply_plan(plan)
+        self.assertEqual(len(backend.log), 1)
+
+
+class ParseMirrorTest(unittest.TestCase):
+    XRANDR = (
+        "eDP-1 connected primary 2880x1800+0+0 (normal left inverted right x axis y axis) 300mm x 190mm\n"
+        "   2880x1800     60.00*+\n"
+        "eDP-2 connected 2880x1800+0+0 (normal left inverted right x axis y axis) 300mm x 190mm\n"
+        "   2880x1800     60.00*+\n"
+    )
+
+    def test_xrandr_clone_is_reported_as_mirror(self):
+        self.assertEqual(parse_xrandr_query(self.XRANDR)["eDP-2"].mirror_of, "eDP-1")
+
+    def test_xrandr_overlap_with_other_mode_is_not_a_mirror(self):
+        text = self.XRANDR.replace("   2880x1800     60.00*+\neDP-2", "   1920x1200     60.00*+\neDP-2")
+        self.assertEqual(parse_xrandr_query(text)["eDP-2"].mirror_of, "")
+
+    def test_kscreen_replication_source(self):
+        outputs = parse_kscreen_config({"outputs": [
+            {"id": 1, "name": "eDP-1", "enabled": True, "replicationSource": 0},
+            {"id": 2, "name": "eDP-2", "enabled": True, "replicationSource": 1},
+        ]})
+        self.assertEqual((outputs["eDP-1"].mirror_of, outputs["eDP-2"].mirror_of), ("", "eDP-1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+
+from asus_screen_toggle.layout import compute_plan
+from asus_screen_toggle.resume import ResumeTracker, SleepMonitor, load_last_layout, save_last_layout
+
+
+class LastLayoutTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "state", "last-layout.json")
+
+    def test_round_trip(self):
+        plan = compute_plan(False, "automatic-enabled", "left-up", "kde")
+        save_last_layout(plan, self.path)
+        self.assertEqual(load_last_layout(self.path), plan)
+
+    def test_missing_or_foreign_file_gives_none(self):
+        self.assertIsNone(load_last_layout(self.path))
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            json.dump({"plan": {"unknown_field": 1}}, f)
+        self.assertIsNone(load_last_layout(self.path))
+
+
+class ResumeTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.tracker = ResumeTracker(clock=lambda: self.now)
+
+    def test_only_the_run_resume_started_is_owned(self):
+        self.assertFalse(self.tracker.owns(4))
+        self.tracker.run = 5
+        self.assertFalse(self.tracker.owns(4))
+        self.assertTrue(self.tracker.owns(5))
+
+    def test_uncorrected_recheck_reports_the_instant_apply(self):
+        self.now += 0.120
+        self.tracker.instant_done()
+        self.assertEqual(self.tracker.phase, "waiting")
+        self.now += 1.0
+        self.tracker.recheck_started()
+        self.assertEqual(self.tracker.recheck_done(corrected=False), 120.0)
+        self.assertEqual(self.tracker.phase, "done")
+
+    def test_corrected_recheck_reports_the_correction(self):
+        self.now += 0.120
+        self.tracker.instant_done()
+        self.now += 1.0
+        self.assertEqual(self.tracker.recheck_done(corrected=True), 1120.0)
+
+    def test_recheck_without_instant_apply_reports_elapsed(self):
+        self.now += 0.5
+        self.assertEqual(self.tracker.recheck_done(corrected=False), 500.0)
+
+
+class SleepMonitorTest(unittest.TestCase):
+    def test_prepare_for_sleep_is_forwarded(self):
+        class Bus:
+            def subscribe(self, **kwargs):
+                self.handler = kwargs["signal_fired"]
+                return self
+
+        bus = Bus()
+        events = []
+        SleepMonitor(events.append, bus=bus).start()
+        bus.handler(":1.1", "/org/freedesktop/login1", "org.freedesktop.login1.Manager", "PrepareForSleep", (True,))
+        bus.handler(":1.1", "/org/freedesktop/login1", "org.freedesktop.login1.Manager", "PrepareForSleep", (False,))
+        self.assertEqual(events, [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from asus_screen_toggle.scheduler import TriggerScheduler
+
+from tests.fakes import FakeTimers
+
+
+class Runner:
+    """Runner plánovače, který aplikaci "dokončí" až na pokyn testu."""
+
+    def __init__(self):
+        self.reasons = []
+        self.done = None
+
+    def __call__(self, reason, done):
+        self.reasons.append(reason)
+        self.done = done
+
+    def finish(self, result=True):
+        done, self.done = self.done, None
+        done(result)
+
+
+class TriggerSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.timers = FakeTimers()
+        self.runner = Runner()
+        self.scheduler = TriggerScheduler(self.runner, quiet_ms=50, max_wait_ms=200, **self.timers.kwargs())
+
+    def test_triggers_within_quiet_window_merge_into_one_run(self):
+        for reason in ("USB_ADD", "DRM_CHANGE", "USB_ADD"):
+            self.scheduler.trigger(reason)
+            self.timers.advance(20)
+        self.assertEqual(self.runner.reasons, [])
+        self.timers.advance(50)
+        self.assertEqual(self.runner.reasons, ["USB_ADD+DRM_CHANGE"])
+        self.assertEqual(self.scheduler.stats(), {"received": 3, "merged": 2, "runs": 1})
+
+    def test_window_is_capped_by_max_wait(self):
+        started = []
+        scheduler = TriggerScheduler(lambda reason, done: started.append(self.timers.now),
+                                     quiet_ms=50, max_wait_ms=200, **self.timers.kwargs())
+        while not started:
+            scheduler.trigger("Rotation")
+            self.timers.advance(30)
+        self.assertLessEqual(started[0], 0.2 + 1e-6)
+
+    def test_triggers_during_run_collapse_into_single_follow_up(self):
+        self.scheduler.trigger("A")
+        self.timers.advance(50)
+        self.assertTrue(self.scheduler.running)
+        for reason in ("B", "C", "B"):
+            self.scheduler.trigger(reason)
+        self.assertTrue(self.scheduler.pending)
+        self.runner.finish()
+        self.timers.advance(50)
+        self.assertEqual(self.runner.reasons, ["A", "B+C"])
+        self.runner.finish()
+        self.timers.advance(500)
+        self.assertEqual(len(self.runner.reasons), 2)
+        self.assertFalse(self.scheduler.busy)
+
+    def test_failing_runner_does_not_wedge_the_scheduler(self):
+        def broken(reason, done):
+            raise RuntimeError("boom")
+
+        scheduler = TriggerScheduler(broken, quiet_ms=10, **self.timers.kwargs())
+        scheduler.trigger("A")
+        self.timers.advance(10)
+        self.assertFalse(scheduler.busy)
+        self.assertFalse(scheduler.last_result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from asus_screen_toggle.sessions import (LOGIND_NAME, LOGIND_PATH, MANAGER_IFACE, PROPS_IFACE, SESSION_IFACE,
+                                         Session, SessionCache, read_snapshot)
+
+
+class Reply:
+    def __init__(self, value):
+        self.value = value
+
+    def unpack(self):
+        return (self.value,)
+
+
+class FakeLogind:
+    """
+    Zástupce org.freedesktop.login1 na úrovni pydbus.Bus: `con.call_sync`
+    obslouží ListSessions / GetAll, `subscribe` si zapamatuje handlery
+    a `emit` je zavolá jako signál ze sběrnice.
+    """
+
+    def __init__(self):
+        self.con = self
+        self.sessions = {}
+        self.handlers = {}
+        self.calls = []
+
+    def add(self, sid, **props):
+        path = f"/org/freedesktop/login1/session/_3{sid}"
+        self.sessions[sid] = (path, dict({"Name": "alice", "Type": "wayland", "Desktop": "KDE",
+                                          "State": "active", "User": (1000, "/org/freedesktop/login1/user/_1000"),
+                                          "RuntimePath": "/run/user/1000"}, **props))
+        return path
+
+    def call_sync(self, name, path, iface, method, params, reply_type, flags, timeout, cancellable):
+        self.calls.append(method)
+        if (path, iface, method) == (LOGIND_PATH, MANAGER_IFACE, "ListSessions"):
+            return Reply([(sid, props["User"][0], props["Name"], "seat0", path)
+                          for sid, (path, props) in self.sessions.items()])
+        if iface == PROPS_IFACE and method == "GetAll" and params == (SESSION_IFACE,):
+            for session_path, props in self.sessions.values():
+                if session_path == path:
+                    return Reply(dict(props))
+        raise RuntimeError(f"{path} {iface}.{method}: neznámý objekt")
+
+    def subscribe(self, sender=None, iface=None, signal=None, object=None, signal_fired=None):
+        self.handlers[signal] = signal_fired
+        return mock.Mock()
+
+    def emit(self, signal, path, params):
+        self.handlers[signal](LOGIND_NAME, path, PROPS_IFACE if signal == "PropertiesChanged" else MANAGER_IFACE,
+                              signal, params)
+
+
+class SessionCacheSignalTest(unittest.TestCase):
+    def setUp(self):
+        # GLib.Variant jen předává hodnotu zástupné sběrnici
+        patcher = mock.patch("asus_screen_toggle.sessions._variant", lambda signature, value: value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.tmp.name, "sessions.json")
+        self.logind = FakeLogind()
+        self.logind.add("2")
+        self.changes = []
+        self.cache = SessionCache(bus=self.logind, snapshot_path=self.snapshot,
+                                  callback=lambda session, removed: self.changes.append((session.sid, removed)))
+        self.cache.start()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_start_subscribes_and_loads_all_sessions(self):
+        self.assertEqual(set(self.logind.handlers), {"SessionNew", "SessionRemoved", "PropertiesChanged"})
+        self.assertEqual([s.sid for s in self.cache.eligible()], ["2"])
+        self.assertEqual(set(read_snapshot(self.snapshot)), {"2"})
+
+    def test_session_new_is_added_and_published(self):
+        path = self.logind.add("5", Name="bob", Type="x11")
+        self.logind.emit("SessionNew", LOGIND_PATH, ("5", path))
+        self.assertEqual(self.cache.sessions["5"].name, "bob")
+        self.assertEqual(self.changes, [("5", False)])
+        self.assertEqual(read_snapshot(self.snapshot)["5"].type, "x11")
+
+    def test_session_removed_is_dropped_and_published(self):
+        path, _props = self.logind.sessions.pop("2")
+        self.logind.emit("SessionRemoved", LOGIND_PATH, ("2", path))
+        self.assertEqual(self.cache.sessions, {})
+        self.assertEqual(self.changes, [("2", True)])
+        self.assertEqual(read_snapshot(self.snapshot), {})
+
+    def test_properties_changed_rereads_the_session(self):
+        path, props = self.logind.sessions["2"]
+        props["State"] = "online"
+        self.logind.emit("PropertiesChanged", path, (SESSION_IFACE, {"Active": False}, []))
+        self.assertFalse(self.cache.sessions["2"].eligible)
+        self.assertEqual(self.changes, [("2", False)])
+        self.assertEqual(read_snapshot(self.snapshot)["2"].state, "online")
+
+    def test_unrelated_property_changes_are_ignored(self):
+        calls = len(self.logind.calls)
+        self.logind.emit("PropertiesChanged", "/org/freedesktop/login1/seat/seat0",
+                         (SESSION_IFACE, {"Active": True}, []))
+        self.logind.emit("PropertiesChanged", self.logind.sessions["2"][0], ("org.example.Other", {}, []))
+        self.assertEqual((len(self.logind.calls), self.changes), (calls, []))
+
+    def test_stop_removes_the_snapshot(self):
+        self.cache.stop()
+        self.assertFalse(os.path.exists(self.snapshot))
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.tmp.name, "sessions.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, pid):
+        owner = SessionCache(snapshot_path=self.snapshot)
+        session = Session("3", "/org/freedesktop/login1/session/_33")
+        session.update({"Name": "alice", "Type": "x11", "State": "active", "User": (1000, "")})
+        owner.sessions = {"3": session}
+        with mock.patch("os.getpid", return_value=pid):
+            owner._save_snapshot()
+
+    def test_reader_uses_snapshot_of_live_owner_without_logind(self):
+        self.write(os.getpid())
+        reader = SessionCache(bus=object())
+        self.assertTrue(reader.load_snapshot(self.snapshot))
+        self.assertEqual([s.shell_line() for s in reader.eligible()],
+                         ["sid=3 user=alice type=x11 desktop='' state=active USER_UID=1000 "
+                          "runtime_path=/run/user/1000 display='' wayland_disp=''"])
+
+    def test_snapshot_of_dead_owner_is_ignored(self):
+        proc = subprocess.Popen(["true"])
+        proc.wait()
+        self.write(proc.pid)
+        self.assertFalse(SessionCache().load_snapshot(self.snapshot))
+
+    def test_missing_snapshot_is_ignored(self):
+        self.assertFalse(SessionCache().load_snapshot(self.snapshot))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from asus_screen_toggle.trace import TraceRing, chrome_trace, critical_paths, read_ring, split_reason, tag_reason
+
+
+class ReasonTagTest(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(split_reason(tag_reason("USB_ADD", 0xabc)), ("USB_ADD", [0xabc]))
+
+    def test_merged_reasons_carry_all_ids(self):
+        text = tag_reason("USB_ADD", 1) + "+Rotation+" + tag_reason("DRM_CHANGE", 2)
+        self.assertEqual(split_reason(text), ("USB_ADD+Rotation+DRM_CHANGE", [1, 2]))
+
+    def test_untagged_reason_passes_through(self):
+        self.assertEqual(tag_reason("Resume", 0), "Resume")
+        self.assertEqual(split_reason("Resume"), ("Resume", []))
+        self.assertEqual(split_reason(None), ("", []))
+
+
+class TraceRingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "trace.ring")
+        self.now = 0
+        self.ring = TraceRing(self.path, slots=4, clock=lambda: self.now)
+
+    def tearDown(self):
+        self.ring.close()
+        self.tmp.cleanup()
+
+    def test_ring_wraps_and_reads_oldest_first(self):
+        for n in range(6):
+            self.now = n * 1000
+            self.ring.append(n + 1, f"stage{n}")
+        records = read_ring(self.path)
+        self.assertEqual([r.stage for r in records], ["stage2", "stage3", "stage4", "stage5"])
+        self.assertEqual([r.event_id for r in records], [3, 4, 5, 6])
+
+    def test_missing_file_reads_empty(self):
+        self.assertEqual(read_ring(os.path.join(self.tmp.name, "none")), [])
+
+    def test_critical_path_and_chrome_export(self):
+        self.ring.span([7], "udev", "USB_ADD", start_ns=0)
+        self.now = 5_000_000
+        self.ring.span([7], "dispatch", "USB_ADD", start_ns=1_000_000)
+        self.ring.mark([7], "applied", "USB_ADD", "1000:2")
+        records = read_ring(self.path)
+        total_us, hops, slowest = critical_paths(records)[7]
+        self.assertEqual(total_us, 5000)
+        self.assertEqual([h[0] for h in hops], ["udev", "dispatch", "applied"])
+        self.assertEqual(slowest, ("dispatch", "", 4000))
+        events = chrome_trace(records)["traceEvents"]
+        self.assertEqual([e["ph"] for e in events], ["X", "X", "i"])
+        self.assertEqual(events[1]["dur"], 4000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,17 @@ echo "pd $PRIMARY_DISPLAY_NAME"
 echo "sd $SECONDARY_DISPLAY_NAME"
 echo "lid $LID"
 
+RULES_FILE=/etc/udev/rules.d/99-asus-keyboard.rules
+
+# Rezidentní dispatcher (asus-bottom-screen-init.service) poslouchá udev sám,
+# RUN+= pravidla by každou událost spustila podruhé. Výchozí jsou pravidla,
+# aby se hotplug neztratil, když služba neběží.
+if [[ "${DISPATCHER_DAEMON:-false}" == "true" ]]; then
+    echo "dispatcher daemon: udev rules disabled"
+    echo "# DISPATCHER_DAEMON=true - události zpracovává asus-bottom-screen-init.service" > "$RULES_FILE"
+    exit 0
+fi
+
 #envsubst < /usr/share/asus-screen-toggle/99-asus-keyboard.rules.template > /usr/lib/udev/rules.d/99-asus-keyboard.rules
-envsubst < /usr/share/asus-screen-toggle/99-asus-keyboard.rules.template > /etc/udev/rules.d/99-asus-keyboard.rules
+envsubst < /usr/share/asus-screen-toggle/99-asus-keyboard.rules.template > "$RULES_FILE"
 
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+# Systémová služba rotace (asus-bottom-screen-init.service).
+# Orientaci odebírá přímo z iio-sensor-proxy přes D-Bus a změnu hned předá
+# dispatcheru - žádné parsování monitor-sensor ani `sleep 3`.
+# S DISPATCHER_DAEMON=true (volba správce) zároveň sama poslouchá udev netlink
+# (klávesnice, drm) a dispatcher spouští jednou za ustálenou dávku událostí;
+# udev pravidla pak nic nespouští.
+# Sezení logind drží v paměti ze signálů a zapisuje jejich snímek
+# (/run/asus-screen-toggle/sessions.json) - dispatcher pak logind neobchází.
+
+# Sdílené moduly (/usr/lib/asus-screen-toggle, při vývoji usr/lib ve stromu)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "lib", "asus-screen-toggle"))
+from asus_screen_toggle.config import SYSTEM_LAYERS, ConfigStore
+from asus_screen_toggle.hotplug import HotplugDispatcher, ReplayEventSource
+from asus_screen_toggle.keyboard import KeyboardMonitor
+from asus_screen_toggle.orientation import OrientationClient, OrientationFilter, OrientationPublisher
+from asus_screen_toggle.resume import SleepMonitor
+from asus_screen_toggle.scheduler import TriggerScheduler
+from asus_screen_toggle.sessions import SessionCache, session_state_path
+from asus_screen_toggle.trace import TraceRing, new_event_id, split_reason, tag_reason
+
+from gi.repository import GLib
+
+CHECK_BIN = shutil.which("asus-check-keyboard-system") or "/usr/bin/asus-check-keyboard-system"
+
+
+def run_dispatcher(reason, done, tracer=None):
+    """Runner pro TriggerScheduler - dispatcher nikdy neběží dvakrát (flock -n by událost zahodil)."""
+    print(f"Dispatcher: {reason}")
+    # Události jsou už odražené, dispatcher nemá znovu čekat
+    env = dict(os.environ, ASUS_SCREEN_TOGGLE_DEBOUNCED="1")
+    clean, event_ids = split_reason(reason)
+    started = time.monotonic_ns()
+    try:
+        proc = subprocess.Popen([CHECK_BIN, reason], env=env)
+    except OSError as e:
+        print(f"Nelze spustit {CHECK_BIN}: {e}")
+        done(False)
+        return
+
+    def on_exit(pid, status):
+        if tracer is not None:
+            tracer.span(event_ids, "dispatcher", clean, start_ns=started, ok=status == 0)
+        done(status == 0)
+
+    GLib.child_watch_add(GLib.PRIORITY_DEFAULT, proc.pid, on_exit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="asus-check-rotation")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="inject a synthetic udev event stream (JSON lines) instead of netlink")
+    args = parser.parse_args(argv)
+
+    # Systémový pohled (defaulty + /etc); zároveň udržuje /run/asus-screen-toggle/config.env
+    # pro dispatcher, aby nemusel při každé události parsovat /etc
+    def on_config(cfg):
+        keyboard.set_ids(cfg.vendor_id, cfg.product_id)
+        hotplug.set_enabled(cfg.dispatcher_daemon or replay is not None)
+        rotation_filter.configure(cfg.rotation_stable_ms, cfg.rotation_hysteresis_ms)
+        tracer.enabled = cfg.enable_trace and tracer.path is not None
+
+    config = ConfigStore(SYSTEM_LAYERS, callback=on_config)
+    hw = config.get()
+    # /run/asus-screen-toggle/trace.ring - začátek cesty každé události
+    tracer = TraceRing(enabled=hw.enable_trace)
+    scheduler = TriggerScheduler(lambda reason, done: run_dispatcher(reason, done, tracer), quiet_ms=0)
+
+    def trigger(reason, stage):
+        event_id = new_event_id() if tracer.enabled else 0
+        if event_id:
+            tracer.mark([event_id], stage, reason)
+        scheduler.trigger(tag_reason(reason, event_id))
+
+    def on_orientation(orientation):
+        counts = rotation_filter.stats()
+        print(f"Nová orientace: {orientation} (předáno {counts['forwarded']}, "
+              f"odfiltrováno {counts['filtered']}, potlačeno {counts['suppressed']})")
+        publisher.publish(orientation, client.claimed)
+        trigger("ROTATION", "sensor")
+
+    # /run/asus-screen-toggle/orientation pro sezení bez agenta (asus-check-keyboard-user)
+    publisher = OrientationPublisher()
+    replay = ReplayEventSource(args.replay) if args.replay else None
+    # S připojenou klávesnicí se rotace ignoruje - filtr nic nepředá ani nezapíše
+    rotation_filter = OrientationFilter(on_orientation, stable_ms=hw.rotation_stable_ms,
+                                        hysteresis_ms=hw.rotation_hysteresis_ms,
+                                        relevant=lambda: not keyboard.connected)
+    # Zmizení iio-sensor-proxy claim zruší, její návrat ho obnoví - čtenáři
+    # stavu to musí vidět hned, ne až po další změně orientace
+    def on_claim_changed(claimed):
+        if claimed:
+            rotation_filter.resync()
+        publisher.publish(rotation_filter.orientation, claimed)
+
+    client = OrientationClient(rotation_filter.feed, claim_changed=on_claim_changed)
+    keyboard = KeyboardMonitor(hw.vendor_id, hw.product_id,
+                               event_source=replay.usb if replay else None)
+    hotplug = HotplugDispatcher(keyboard, scheduler, drm_source=replay.drm if replay else None, tracer=tracer)
+
+    # Akcelerometr držíme jen s odpojenou klávesnicí, jinak se rotace ignoruje
+    def update_claim(connected):
+        try:
+            if connected:
+                client.release()
+                publisher.publish(rotation_filter.orientation, False)
+            else:
+                client.claim()
+                rotation_filter.resync()
+                publisher.publish(rotation_filter.orientation, True)
+        except Exception as e:
+            print(f"iio-sensor-proxy nedostupný: {e}")
+
+    # Po probuzení místo restartu služby (dřív system-sleep hook): klávesnice
+    # se přečte znovu ze sysfs a sezení dostanou trigger hned, agenti v nich
+    # aplikují uložené poslední rozložení
+    def on_sleep(sleeping):
+        if sleeping:
+            return
+        print("Probuzení: znovu čtu klávesnici a orientaci")
+        keyboard.rescan()
+        client.refresh()
+        trigger("RESUME", "logind")
+
+    sleep_monitor = SleepMonitor(on_sleep)
+    sessions = SessionCache(snapshot_path=session_state_path())
+
+    keyboard.connect(update_claim)
+    keyboard.start()
+    hotplug.set_enabled(hw.dispatcher_daemon or replay is not None)
+    config.watch()
+    update_claim(keyboard.connected)
+    if replay is not None:
+        replay.start()
+    try:
+        sleep_monitor.start()
+    except Exception as e:
+        print(f"logind nedostupný, probuzení se nesleduje: {e}")
+    try:
+        sessions.start()
+    except Exception as e:
+        # Dispatcher si bez snímku sezení načte sám
+        print(f"logind nedostupný, sezení se nesledují: {e}")
+        sessions.stop()
+
+    loop = GLib.MainLoop()
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGTERM, loop.quit)
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGINT, loop.quit)
+    loop.run()
+    sleep_monitor.stop()
+    sessions.stop()
+    client.close()
+    publisher.close()
+    tracer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,14 @@ import gettext
 import locale
 import shutil
 
+# Sdílené moduly (/usr/lib/asus-screen-toggle, při vývoji usr/lib ve stromu)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "lib", "asus-screen-toggle"))
+from asus_screen_toggle.keyboard import KeyboardMonitor
+from asus_screen_toggle.config import SYSTEM_CONFIG_FILE, USER_CONFIG_FILE, KEYS, load_system_config, parse_config_file
+from asus_screen_toggle.state import write_mode
+from asus_screen_toggle.services import UnitWatcher
+from asus_screen_toggle.jobs import JobRunner
+
 # Nastavení lokalizace
 APP_NAME = "asus-screen-toggle"
 LOCALE_DIR = "/usr/share/locale"
@@ -47,8 +55,6 @@ SYSTEM_SERVICE = "asus-bottom-screen-init.service"
 SYSTRAY_SERVICE = "asus-user-agent.service"
 
 # Cesty ke konfiguracím
-SYSTEM_CONFIG_FILE = "/etc/asus-screen-toggle.conf"
-USER_CONFIG_FILE = os.path.expanduser("~/.config/asus-screen-toggle/user.conf")
 
 # Cesty pro logiku přepínání (stejné jako v User Agent)
 STATE_DIR = os.path.expanduser("~/.local/state/asus-check-keyboard")
@@ -87,6 +93,15 @@ class AsusSettingsApp(Gtk.Window):
 
         self.temporary_actions = []
 
+        # Všechny externí příkazy běží mimo GTK vlákno (JobRunner)
+        self.jobs = JobRunner()
+        self.service_active = {}
+
+        # Stav klávesnice drží monitor (sysfs + udev), UI se jen ptá na atribut
+        hw_conf = load_system_config()
+        self.keyboard = KeyboardMonitor(hw_conf.vendor_id, hw_conf.product_id)
+        self.keyboard.connect(self.update_temporary_modes_availability)
+
         # Notebook s kartami
         self.notebook = Gtk.Notebook()
 
@@ -164,12 +179,12 @@ class AsusSettingsApp(Gtk.Window):
         self.page_home.pack_start(Gtk.Separator(), False, False, 10)
 
         # Tlačítko Kontrola
-        btn_check = Gtk.Button(label=_("🔄 Run check now"))
-        btn_check.set_property("width-request", 300)
-        btn_check.set_halign(Gtk.Align.CENTER)
-        btn_check.get_style_context().add_class("suggested-action") # Modré zvýraznění
-        btn_check.connect("clicked", lambda x: self.run_check())
-        self.page_home.pack_start(btn_check, False, False, 10)
+        self.btn_check = Gtk.Button(label=_("🔄 Run check now"))
+        self.btn_check.set_property("width-request", 300)
+        self.btn_check.set_halign(Gtk.Align.CENTER)
+        self.btn_check.get_style_context().add_class("suggested-action") # Modré zvýraznění
+        self.btn_check.connect("clicked", lambda x: self.run_check())
+        self.page_home.pack_start(self.btn_check, False, False, 10)
 
         # --- KARTA 1: OBECNÉ (Služby a uživatelské chování) ---
         self.page_general = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
@@ -289,16 +304,33 @@ class AsusSettingsApp(Gtk.Window):
         btn_refresh.connect("clicked", self.refresh_all)
         bbox.add(btn_refresh)
 
-        btn_save = Gtk.Button(label=_("Save All"))
-        btn_save.get_style_context().add_class("suggested-action")
-        btn_save.connect("clicked", self.on_save_clicked)
-        bbox.add(btn_save)
+        self.btn_save = Gtk.Button(label=_("Save All"))
+        self.btn_save.get_style_context().add_class("suggested-action")
+        self.btn_save.connect("clicked", self.on_save_clicked)
+        bbox.add(self.btn_save)
 
         #self.update_window_icon("automatic-enabled")
         # Start
         self.current_mode_in_ui = None # Pro sledování stavu UI
+        self.keyboard.start()
+        self.service_rows = {
+            USER_SERVICE: (self.status_user, self.btn_user_toggle, self.switch_user_enable),
+            SYSTRAY_SERVICE: (self.status_systray, self.btn_systray_toggle, self.switch_systray_enable),
+            SYSTEM_SERVICE: (self.status_system, self.btn_system_toggle, self.switch_system_enable),
+        }
+        # Stav služeb hlásí systemd přes D-Bus (PropertiesChanged), žádný timer
+        self.unit_watcher = None
+        if DBUS_AVAILABLE:
+            watcher = UnitWatcher(self.on_unit_changed)
+            watcher.add(USER_SERVICE, user=True)
+            watcher.add(SYSTRAY_SERVICE, user=True)
+            watcher.add(SYSTEM_SERVICE, user=False)
+            try:
+                watcher.start()
+                self.unit_watcher = watcher
+            except Exception as e:
+                print(_(f"Warning: systemd D-Bus nedostupný, stav služeb jen při obnovení: {e}"))
         self.refresh_all()
-        GLib.timeout_add_seconds(3, self.refresh_services_only)
 
     # --- UI Helpers pro Domovskou stránku ---
 
@@ -340,11 +372,7 @@ class AsusSettingsApp(Gtk.Window):
         return btn
 
     def is_keyboard_connected(self):
-        result = subprocess.run(
-            ["asus-check-keyboard-user", "--keyboard-connected"],
-            stdout=subprocess.DEVNULL
-        )
-        return result.returncode == 0
+        return self.keyboard.connected
 
 
     def update_temporary_modes_availability(self, keyboard_connected: bool):
@@ -391,53 +419,56 @@ class AsusSettingsApp(Gtk.Window):
         mode = btn.mode_id
         print(_(f"UI: Požadavek na změnu režimu -> {mode}"))
 
-        success = False
+        use_dbus = DBUS_AVAILABLE and self.user_chk_dbus.get_active()
 
-        # 1. Zkusit D-Bus (synchronizace s Agentem)
-        if DBUS_AVAILABLE and self.user_chk_dbus.get_active():
-            try:
-                bus = SessionBus()
-                # Získáme proxy objekt
-                agent_proxy = bus.get(BUS_NAME) # Získá hlavní object path
-                # Voláme metodu SetMode
-                resp = agent_proxy.SetMode(mode)
-                print(_(f"D-Bus odpověď: {resp}"))
-                success = True
-            except Exception as e:
-                print(_(f"D-Bus chyba (Agent neběží?): {e}"))
-
-        if not success:
-            import os
+        def switch_mode():
+            # Běží ve vlákně JobRunneru - ani D-Bus, ani systemctl neblokují okno
+            # 1. Zkusit D-Bus (synchronizace s Agentem)
+            if use_dbus:
+                try:
+                    bus = SessionBus()
+                    # Získáme proxy objekt
+                    agent_proxy = bus.get(BUS_NAME) # Získá hlavní object path
+                    # Voláme metodu SetMode
+                    resp = agent_proxy.SetMode(mode)
+                    print(_(f"D-Bus odpověď: {resp}"))
+                    if resp != "ERROR":
+                        # Počkat na aplikaci naplánovanou přes SetMode - výsledek
+                        # a skutečnou dobu hlásí agent, fallback už není potřeba
+                        ok, result, plan, duration_ms = agent_proxy.TriggerAndWait("Settings", 5000)
+                        print(_(f"Agent: {result} ({duration_ms:.0f} ms)"))
+                        return
+                    # Režim, který agent přes D-Bus nepřijímá (dočasné) -> soubor
+                except Exception as e:
+                    print(_(f"D-Bus chyba (Agent neběží?): {e}"))
+
+            # 2. Fallback: systemd služba + zápis do souboru (pokud D-Bus selhal)
             print(_(f"systemd volani {mode}"))
-            try:
-                os.system("systemctl --user start asus-screen-toggle.service > /dev/null 2>&1")
-                os.makedirs(STATE_DIR, exist_ok=True)
-                with open(STATE_FILE, 'w') as f:
-                    f.write(mode)
-            except Exception as e:
-                self.show_error(_(f"Nepodařilo se zapsat stav: {e}"))
-                return
-
-        # 2. Fallback: Zápis do souboru (pokud D-Bus selhal)
-        if not success:
+            subprocess.run(["systemctl", "--user", "start", USER_SERVICE],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             print(_("Fallback: Zapisuji přímo do souboru..."))
-            try:
-                os.makedirs(STATE_DIR, exist_ok=True)
-                with open(STATE_FILE, 'w') as f:
-                    f.write(mode)
-                self.run_check() # Spustíme script manuálně
-            except Exception as e:
-                self.show_error(_(f"Nepodařilo se zapsat stav: {e}"))
-                return
+            write_mode(mode, STATE_FILE)
+            subprocess.run([SCRIPT_PATH]) # Spustíme script manuálně
+
+        def done(result):
+            if result.error is not None:
+                self.show_error(_(f"Nepodařilo se zapsat stav: {result.error}"))
+            self.update_home_ui_state(mode)
 
-        # UI aktualizujeme hned pro odezvu (timer to pak potvrdí)
-        self.update_home_ui_state(mode)
+        # Čekající stav: dočasné režimy jsou do dokončení zašedlé
+        for b in self.temporary_actions:
+            b.set_sensitive(False)
+        self.jobs.run("mode", switch_mode, on_done=done)
 
     def run_check(self):
-        try:
-            subprocess.Popen([SCRIPT_PATH])
-        except Exception as e:
-            self.show_error(_(f"Chyba při spouštění skriptu: {e}"))
+        self.btn_check.set_sensitive(False)
+
+        def done(result):
+            self.btn_check.set_sensitive(True)
+            if result.error is not None:
+                self.show_error(_(f"Chyba při spouštění skriptu: {result.error}"))
+
+        self.jobs.run("check", [SCRIPT_PATH], on_done=done)
 
     def periodic_refresh(self):
         self.refresh_all()
@@ -480,15 +511,28 @@ class AsusSettingsApp(Gtk.Window):
         grid.attach(lbl, 0, row, 1, 1)
         grid.attach(entry_widget, 1, row, 1, 1)
 
-    def refresh_services_only(self):
-        active, enabled = self.get_service_status(USER_SERVICE, user=True)
-        self.update_service_ui(self.status_user, self.btn_user_toggle, self.switch_user_enable, active, enabled)
-
-        active, enabled = self.get_service_status(SYSTRAY_SERVICE, user=True)
-        self.update_service_ui(self.status_systray, self.btn_systray_toggle, self.switch_systray_enable, active, enabled)
+    def on_unit_changed(self, unit):
+        label, button, switch = self.service_rows[unit.name]
+        self.update_service_ui(label, button, switch, unit.active, unit.enabled)
 
-        active, enabled = self.get_service_status(SYSTEM_SERVICE, user=False)
-        self.update_service_ui(self.status_system, self.btn_system_toggle, self.switch_system_enable, active, enabled)
+    def refresh_services_only(self):
+        if self.unit_watcher is not None:
+            def done(result):
+                if result.error is not None:
+                    print(_(f"systemd D-Bus chyba: {result.error}"))
+                    return
+                self.unit_watcher.apply(result.value)
+                for unit in self.unit_watcher.units.values():
+                    self.on_unit_changed(unit)
+
+            self.jobs.run("status", self.unit_watcher.fetch, on_done=done)
+            return True
+
+        for service, user in ((USER_SERVICE, True), (SYSTRAY_SERVICE, True), (SYSTEM_SERVICE, False)):
+            def done(result, service=service):
+                if result.error is None:
+                    self.update_service_ui(*self.service_rows[service], *result.value)
+            self.jobs.run(("status", service), lambda service=service, user=user: self.get_service_status(service, user), on_done=done)
         return True
 
     def get_service_status(self, service, user=True):
@@ -499,11 +543,29 @@ class AsusSettingsApp(Gtk.Window):
         res_en = subprocess.run(cmd + ["is-enabled", service], stdout=subprocess.PIPE, text=True)
         return (res_act.stdout.strip() == _("active"), res_en.stdout.strip() == _("enabled"))
 
+    def run_service_action(self, service, action, user=True, key="run"):
+        """systemctl (resp. pkexec systemctl) na pozadí, řádek služby mezitím čeká."""
+        cmd = ["systemctl", "--user", action, service] if user else ["pkexec", "systemctl", action, service]
+        label, button, switch = self.service_rows[service]
+        button.set_sensitive(False)
+        switch.set_sensitive(False)
+        label.set_markup(_("<i>…</i>"))
+
+        def done(result):
+            button.set_sensitive(True)
+            switch.set_sensitive(True)
+            if not result.ok:
+                print(_(f"systemctl {action} {service} selhalo: {result.stderr or result.error}"))
+            self.refresh_services_only()
+
+        self.jobs.run(("service", service, key), cmd, on_done=done)
+
     def update_service_ui(self, label, button, switch, active, enabled):
         switch.handler_block_by_func(self.on_user_enable_toggle if switch == self.switch_user_enable else self.on_system_enable_toggle if switch == self.switch_system_enable else self.on_systray_enable_toggle)
         switch.set_active(enabled)
         switch.handler_unblock_by_func(self.on_user_enable_toggle if switch == self.switch_user_enable else self.on_system_enable_toggle if switch == self.switch_system_enable else self.on_systray_enable_toggle)
 
+        self.service_active[button] = active
         if active:
             label.set_markup(_("<span foreground='green'><b>Running</b></span>"))
             button.set_label(_("Stop"))
@@ -523,17 +585,11 @@ class AsusSettingsApp(Gtk.Window):
                 print(f"Nepodařilo se nastavit ikonu okna: {e}")
 
     def load_configs(self):
-        # 1. Načíst SYSTÉMOVÉ nastavení (defaulty + /etc)
-        sys_data = {
-            "VENDOR_ID": "0b05", "PRODUCT_ID": "1bf2",
-            "PRIMARY_DISPLAY_NAME": "eDP-1", "SECONDARY_DISPLAY_NAME": "eDP-2",
-            "LID": "LID",
-            "ENABLE_DIRECT_CALL": True,
-            "ENABLE_DBUS": True, "ENABLE_SIGNAL": True, "ENABLE_SYSTEMD_CALL": True
-        }
-
-        if os.path.exists(SYSTEM_CONFIG_FILE):
-            sys_data.update(self._parse_config_file(SYSTEM_CONFIG_FILE))
+        # 1. Načíst SYSTÉMOVÉ nastavení (defaulty + /etc, sdílený modul config)
+        system = load_system_config()
+        sys_data = {key: getattr(system, name) for key, name in KEYS.items()}
+        # Klíče bez prvku v GUI se při uložení zapíší zpět beze změny
+        self.sys_data = sys_data
 
         # Aplikace do GUI - Hardware a Systém
         self.entry_vendor.set_text(str(sys_data.get("VENDOR_ID", "")))
@@ -553,9 +609,7 @@ class AsusSettingsApp(Gtk.Window):
         self.sys_chk_systemd.set_active(sys_systemd_active)
 
         # 2. Načíst UŽIVATELSKÉ nastavení
-        user_data = {}
-        if os.path.exists(USER_CONFIG_FILE):
-            user_data = self._parse_config_file(USER_CONFIG_FILE)
+        user_data = parse_config_file(USER_CONFIG_FILE)
 
         # Logika AND detekovaná přímo v UI:
         # Pokud je SYSTÉM False, uživatel nesmí zapnout.
@@ -578,23 +632,6 @@ class AsusSettingsApp(Gtk.Window):
             self.user_chk_signal.set_tooltip_text(_("Zakázáno správcem v /etc/asus-screen-toggle.conf"))
 
 
-    def _parse_config_file(self, filepath):
-        data = {}
-        try:
-            with open(filepath, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith("#") or "=" not in line: continue
-                    key, val = line.split("=", 1)
-                    key = key.strip()
-                    val = val.strip().replace('"', '')
-
-                    if val.lower() == "true": data[key] = True
-                    elif val.lower() == "false": data[key] = False
-                    else: data[key] = val
-        except: pass
-        return data
-
     # --- Logika ukládání ---
     def on_save_clicked(self, widget):
         # 1. ULOŽENÍ UŽIVATELSKÉHO CONFIGU (~/.config)
@@ -624,6 +661,16 @@ class AsusSettingsApp(Gtk.Window):
             f'ENABLE_DBUS={"true" if self.sys_chk_dbus.get_active() else "false"}',
             f'ENABLE_SIGNAL={"true" if self.sys_chk_signal.get_active() else "false"}',
             f'ENABLE_SYSTEMD_CALL={"true" if self.sys_chk_systemd.get_active() else "false"}',
+            "",
+            f'TRIGGER_QUIET_MS={self.sys_data["TRIGGER_QUIET_MS"]}',
+            f'DISPATCHER_DAEMON={"true" if self.sys_data["DISPATCHER_DAEMON"] else "false"}',
+            f'CHANNEL_RACE={"true" if self.sys_data["CHANNEL_RACE"] else "false"}',
+            f'DISPATCH_WORKERS={self.sys_data["DISPATCH_WORKERS"]}',
+            f'DISPATCH_DEADLINE_MS={self.sys_data["DISPATCH_DEADLINE_MS"]}',
+            f'ENABLE_TRACE={"true" if self.sys_data["ENABLE_TRACE"] else "false"}',
+            f'ENABLE_SOCKET={"true" if self.sys_data["ENABLE_SOCKET"] else "false"}',
+            f'ROTATION_STABLE_MS={self.sys_data["ROTATION_STABLE_MS"]}',
+            f'ROTATION_HYSTERESIS_MS={self.sys_data["ROTATION_HYSTERESIS_MS"]}',
         ]
 
         file_content = "\n".join(sys_content)
@@ -632,84 +679,85 @@ class AsusSettingsApp(Gtk.Window):
         cmd = f"cat <<EOF > /tmp/asus_conf_tmp\n{file_content}\nEOF\n"
         cmd += f"pkexec mv /tmp/asus_conf_tmp {SYSTEM_CONFIG_FILE}"
 
-        try:
-            # A) Samotné uložení souboru
-            subprocess.run(["bash", "-c", cmd], check=True)
-
-            # B) Dotaz na přegenerování pravidel (pouze pokud se uložení povedlo)
-            confirm = Gtk.MessageDialog(transient_for=self, flags=0,
-                                      message_type=Gtk.MessageType.QUESTION,
-                                      buttons=Gtk.ButtonsType.YES_NO,
-                                      text=_("Aktualizovat Udev pravidla?"))
-            confirm.format_secondary_text(
-                _("Změnili jste systémové nastavení. Pro správnou funkčnost detekce hardwaru "
-                "je třeba přegenerovat a načíst pravidla Udev.\n\n"
-                "Chcete to provést nyní? (Vyžaduje heslo)")
-            )
-            response = confirm.run()
-            confirm.destroy()
-
-            if response == Gtk.ResponseType.YES:
-                try:
-                    # Sestavíme řetězec příkazů:
-                    # 1. Spustit generovací skript
-                    # 2. Reloadnout pravidla (pokud 1. prošla)
-                    # 3. Triggerovat události (pokud 2. prošla)
-                    full_cmd = (
-                        "&GENRULES_PATH && "
-                        "udevadm control --reload-rules && "
-                        "udevadm trigger"
-                    )
-
-                    # Spustíme vše pod jedním pkexec (jedno heslo)
-                    subprocess.run(["pkexec", "bash", "-c", full_cmd], check=True)
-
-                except subprocess.CalledProcessError:
-                     self.show_error(_("Nepodařilo se přegenerovat a aplikovat pravidla."))
-
-            # C) Restart agenta (aby načetl případné změny v logice)
-            subprocess.run(["systemctl", "--user", "kill", "-s", "HUP", USER_SERVICE])
-
-            # Finální info
-            msg = Gtk.MessageDialog(transient_for=self, flags=0, message_type=Gtk.MessageType.INFO,
-                                  buttons=Gtk.ButtonsType.OK, text=_("Hotovo"))
-            msg.format_secondary_text(_("Konfigurace byla úspěšně uložena."))
-            msg.run()
-            msg.destroy()
-
-        except subprocess.CalledProcessError:
+        # A) Samotné uložení souboru - pkexec čeká na heslo, okno mezitím běží dál
+        self.btn_save.set_sensitive(False)
+        self.jobs.run("save", ["bash", "-c", cmd], on_done=self._on_system_config_saved)
+
+    def _on_system_config_saved(self, result):
+        if not result.ok:
+            self.btn_save.set_sensitive(True)
             self.show_error(_("Nepodařilo se uložit systémovou konfiguraci (zamítnuto)."))
+            return
+
+        # B) Dotaz na přegenerování pravidel (pouze pokud se uložení povedlo)
+        confirm = Gtk.MessageDialog(transient_for=self, flags=0,
+                                  message_type=Gtk.MessageType.QUESTION,
+                                  buttons=Gtk.ButtonsType.YES_NO,
+                                  text=_("Aktualizovat Udev pravidla?"))
+        confirm.format_secondary_text(
+            _("Změnili jste systémové nastavení. Pro správnou funkčnost detekce hardwaru "
+            "je třeba přegenerovat a načíst pravidla Udev.\n\n"
+            "Chcete to provést nyní? (Vyžaduje heslo)")
+        )
+        response = confirm.run()
+        confirm.destroy()
+
+        if response != Gtk.ResponseType.YES:
+            self._on_rules_applied(None)
+            return
+
+        # Sestavíme řetězec příkazů:
+        # 1. Spustit generovací skript
+        # 2. Reloadnout pravidla (pokud 1. prošla)
+        # 3. Triggerovat události (pokud 2. prošla)
+        full_cmd = (
+            f"{GENRULES_PATH} && "
+            "udevadm control --reload-rules && "
+            "udevadm trigger"
+        )
+
+        # Spustíme vše pod jedním pkexec (jedno heslo)
+        self.jobs.run("save", ["pkexec", "bash", "-c", full_cmd], on_done=self._on_rules_applied)
+
+    def _on_rules_applied(self, result):
+        if result is not None and not result.ok:
+            self.show_error(_("Nepodařilo se přegenerovat a aplikovat pravidla."))
+
+        # C) Restart agenta (aby načetl případné změny v logice)
+        self.jobs.run("reload-agent", ["systemctl", "--user", "kill", "-s", "HUP", USER_SERVICE])
+        self.btn_save.set_sensitive(True)
+
+        # Finální info
+        msg = Gtk.MessageDialog(transient_for=self, flags=0, message_type=Gtk.MessageType.INFO,
+                              buttons=Gtk.ButtonsType.OK, text=_("Hotovo"))
+        msg.format_secondary_text(_("Konfigurace byla úspěšně uložena."))
+        msg.run()
+        msg.destroy()
 
     # --- Handlery Služeb ---
     def on_user_service_toggle(self, btn):
-        action = "stop" if btn.get_label() == _("Zastavit") else "start"
-        subprocess.run(["systemctl", "--user", action, USER_SERVICE])
-        self.refresh_services_only()
+        action = "stop" if self.service_active.get(btn) else "start"
+        self.run_service_action(USER_SERVICE, action)
 
     def on_systray_service_toggle(self, btn):
-        action = "stop" if btn.get_label() == _("Zastavit") else "start"
-        subprocess.run(["systemctl", "--user", action, SYSTRAY_SERVICE])
-        self.refresh_services_only()
+        action = "stop" if self.service_active.get(btn) else "start"
+        self.run_service_action(SYSTRAY_SERVICE, action)
 
     def on_user_enable_toggle(self, switch, gparam):
         action = "enable" if switch.get_active() else "disable"
-        subprocess.run(["systemctl", "--user", action, USER_SERVICE])
-        self.refresh_services_only()
+        self.run_service_action(USER_SERVICE, action, key="boot")
 
     def on_systray_enable_toggle(self, switch, gparam):
         action = "enable" if switch.get_active() else "disable"
-        subprocess.run(["systemctl", "--user", action, SYSTRAY_SERVICE])
-        self.refresh_services_only()
+        self.run_service_action(SYSTRAY_SERVICE, action, key="boot")
 
     def on_system_service_toggle(self, btn):
-        action = "stop" if btn.get_label() == "Zastavit" else "start"
-        subprocess.run(["pkexec", "systemctl", action, SYSTEM_SERVICE])
-        self.refresh_services_only()
+        action = "stop" if self.service_active.get(btn) else "start"
+        self.run_service_action(SYSTEM_SERVICE, action, user=False)
 
     def on_system_enable_toggle(self, switch, gparam):
         action = "enable" if switch.get_active() else "disable"
-        subprocess.run(["pkexec", "systemctl", action, SYSTEM_SERVICE])
-        self.refresh_services_only()
+        self.run_service_action(SYSTEM_SERVICE, action, user=False, key="boot")
 
     def show_error(self, message):
         dialog = Gtk.MessageDialog(transient_for=self, flags=0, message_type=Gtk.MessageType.ERROR, buttons=Gtk.ButtonsType.OK, text=_("Chyba"))
@@ -720,7 +768,7 @@ class AsusSettingsApp(Gtk.Window):
 if __name__ == "__main__":
     app = AsusSettingsApp()
     app.set_icon_from_file(ICON_DESKTOP)
-    app.connect("destroy", Gtk.main_quit)
+    app.connect("destroy", lambda w: (app.jobs.shutdown(), Gtk.main_quit()))
     app.update_temporary_modes_availability(app.is_keyboard_connected())
     app.show_all()
     Gtk.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import json
+import os
+import sys
+
+# Export trasovacích kruhů (asus_screen_toggle.trace) do Chrome trace /
+# Perfetto JSON. Bez argumentů spojí kruh systémové služby a dispatcheru
+# (/run/asus-screen-toggle) s vlastním kruhem agenta ($XDG_RUNTIME_DIR);
+# root vidí i kruhy všech přihlášených uživatelů.
+#
+#   asus-screen-trace -o trace.json          -> ui.perfetto.dev / chrome://tracing
+#   asus-screen-trace --summary              -> cesta každé události a nejpomalejší krok
+
+# Sdílené moduly (/usr/lib/asus-screen-toggle, při vývoji usr/lib ve stromu)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "lib", "asus-screen-toggle"))
+from asus_screen_toggle.trace import SYSTEM_TRACE_DIR, chrome_trace, critical_paths, read_ring, trace_path
+
+
+def default_rings():
+    paths = [trace_path(SYSTEM_TRACE_DIR), trace_path()]
+    if os.geteuid() == 0:
+        paths += sorted(glob.glob("/run/user/*/asus-screen-toggle/trace.ring"))
+    unique = []
+    for path in paths:
+        if path and path not in unique and os.path.exists(path):
+            unique.append(path)
+    return unique
+
+
+def print_summary(records, out):
+    paths = critical_paths(records)
+    for event_id, (total_us, hops, slowest) in sorted(paths.items(), key=lambda item: -item[1][0]):
+        print(f"{event_id:016x}  {total_us / 1000.0:9.1f} ms", file=out)
+        for stage, session, us in hops:
+            where = f" [{session}]" if session else ""
+            took = f": {us / 1000.0:.1f} ms" if us else ""
+            print(f"    {stage}{where}{took}", file=out)
+        if slowest:
+            print(f"    nejpomalejší: {slowest[0]} ({slowest[2] / 1000.0:.1f} ms)", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="asus-screen-trace")
+    parser.add_argument("rings", nargs="*", help="trace ring files (default: system + own runtime dir)")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    parser.add_argument("--event", help="only this event id (hex)")
+    parser.add_argument("--summary", action="store_true",
+                        help="print each event's path and slowest hop instead of JSON")
+    args = parser.parse_args(argv)
+
+    rings = args.rings or default_rings()
+    records = [record for path in rings for record in read_ring(path)]
+    if args.event:
+        try:
+            wanted = int(args.event, 16)
+        except ValueError:
+            parser.error(f"invalid event id: {args.event}")
+        records = [r for r in records if r.event_id == wanted]
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        if args.summary:
+            print_summary(records, out)
+        else:
+            json.dump(chrome_trace(records), out)
+            out.write("\n")
+    finally:
+        if args.output:
+            out.close()
+    if not records:
+        print(f"Žádné záznamy ({', '.join(rings) or 'žádný kruh'})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
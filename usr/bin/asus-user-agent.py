@@ -1,13 +1,35 @@
 #!/usr/bin/env python3
+import time # Nový import pro čas
+_STARTED = time.monotonic()
 import sys
 import os
 import signal
 import subprocess
 import warnings
-import time # Nový import pro čas
+import threading
 import gettext
 import locale
 
+# Sdílené moduly (/usr/lib/asus-screen-toggle, při vývoji usr/lib ve stromu)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "lib", "asus-screen-toggle"))
+from asus_screen_toggle.keyboard import KeyboardMonitor
+from asus_screen_toggle.config import ConfigStore
+from asus_screen_toggle import apply as layout_apply
+from asus_screen_toggle.backends import create_backend
+from asus_screen_toggle.reconcile import Reconciler
+from asus_screen_toggle.scheduler import TriggerScheduler
+from asus_screen_toggle.state import StateWatcher, write_mode
+from asus_screen_toggle.orientation import OrientationClient, OrientationFilter, OrientationPublisher
+from asus_screen_toggle.layout import uses_orientation, session_backend
+from asus_screen_toggle.plancache import PlanCache
+from asus_screen_toggle.trace import TraceRing, split_reason
+from asus_screen_toggle.stats import AgentStats, FILE_CHANGE
+from asus_screen_toggle.menu import MenuModel, GtkMenuRenderer, DBusMenuExporter, RADIO
+from asus_screen_toggle.ipc import AgentSocketServer
+from asus_screen_toggle.deferred import DeferredInterface
+from asus_screen_toggle.resume import (SleepMonitor, ResumeTracker, RECHECK_DELAY_MS,
+                                      load_last_layout, save_last_layout)
+
 # Nastavení lokalizace
 APP_NAME = "asus-screen-toggle"
 LOCALE_DIR = "/usr/share/locale"
@@ -29,30 +51,64 @@ warnings.filterwarnings("ignore")
 from pydbus.generic import signal as Signal
 
 # --- Importy knihoven ---
-print(_("DEBUG: Načítám knihovny..."))
+# Na startu jen GLib a pydbus (D-Bus Trigger musí odpovídat co nejdřív),
+# Gtk a AppIndicator se načtou až při stavbě tray ikony (_import_tray).
 try:
-    import gi
-    try:
-        gi.require_version('AyatanaAppIndicator3', '0.1')
-        from gi.repository import AyatanaAppIndicator3 as AppIndicator
-    except (ValueError, ImportError):
-        try:
-            gi.require_version('AppIndicator3', '0.1')
-            from gi.repository import AppIndicator3 as AppIndicator
-        except (ValueError, ImportError):
-            print(_("CHYBA: Nenalezena knihovna AppIndicator."))
-            sys.exit(1)
-
-    gi.require_version('Gtk', '3.0')
-    from gi.repository import GLib, Gtk
+    from gi.repository import GLib
     from pydbus import SessionBus
 except Exception as e:
     print(_(f"CHYBA při importu knihoven: {e}"))
     sys.exit(1)
 
+Gtk = None
+AppIndicator = None
+
+
+def _import_tray(need_indicator):
+    """Načte Gtk (a AppIndicator, pokud se použije). Vrací False, když AppIndicator chybí."""
+    global Gtk, AppIndicator
+    import gi
+    if Gtk is None:
+        gi.require_version('Gtk', '3.0')
+        from gi.repository import Gtk as _Gtk
+        Gtk = _Gtk
+    if need_indicator and AppIndicator is None:
+        try:
+            gi.require_version('AyatanaAppIndicator3', '0.1')
+            from gi.repository import AyatanaAppIndicator3 as _AppIndicator
+        except (ValueError, ImportError):
+            try:
+                gi.require_version('AppIndicator3', '0.1')
+                from gi.repository import AppIndicator3 as _AppIndicator
+            except (ValueError, ImportError):
+                print(_("CHYBA: Nenalezena knihovna AppIndicator."))
+                return False
+        AppIndicator = _AppIndicator
+    return True
+
+
+class StartupProfile:
+    """Časy fází startu pro --profile-startup (ms od spuštění procesu)."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.last = _STARTED
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.monotonic()
+        self.phases.append((phase, (now - self.last) * 1000.0, (now - _STARTED) * 1000.0))
+        self.last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print(_("⏱️ Profil startu:"))
+        for phase, took, total in self.phases:
+            print(f"   {phase:<14} {took:8.1f} ms   (celkem {total:8.1f} ms)")
+
 # --- Konfigurace ---
 BUS_NAME = "org.asus.ScreenToggle"
-SCRIPT_PATH = "/usr/bin/asus-check-keyboard-user"
 APP_ID = "asus-screen-toggler"
 ICON_NAME = "input-tablet"
 ICON_PATH = "/usr/share/asus-screen-toggle"
@@ -68,7 +124,6 @@ ICON_TEMP = os.path.join(ICON_PATH, ICON_TEMP_NAME)
 
 STATE_DIR = os.path.expanduser("~/.local/state/asus-check-keyboard")
 STATE_FILE = os.path.join(STATE_DIR, "state")
-CONFIG_FILE = os.path.expanduser("~/.config/asus-screen-toggle/config.conf")
 
 class StatusNotifierItem:
     """
@@ -81,6 +136,7 @@ class StatusNotifierItem:
         <property name="IconName" type="s" access="read"/>
         <property name="IconThemePath" type="s" access="read"/>
         <property name="ItemIsMenu" type="b" access="read"/>
+        <property name="Menu" type="o" access="read"/>
         <property name="ToolTip" type="(sa(iiay)ss)" access="read"/>
 
         <method name="Activate">
@@ -128,7 +184,7 @@ class StatusNotifierItem:
     @property
     def ItemIsMenu(self): return False
     @property
-    def Menu(self): return "/StatusNotifierItem"
+    def Menu(self): return DBusMenuExporter.OBJECT_PATH
     @property
     def ToolTip(self): return (self.icon_name, [], _("Asus Screen Toggle"), _(f"Režim: {self.agent.mode}"))
 
@@ -159,104 +215,215 @@ class AsusAgent:
     <node>
       <interface name="org.asus.ScreenToggle">
         <method name="Trigger"/>
+        <signal name="ApplyCompleted">
+          <arg type="s" name="source"/>
+          <arg type="b" name="ok"/>
+          <arg type="s" name="plan"/>
+          <arg type="d" name="duration_ms"/>
+        </signal>
         <method name="SetMode">
           <arg type="s" name="mode" direction="in"/>
         </method>
         <method name="ReloadConfig"/>
         <method name="Quit"/>
       </interface>
+      <interface name="org.asus.ScreenToggle.Stats">
+        <property name="TriggerCounts" type="a{su}" access="read"/>
+        <property name="SchedulerCounts" type="a{su}" access="read"/>
+        <property name="ReconcileCounts" type="a{su}" access="read"/>
+        <property name="PlanCacheCounts" type="a{su}" access="read"/>
+        <property name="OrientationCounts" type="a{su}" access="read"/>
+        <property name="ApplyHistogram" type="a(uu)" access="read"/>
+        <property name="ApplyCount" type="u" access="read"/>
+        <property name="ApplyFailures" type="u" access="read"/>
+        <property name="LastApplyTimestamp" type="d" access="read"/>
+        <property name="LastApplyResult" type="s" access="read"/>
+        <property name="LastApplyDurationMs" type="d" access="read"/>
+        <property name="StatsSince" type="d" access="read"/>
+        <property name="ResumeCount" type="u" access="read"/>
+        <property name="LastResumeMs" type="d" access="read"/>
+        <property name="LastResumeCorrected" type="b" access="read"/>
+        <method name="Reset"/>
+      </interface>
+    </node>
+    """
+
+    ApplyCompleted = Signal()
+
+    # TriggerAndWait odpovídá až po aplikaci - pydbus odložit odpověď neumí,
+    # rozhraní se registruje přes Gio (asus_screen_toggle.deferred)
+    WAIT_XML = """
+    <node>
+      <interface name="org.asus.ScreenToggle.Wait">
+        <method name="TriggerAndWait">
+          <arg type="s" name="reason" direction="in"/>
+          <arg type="u" name="timeout_ms" direction="in"/>
+          <arg type="b" name="ok" direction="out"/>
+          <arg type="s" name="result" direction="out"/>
+          <arg type="s" name="plan" direction="out"/>
+          <arg type="d" name="duration_ms" direction="out"/>
+        </method>
+      </interface>
     </node>
     """
 
+    # Horní mez čekání v TriggerAndWait a počet pamatovaných výsledků běhů
+    MAX_WAIT_MS = 30000
+    OUTCOME_HISTORY = 16
+
     def __init__(self, quit_callback, bus):
         self.quit_callback = quit_callback
         self.mode = self._load_mode()
-        self.config = self._load_config()
+        # Sloučená konfigurace (/etc, config.conf, user.conf), změny hlásí inotify
+        self.config_store = ConfigStore(callback=self._on_config_changed)
+        self.config = self.config_store.get()
         self.bus = bus
         self.indicator = None
         self.tray_backend = None
         self.menu = None
-        self.temporary_actions = []
-
-        # Pro sledování změn souboru
-        self.last_file_mtime = 0
-        if os.path.exists(STATE_FILE):
-            self.last_file_mtime = os.stat(STATE_FILE).st_mtime
+        self.sni = None
+        self.dbusmenu = None
+
+        # Klávesnice se sleduje v procesu (sysfs + udev), žádný fork skriptu
+        self.keyboard = KeyboardMonitor(self.config.vendor_id, self.config.product_id)
+        self.keyboard.connect(self._on_keyboard_changed)
+        self.keyboard.start()
+
+        # Nejvýš jedna aplikace rozložení současně, bouře triggerů se slučují
+        self.scheduler = TriggerScheduler(self._apply_layout, quiet_ms=self.config.trigger_quiet_ms)
+        self.display_backends = {}
+        # Plány pro všechny kombinace režim × orientace × klávesnice, trigger = jedno vyhledání
+        self.session_kind = session_backend(os.environ.get("XDG_SESSION_TYPE", ""),
+                                            os.environ.get("XDG_CURRENT_DESKTOP", ""))
+        self.plan_cache = PlanCache(self.session_kind, self.config)
+        self.plan_cache.load()
+        self.stats = AgentStats()
+        # $XDG_RUNTIME_DIR/asus-screen-toggle/trace.ring; ID události -> příjem triggeru (ns)
+        self.tracer = TraceRing(enabled=self.config.enable_trace)
+        self._trace_received = {}
+        # Číslo běhu plánovače -> (ok, výsledek, plán JSON, ms) pro TriggerAndWait
+        self.outcomes = {}
+        # Číslo běhu -> [[PendingReply, id časovače]] - odpovědi čekající na běh
+        self.waiters = {}
+        self.wait_interface = None
+        # Poslední úspěšně aplikovaný plán (okamžitá aplikace po probuzení)
+        self.last_good_plan = None
+        self.resume = None
+
+        self.orientation = None
+        self.orientation_filter = None
+        self.orientation_publisher = None
+        self.sleep_monitor = None
+        self.state_watcher = None
+        self.socket_server = None
+
+        # Model menu žije po celou dobu agenta, tray backendy ho jen vykreslují
+        self._build_menu_model()
+
+    # --- Rychlá cesta přes unix socket (dispatcher jako root, bez forků) ---
+    def start_socket(self):
+        self.socket_server = AgentSocketServer(self._on_socket_request)
+        try:
+            self.socket_server.start()
+            print(_(f"🔌 Socket {self.socket_server.path} připraven."))
+        except OSError as e:
+            print(_(f"⚠️ Socket nelze otevřít: {e}"))
+            self.socket_server = None
+
+    def stop_socket(self):
+        if self.socket_server:
+            self.socket_server.stop()
+            self.socket_server = None
+
+    def _on_socket_request(self, command, arg, creds):
+        if command == "TRIGGER":
+            if not self.config.enable_socket:
+                return False, "disabled"
+            if self.mode != "automatic-enabled":
+                return True, f"ignored {self.mode}"
+            self._run_check(f"Socket:{arg or 'UNKNOWN'}")
+            return True, "queued"
+        if command == "MODE":
+            return True, self.mode
+        if command == "LAST":
+            return True, (f"{self.stats.last_apply_result or '-'} {self.stats.last_apply_time:.3f} "
+                          f"{self.stats.last_apply_duration_ms}")
+        if command == "PING":
+            return True, "pong"
+        return False, "unknown command"
+
+    # --- Fáze startu (po publikaci na D-Bus, z hlavní smyčky) ---
+    def start_services(self):
+        # Orientace z iio-sensor-proxy přímo do agenta; akcelerometr se drží,
+        # jen když na rotaci záleží (odpojená klávesnice, režim s rotací)
+        # Surové hodnoty senzoru jdou přes filtr ustálení, dál jen ustálená orientace
+        self.orientation_filter = OrientationFilter(
+            self._on_orientation_changed, stable_ms=self.config.rotation_stable_ms,
+            hysteresis_ms=self.config.rotation_hysteresis_ms,
+            relevant=lambda: uses_orientation(self.keyboard.connected, self.mode))
+        self.orientation = OrientationClient(self.orientation_filter.feed,
+                                             claim_changed=self._on_sensor_claim_changed)
+        # Ustálená orientace pro ostatní procesy ($XDG_RUNTIME_DIR, jeden read())
+        self.orientation_publisher = OrientationPublisher()
+        self._update_sensor_claim()
+
+        # Externí změny stavu (např. z GUI Settings) hlásí inotify, polling jen jako fallback
+        self.state_watcher = StateWatcher(self._monitor_file_change, STATE_FILE)
+        self.state_watcher.start()
+        self.config_store.watch()
+
+        # Probuzení z uspání hlásí logind, agent hned vrátí poslední rozložení
+        self.sleep_monitor = SleepMonitor(self._on_prepare_for_sleep)
+        try:
+            self.sleep_monitor.start()
+        except Exception as e:
+            print(_(f"⚠️ logind nedostupný, rychlá cesta po probuzení vypnuta: {e}"))
+            self.sleep_monitor = None
 
-        if is_kde():
+    def setup_tray(self):
+        if is_kde() and _import_tray(need_indicator=False):
             try:
                 self._setup_sni()
+                self.register_sni_watcher()
+                return
             except Exception as e:
-                print(f_("SNI failed, fallback na AppIndicator: {e}"))
-                self._setup_appindicator()
-                self.tray_backend = "appindicator"
-        else:
+                print(_(f"SNI failed, fallback na AppIndicator: {e}"))
+        if _import_tray(need_indicator=True):
             self._setup_appindicator()
             self.tray_backend = "appindicator"
-
-        # Timer pro sledování externích změn souboru (každé 2s)
-        GLib.timeout_add_seconds(2, self._monitor_file_change)
+        else:
+            print(_("⚠️ Běžím bez tray ikony, ovládání jen přes D-Bus a signály."))
 
     def update_temporary_modes_availability(self):
-        """Aktualizuje citlivost dočasných režimů v menu podle stavu klávesnice."""
-        keyboard_connected = self.is_keyboard_connected()
-        enabled = not keyboard_connected
-
-        if not self.temporary_actions:
+        """Aktualizuje citlivost a zaškrtnutí dočasných režimů v modelu menu."""
+        if getattr(self, "menu_model", None) is None:
             return
-
-        for action in self.temporary_actions:
-            if action:
-                action.set_sensitive(enabled)
+        enabled = not self.is_keyboard_connected()
+        self.menu_model.update({item: (enabled, mode == self.mode)
+                                for mode, item in self.mode_items.items()})
 
     # --- Konfigurace ---
-    def _load_config(self):
-        """
-        Načte konfiguraci s prioritou:
-        1. Defaultní hodnoty (v kódu)
-        2. Systémová konfigurace (/etc/asus-screen-toggle.conf)
-        3. Uživatelská konfigurace (~/.config/asus-screen-toggle/config.conf)
-        """
-        # 1. Defaultní hodnoty
-        cfg = {"enable_dbus": True, "enable_signal": True}
-
-        # Seznam souborů v pořadí, jak se mají aplikovat (poslední vyhrává)
-        config_paths = [
-            "/etc/asus-screen-toggle.conf",
-            os.path.expanduser("~/.config/asus-screen-toggle/config.conf")
-        ]
-
-        for path in config_paths:
-            if os.path.exists(path):
-                try:
-                    print(_(f"⚙️ Načítám soubor: {path}"))
-                    with open(path, 'r') as f:
-                        for line in f:
-                            if "=" in line and not line.strip().startswith("#"):
-                                key, val = line.strip().split("=", 1)
-                                if key.strip().upper() == "ENABLE_DBUS": cfg["enable_dbus"] = (val.strip().lower() == "true")
-                                if key.strip().upper() == "ENABLE_SIGNAL": cfg["enable_signal"] = (val.strip().lower() == "true")
-                except: pass
-        return cfg
+    def _on_config_changed(self, config):
+        print(_("⚙️ Konfigurace změněna, přebírám nové hodnoty"))
+        self.config = config
+        self.plan_cache.set_config(config)
+        self.tracer.enabled = config.enable_trace and self.tracer.path is not None
+        self.keyboard.set_ids(config.vendor_id, config.product_id)
+        self.scheduler.quiet_ms = config.trigger_quiet_ms
+        if self.orientation_filter:
+            self.orientation_filter.configure(config.rotation_stable_ms, config.rotation_hysteresis_ms)
 
     def _monitor_file_change(self):
-        """Kontroluje, zda se soubor nezměnil externě (např. přes GUI Settings)."""
-        if os.path.exists(STATE_FILE):
-            try:
-                mtime = os.stat(STATE_FILE).st_mtime
-                if mtime != self.last_file_mtime:
-                    # Soubor se změnil!
-                    self.last_file_mtime = mtime
-                    new_mode = self._load_mode(silent=True)
-                    if new_mode != self.mode:
-                        print(_(f"🔄 Detekována externí změna stavu -> {new_mode}"))
-                        self.mode = new_mode
-                        self._set_icon_by_mode()
-                        # Zde nespouštíme _run_check, protože předpokládáme,
-                        # že ten kdo soubor změnil (Settings App), už skript spustil nebo spustí.
-                        # Jen aktualizujeme ikonu.
-            except: pass
-        return True # Pokračovat v timeru
+        """Soubor se stavem se změnil externě (např. přes GUI Settings)."""
+        new_mode = self._load_mode(silent=True)
+        if new_mode != self.mode:
+            print(_(f"🔄 Detekována externí změna stavu -> {new_mode}"))
+            self.stats.count_trigger(FILE_CHANGE)
+            self.mode = new_mode
+            self._set_icon_by_mode()
+            # Zde nespouštíme _run_check, protože předpokládáme,
+            # že ten kdo soubor změnil (Settings App), už skript spustil nebo spustí.
+            # Jen aktualizujeme ikonu.
 
     def _load_mode(self, silent=False):
         if os.path.exists(STATE_FILE):
@@ -277,20 +444,85 @@ class AsusAgent:
 
     def _save_mode(self, mode):
         try:
-            os.makedirs(STATE_DIR, exist_ok=True)
-            with open(STATE_FILE, 'w') as f:
-                f.write(mode)
+            write_mode(mode, STATE_FILE)
             print(_(f"💾 Režim '{mode}' uložen do {STATE_FILE}"))
         except Exception as e:
             print(_(f"❌ Chyba configu: {e}"))
 
     # --- D-Bus Metody ---
     def Trigger(self):
-        if not self.config["enable_dbus"]: return "DISABLED_BY_CONFIG"
+        if not self.config.enable_dbus: return "DISABLED_BY_CONFIG"
         if self.mode != "automatic-enabled": return f"IGNORED: Mode is {self.mode}"
         self._run_check("D-Bus")
         return "OK"
 
+    def register_wait(self, connection):
+        """org.asus.ScreenToggle.Wait na cestě agenta (Gio.DBusConnection sběrnice pydbus)."""
+        self.wait_interface = DeferredInterface(connection, "/" + BUS_NAME.replace(".", "/"), self.WAIT_XML,
+                                                {"TriggerAndWait": self.TriggerAndWait})
+        self.wait_interface.register()
+
+    def stop_wait(self):
+        for waiters in self.waiters.values():
+            for reply, timer in waiters:
+                GLib.source_remove(timer)
+                reply.reply(False, "shutdown", "", 0.0)
+        self.waiters = {}
+        if self.wait_interface:
+            self.wait_interface.unregister()
+            self.wait_interface = None
+
+    def TriggerAndWait(self, reply, reason, timeout_ms):
+        """
+        Jako Trigger, ale odpoví až po dokončení aplikace, do které trigger
+        padl: (ok, výsledek, plán jako JSON, doba aplikace v ms).
+        V ručním režimu se nic nespouští - jen se počká na už naplánovaný
+        běh (např. po SetMode), jinak se vrátí 'ignored'. Odpověď se drží
+        v `waiters` a pošle z _record_outcome nebo po vypršení časovače,
+        hlavní smyčka mezitím běží normálně.
+        """
+        if not self.config.enable_dbus:
+            reply.reply(False, "disabled", "", 0.0)
+            return
+        if self.mode == "automatic-enabled":
+            self._run_check(f"D-Bus_Wait:{reason or 'UNKNOWN'}")
+            wanted = self.scheduler.runs + 1
+        elif self.scheduler.busy:
+            running_last = self.scheduler.running and not self.scheduler.pending
+            wanted = self.scheduler.runs if running_last else self.scheduler.runs + 1
+        else:
+            reply.reply(True, f"ignored: mode {self.mode}", "", 0.0)
+            return
+        if wanted in self.outcomes:
+            reply.reply(*self.outcomes[wanted])
+            return
+        timeout_ms = min(int(timeout_ms), self.MAX_WAIT_MS)
+        entry = [reply, None]
+
+        def expire():
+            waiters = self.waiters.get(wanted, [])
+            if entry in waiters:
+                waiters.remove(entry)
+                if not waiters:
+                    del self.waiters[wanted]
+            reply.reply(False, "timeout", "", float(timeout_ms))
+            return False
+
+        entry[1] = GLib.timeout_add(timeout_ms, expire)
+        self.waiters.setdefault(wanted, []).append(entry)
+
+    def _record_outcome(self, source, ok, plan, duration):
+        duration_ms = round(duration * 1000.0, 3)
+        plan_json = plan.to_json() if plan is not None else ""
+        run = self.scheduler.runs
+        outcome = self.outcomes[run] = (ok, "applied" if ok else "failed", plan_json, duration_ms)
+        for old in [r for r in self.outcomes if r <= run - self.OUTCOME_HISTORY]:
+            del self.outcomes[old]
+        for reply, timer in self.waiters.pop(run, []):
+            GLib.source_remove(timer)
+            reply.reply(*outcome)
+        self.ApplyCompleted(source, ok, plan_json, duration_ms)
+
     def SetMode(self, mode_str):
         if mode_str not in ["automatic-enabled", "enforce-primary-only", "enforce-desktop"]: return "ERROR"
         print(_(f"📨 D-Bus SetMode: {mode_str}"))
@@ -300,19 +532,211 @@ class AsusAgent:
         self._run_check("D-Bus_SetMode")
         return _(f"OK: Switched to {mode_str}")
 
+    def ReloadConfig(self):
+        """Ruční reload (D-Bus / SIGHUP) - změny souborů jinak hlásí ConfigStore sám."""
+        self._on_config_changed(self.config_store.get())
+
     def Quit(self):
         print("🛑 Požadavek na ukončení...")
         self.quit_callback()
 
+    # --- D-Bus Stats (jména napříč rozhraními musí být unikátní, pydbus je
+    # rozlišuje jen podle jména) ---
+    @property
+    def TriggerCounts(self): return dict(self.stats.triggers)
+    @property
+    def SchedulerCounts(self): return self.scheduler.stats()
+    @property
+    def ReconcileCounts(self):
+        counts = {}
+        for backend in self.display_backends.values():
+            if backend:
+                for key, value in backend.stats().items():
+                    counts[f"{backend.name}.{key}"] = value
+        return counts
+    @property
+    def PlanCacheCounts(self): return self.plan_cache.stats()
+    @property
+    def OrientationCounts(self): return self.orientation_filter.stats() if self.orientation_filter else {}
+    @property
+    def ApplyHistogram(self): return self.stats.histogram_buckets()
+    @property
+    def ApplyCount(self): return self.stats.applies
+    @property
+    def ApplyFailures(self): return self.stats.failures
+    @property
+    def LastApplyTimestamp(self): return self.stats.last_apply_time
+    @property
+    def LastApplyResult(self): return self.stats.last_apply_result
+    @property
+    def LastApplyDurationMs(self): return self.stats.last_apply_duration_ms
+    @property
+    def StatsSince(self): return self.stats.since
+    @property
+    def ResumeCount(self): return self.stats.resumes
+    @property
+    def LastResumeMs(self): return self.stats.last_resume_ms
+    @property
+    def LastResumeCorrected(self): return self.stats.last_resume_corrected
+
+    def Reset(self):
+        print(_("📊 Statistiky vynulovány"))
+        self.stats.reset()
+
     def _launch_settings(self):
         try: subprocess.Popen(["/usr/bin/asus-screen-settings"])
         except: pass
         return False
 
     def _run_check(self, source="Internal"):
-        print(_(f"🚀 Spouštím logiku ({source})..."))
-        try: subprocess.Popen([SCRIPT_PATH])
-        except: pass
+        reason, event_ids = split_reason(source)
+        # Čítače podle zdroje bez ID události
+        self.stats.count_trigger(reason)
+        if event_ids and self.tracer.enabled:
+            self.tracer.mark(event_ids, "agent:trigger", reason)
+            now = time.monotonic_ns()
+            for event_id in event_ids:
+                self._trace_received.setdefault(event_id, now)
+        if self.scheduler.busy:
+            print(_(f"🧮 Trigger ({source}) sloučen s probíhající aplikací"))
+        else:
+            print(_(f"🚀 Spouštím logiku ({source})..."))
+        self.scheduler.trigger(source)
+
+    def _apply_layout(self, source, done):
+        """Runner pro TriggerScheduler - stav se čte až teď, tedy ten poslední."""
+        reason, event_ids = split_reason(source)
+        for event_id in event_ids:
+            received = self._trace_received.pop(event_id, None)
+            if received is not None:
+                self.tracer.span([event_id], "agent:queue", reason, start_ns=received)
+        # Plán se počítá v procesu (bez bashe a lsusb), jen samotná
+        # transakce backendu běží ve vlákně, aby neblokovala GTK smyčku
+        started = time.monotonic()
+        cached = None
+        if self.resume and self.resume.phase == "instant" and self.resume.owns(self.scheduler.runs):
+            # Po probuzení bez čekání na klávesnici a senzor - ověří se až v _resume_recheck
+            cached = self.last_good_plan or load_last_layout()
+        try:
+            if cached:
+                plan = cached
+            else:
+                # Před start_services senzor ještě není - jako by nebyl převzatý
+                sensor = getattr(self, "orientation", None)
+                orientation = self.orientation_filter.orientation if sensor and sensor.claimed else None
+                connected = self.keyboard.connected
+                # Bez převzatého senzoru (a orientace potřebné) dopočítá build_plan ze souboru
+                if orientation is not None or not uses_orientation(connected, self.mode):
+                    plan = self.plan_cache.lookup(connected, self.mode, orientation or "")
+                else:
+                    plan = None
+            if plan is None:
+                plan = layout_apply.build_plan(self.keyboard.connected, user_mode=self.mode,
+                                               orientation=orientation, config=self.config)
+        except Exception as e:
+            print(_(f"❌ Chyba výpočtu plánu: {e}"))
+            self.stats.record_apply(time.monotonic() - started, False)
+            self._record_outcome(source, False, None, time.monotonic() - started)
+            done(False)
+            return
+
+        if plan.revert_to and not cached:
+            print(_(f"⌨️ Klávesnice připojena → návrat do režimu {plan.revert_to}"))
+            self.mode = plan.revert_to
+            self._save_mode(plan.revert_to)
+            self._set_icon_by_mode()
+
+        backend = self._display_backend(plan.backend)
+
+        def worker():
+            skipped = backend.skipped if backend else 0
+            ok = layout_apply.apply_plan(plan, backend) if backend else False
+            # Reconciler nic neposlal = displeje už byly ve správném stavu
+            changed = bool(backend) and backend.skipped == skipped
+            GLib.idle_add(self._on_apply_done, source, ok, done, time.monotonic() - started, plan, changed)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _display_backend(self, kind):
+        """Backend žije po celou dobu agenta - model výstupů se nenačítá při každé aplikaci."""
+        if kind not in self.display_backends:
+            display = create_backend(kind)
+            cache = self.plan_cache if kind == self.plan_cache.backend else None
+            self.display_backends[kind] = Reconciler(display, plan_cache=cache) if display else None
+        return self.display_backends[kind]
+
+    def _on_apply_done(self, source, ok, done, duration, plan=None, changed=True):
+        reason, event_ids = split_reason(source)
+        if event_ids:
+            self.tracer.span(event_ids, "agent:apply", reason,
+                             start_ns=time.monotonic_ns() - int(duration * 1e9), ok=ok)
+        self.stats.record_apply(duration, ok)
+        self._record_outcome(source, ok, plan, duration)
+        if ok and plan is not None:
+            self._remember_plan(plan)
+        self._advance_resume(changed)
+        stats = self.scheduler.stats()
+        print(_(f"{'✅' if ok else '❌'} Aplikace dokončena ({source}) - triggery: {stats['received']}, "
+                f"sloučeno: {stats['merged']}, běhů: {stats['runs']}"))
+        for backend in self.display_backends.values():
+            if backend:
+                r = backend.stats()
+                print(_(f"🖥️ Backend {backend.name}: aplikováno {r['applied']}, přeskočeno {r['skipped']}, "
+                        f"zmenšeno {r['reduced']}"))
+        done(ok)
+        return False
+
+    def _remember_plan(self, plan):
+        if plan == self.last_good_plan:
+            return
+        self.last_good_plan = plan
+        try:
+            save_last_layout(plan)
+        except OSError as e:
+            print(_(f"⚠️ Nelze uložit poslední rozložení: {e}"))
+
+    # --- Probuzení: uložený plán hned, ověření klávesnice a orientace potom ---
+    def _on_prepare_for_sleep(self, sleeping):
+        if sleeping:
+            print(_("💤 Systém se uspává"))
+            self.resume = None
+            return
+        print(_("⏰ Probuzení - aplikuji poslední rozložení"))
+        self.resume = ResumeTracker()
+        # Firmware mohl výstupy přepnout, model backendů už neplatí
+        for backend in self.display_backends.values():
+            if backend:
+                backend.backend.invalidate()
+        self._run_check("Resume")
+        # Trigger padne vždy do příštího běhu (probíhající běh ho odloží za sebe)
+        self.resume.run = self.scheduler.runs + 1
+
+    def _advance_resume(self, changed):
+        # Jen běh, který probuzení spustilo - ne aplikace, která už běžela
+        if self.resume is None or not self.resume.owns(self.scheduler.runs):
+            return
+        if self.resume.phase == "instant":
+            self.resume.instant_done()
+            print(_(f"⏱️ Po probuzení: uložené rozložení za {self.resume.instant_ms:.1f} ms"))
+            GLib.timeout_add(RECHECK_DELAY_MS, self._resume_recheck)
+        elif self.resume.phase == "recheck":
+            corrected = changed
+            ms = self.resume.recheck_done(corrected)
+            self.stats.record_resume(ms, corrected)
+            print(_(f"⏱️ Po probuzení: správný displej za {ms:.1f} ms"
+                    f"{' (opraveno po ověření)' if corrected else ''}"))
+            self.resume = None
+
+    def _resume_recheck(self):
+        if self.resume is None or self.resume.phase != "waiting":
+            return False
+        self.keyboard.rescan()
+        if self.orientation:
+            self.orientation.refresh()
+        self.resume.recheck_started()
+        self._run_check("ResumeRecheck")
+        self.resume.run = self.scheduler.runs + 1
+        return False
 
     def _set_icon_by_mode(self):
         #"automatic-enabled", "automatic-disabled", "temp-desktop",
@@ -321,6 +745,7 @@ class AsusAgent:
 
         # Update dostupnosti menu prvků při každé změně ikony/stavu
         self.update_temporary_modes_availability()
+        self._update_sensor_claim()
 
         if self.tray_backend == "sni":
             if self.mode.startswith("temp-"): self.sni.set_icon(ICON_TEMP_NAME)
@@ -346,101 +771,84 @@ class AsusAgent:
             try: self.indicator.set_icon(icon_to_set)
             except: self.indicator.set_icon(ICON_NAME)
 
-    def _on_mode_change(self, widget, mode_name):
-        if widget.get_active():
-            self.mode = mode_name
-            self._save_mode(mode_name)
-            self._set_icon_by_mode()
-            self._run_check("MenuChange")
-
-    def _build_menu(self):
-        menu = Gtk.Menu()
-        self.temporary_actions = [] # Vyčistit seznam pro čerstvé reference
-
-        item = Gtk.MenuItem(label=_("Asus Screen Control"))
-        item.set_sensitive(False)
-        menu.append(item)
-        menu.append(Gtk.SeparatorMenuItem())
-
-#         --- HLAVNÍ REŽIMY ---
-#         r_auto = Gtk.RadioMenuItem(label=_("🤖🖥️🖥️ Both Displays (Automatic)"))
-#         r_auto.connect("toggled", self._on_mode_change, "automatic-enabled")
-#         menu.append(r_auto)
-#
-#         group = r_auto.get_group()
-#         r_prim = Gtk.RadioMenuItem(label=_("💻 Primary Display Only"), group=group[0])
-#         r_prim.connect("toggled", self._on_mode_change, "automatic-disabled")
-#         menu.append(r_prim)
-
-        group = None
+    def _on_mode_change(self, mode_name):
+        if mode_name == self.mode:
+            return
+        self.mode = mode_name
+        self._save_mode(mode_name)
+        self._set_icon_by_mode()
+        self._run_check("MenuChange")
 
-        menu.append(Gtk.SeparatorMenuItem())
+    def _build_menu_model(self):
+        model = MenuModel()
+        model.add(_("Asus Screen Control"), enabled=False)
+        model.separator()
+        model.separator()
 
         # --- DOČASNÉ REŽIMY ---
-        temp_label = Gtk.MenuItem(label=_("🕒 Temporary Modes (tablet mode only)"))
-        temp_label.set_sensitive(False)
-        menu.append(temp_label)
-
-        # Pomocná funkce pro přidání dočasného prvku
-        def add_temp_item(label, mode, group = None):
-            m_item = Gtk.RadioMenuItem(label=label, group=group[0] if group else None)
-            m_item.connect("toggled", self._on_mode_change, mode)
-            menu.append(m_item)
-            self.temporary_actions.append(m_item)
-            return m_item
-
-        m_desktop = add_temp_item(_("🖥️🖥️ Both Displays (Desktop)"), "temp-desktop")
-        group = m_desktop.get_group()
-        m_mirror = add_temp_item(_("🪞 Mirror"), "temp-mirror", group)
-        m_rev_mirror = add_temp_item(_("🙃 Reverse Mirror (180°)"), "temp-reverse-mirror", group)
-        m_rot_desk = add_temp_item(_("🔄 Reverse Desktop"), "temp-rotated-desktop", group)
-        m_temp_prim = add_temp_item(_("🚫 Primary Only"), "temp-primary-only", group)
-        m_temp_sec = add_temp_item(_("📺 Secondary Only"), "temp-secondary-only", group)
-
-        # Nastavení aktivního prvku
-        modes_map = {
-            # "automatic-enabled": r_auto,
-            # "automatic-disabled": r_prim,
-            "temp-desktop": m_desktop,
-            "temp-mirror": m_mirror,
-            "temp-reverse-mirror": m_rev_mirror,
-            "temp-rotated-desktop": m_rot_desk,
-            "temp-primary-only": m_temp_prim,
-            "temp-secondary-only": m_temp_sec
-        }
-        active_widget = modes_map.get(self.mode)
-        if active_widget:
-            active_widget.set_active(True)
-
-        # Aktualizovat sensitive stav hned při buildu
+        model.add(_("🕒 Temporary Modes (tablet mode only)"), enabled=False)
+        self.mode_items = {}
+        for label, mode in (
+            (_("🖥️🖥️ Both Displays (Desktop)"), "temp-desktop"),
+            (_("🪞 Mirror"), "temp-mirror"),
+            (_("🙃 Reverse Mirror (180°)"), "temp-reverse-mirror"),
+            (_("🔄 Reverse Desktop"), "temp-rotated-desktop"),
+            (_("🚫 Primary Only"), "temp-primary-only"),
+            (_("📺 Secondary Only"), "temp-secondary-only"),
+        ):
+            self.mode_items[mode] = model.add(label, RADIO, action=lambda m=mode: self._on_mode_change(m))
+
+        model.separator()
+        model.separator()
+        model.add(_("⚙️ Settings"), action=self._launch_settings)
+        model.add(_("Check Status"), action=self._run_check)
+        model.separator()
+        model.add(_("Quit"), action=self.Quit)
+
+        self.menu_model = model
         self.update_temporary_modes_availability()
 
-        menu.append(Gtk.SeparatorMenuItem())
-
-        menu.append(Gtk.SeparatorMenuItem())
-        item_sets = Gtk.MenuItem(label=_("⚙️ Settings"))
-        item_sets.connect("activate", lambda _: self._launch_settings())
-        menu.append(item_sets)
-
-        item_check = Gtk.MenuItem(label=_("Check Status"))
-        item_check.connect("activate", lambda _: self._run_check())
-        menu.append(item_check)
+    def is_keyboard_connected(self):
+        return self.keyboard.connected
 
-        menu.append(Gtk.SeparatorMenuItem())
+    def _on_keyboard_changed(self, connected):
+        print(_(f"⌨️ Klávesnice {'připojena' if connected else 'odpojena'}"))
+        self.update_temporary_modes_availability()
+        self._update_sensor_claim()
 
-        item_quit = Gtk.MenuItem(label=_("Quit"))
-        item_quit.connect("activate", lambda _: self.Quit())
-        menu.append(item_quit)
+    def _update_sensor_claim(self):
+        if getattr(self, "orientation", None) is None:
+            return
+        try:
+            if uses_orientation(self.keyboard.connected, self.mode):
+                if not self.orientation.claimed:
+                    self.orientation.claim()
+                    print(_(f"🧭 Akcelerometr převzat, orientace: {self.orientation.orientation}"))
+                # Hodnota ze senzoru, kterou filtr zahodil jako nepodstatnou, teď platí
+                self.orientation_filter.resync()
+                self.orientation_publisher.publish(self.orientation_filter.orientation, True)
+            elif self.orientation.wanted:
+                # I neúspěšný claim - jinak by ho objevení proxy později dokončilo
+                self.orientation.release()
+                self.orientation_publisher.publish(self.orientation_filter.orientation, False)
+                print(_("🧭 Akcelerometr uvolněn"))
+        except Exception as e:
+            print(_(f"⚠️ iio-sensor-proxy nedostupný: {e}"))
 
-        menu.show_all()
-        return menu
+    def _on_sensor_claim_changed(self, claimed):
+        """iio-sensor-proxy zmizela (claim ztracen) nebo se vrátila a claim se obnovil."""
+        if claimed:
+            print(_("🧭 Akcelerometr znovu převzat"))
+            self.orientation_filter.resync()
+        else:
+            print(_("🧭 Akcelerometr ztracen, iio-sensor-proxy skončila"))
+        self.orientation_publisher.publish(self.orientation_filter.orientation, claimed)
 
-    def is_keyboard_connected(self):
-        result = subprocess.run(
-            ["asus-check-keyboard-user", "--keyboard-connected"],
-            stdout=subprocess.DEVNULL
-        )
-        return result.returncode == 0
+    def _on_orientation_changed(self, orientation):
+        print(_(f"🧭 Nová orientace: {orientation}"))
+        self.orientation_publisher.publish(orientation, self.orientation.claimed)
+        if uses_orientation(self.keyboard.connected, self.mode):
+            self._run_check("Rotation")
 
 
     def _setup_appindicator(self):
@@ -448,13 +856,17 @@ class AsusAgent:
             APP_ID, ICON_NAME, AppIndicator.IndicatorCategory.HARDWARE
         )
         self._set_icon_by_mode()
-        self.indicator.set_menu(self._build_menu())
+        self.menu = GtkMenuRenderer(self.menu_model)
+        self.indicator.set_menu(self.menu.menu)
 
     def _setup_sni(self):
         print(_("🔵 Inicializuji KDE StatusNotifierItem (SNI)"))
         self.sni = StatusNotifierItem(self)
         try:
             self.bus.register_object("/StatusNotifierItem", self.sni, None)
+            # Menu pro KDE jako com.canonical.dbusmenu - vykresluje ho plasma sama
+            self.dbusmenu = DBusMenuExporter(self.menu_model)
+            self.bus.register_object(DBusMenuExporter.OBJECT_PATH, self.dbusmenu, None)
             self.tray_backend = "sni"
             self._set_icon_by_mode()
             print(_("✅ SNI objekt vytvořen."))
@@ -475,10 +887,11 @@ class AsusAgent:
 
     def _show_gtk_menu(self, button):
         try:
-            self.menu = self._build_menu()
-            self.update_temporary_modes_availability()
-            self.menu.show_all()
-            self.menu.popup(None, None, None, None, 0, 0)
+            # Záložní Gtk menu (hostitel bez dbusmenu) se staví až při prvním
+            # otevření, stav položek pak drží model
+            if self.menu is None:
+                self.menu = GtkMenuRenderer(self.menu_model)
+            self.menu.menu.popup(None, None, None, None, 0, 0)
         except Exception as e:
             print(_(f"❌ Chyba při zobrazování menu: {e}"))
         return False
@@ -489,20 +902,33 @@ def is_kde():
 
 # --- Main Boilerplate ---
 loop = None
+agent = None
 publication = None
 
 def quit_app(*args):
     global publication, loop
     print(_("\n🧹 Ukončuji..."))
+    if agent:
+        agent.stop_socket()
+        agent.stop_wait()
+        if agent.sleep_monitor:
+            agent.sleep_monitor.stop()
+        if agent.orientation_publisher:
+            agent.orientation_publisher.close()
+        agent.tracer.close()
     if publication:
         try: publication.unpublish()
         except: pass
-    if loop: Gtk.main_quit()
-    sys.exit(0)
+        publication = None
+    if loop:
+        loop.quit()
+    else:
+        sys.exit(0)
+    return False
 
 def signal_handler():
     # <--- NOVÉ: Kontrola konfigurace pro signály (včetně systémového skriptu)
-    if not agent.config["enable_signal"]:
+    if not agent.config.enable_signal:
         print(_("📩 Signál SIGUSR1 ZAMÍTNUT (vypnuto v configu)."))
         return True
 
@@ -517,10 +943,18 @@ def sighup_handler():
     """Obsluha signálu SIGHUP - Reload konfigurace."""
     print(_("🔄 Signál SIGHUP přijat: Znovunačítám konfiguraci..."))
     # Zavoláme metodu agenta, která načte soubory znovu
-    agent.config = agent._load_config()
+    agent.ReloadConfig()
     return True # Musí vracet True, aby naslouchání pokračovalo
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(prog="asus-user-agent")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print a per-phase startup timing breakdown")
+    args = parser.parse_args()
+    profile = StartupProfile(args.profile_startup)
+    profile.mark("imports")
+
     bus = SessionBus()
 
     dbus_sys = bus.get("org.freedesktop.DBus", "/org/freedesktop/DBus")
@@ -528,30 +962,50 @@ if __name__ == "__main__":
         print(_(f"⚠️ Agent už běží."))
         sys.exit(0)
 
+    # Fáze 1: jádro agenta a publikace - od teď odpovídá Trigger/SetMode
     agent = AsusAgent(quit_callback=quit_app, bus=bus)
+    profile.mark("core")
 
     try:
+        # Rozhraní s odloženou odpovědí dřív než jméno, ať je hned dostupné
+        agent.register_wait(bus.con)
         publication = bus.publish(BUS_NAME, agent)
         print(_(f"✅ D-Bus jméno {BUS_NAME} získáno."))
-        agent.register_sni_watcher()
     except Exception as e:
         print(_(f"❌ Start selhal: {e}"))
         sys.exit(1)
+    agent.start_socket()
+    profile.mark("publish")
 
     GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, signal_handler)
     GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGHUP, sighup_handler)
     GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGTERM, quit_app)
     GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGINT, quit_app)
 
+    # Fáze 2 a 3 až z hlavní smyčky, aby nezdržely první trigger
+    def deferred_services():
+        agent.start_services()
+        profile.mark("services")
+        return False
+
+    def deferred_tray():
+        try:
+            agent.setup_tray()
+        except Exception as e:
+            print(_(f"❌ Tray ikonu nelze vytvořit: {e}"))
+        profile.mark("tray")
+        profile.report()
+        return False
+
+    GLib.idle_add(deferred_services)
+    GLib.idle_add(deferred_tray, priority=GLib.PRIORITY_LOW)
+
     print(_(f"✅ Asus Agent GUI spuštěn."))
     print(_(f"   Režim: {agent.mode}"))
     print(_(f"   PID: {os.getpid()}"))
 
-    # Hlavní smyčka v bloku try/finally pro jistotu
+    loop = GLib.MainLoop()
     try:
-        loop = Gtk.main()
+        loop.run()
     except KeyboardInterrupt:
         quit_app()
-    finally:
-        # Záchranná brzda, kdyby Gtk.main() spadlo jinak
-        pass
@@ -0,0 +1,3 @@
+# Sdílené moduly Asus Screen Toggle (agent, nastavení, dispatcher).
+# Instalují se do /usr/lib/asus-screen-toggle, skripty v /usr/bin si cestu
+# přidávají do sys.path samy.
@@ -0,0 +1,163 @@
+import argparse
+import gettext
+import os
+import sys
+import time
+
+from .backends import create_backend
+from .config import load_config
+from .keyboard import scan_sysfs
+from .layout import compute_plan, session_backend, uses_orientation
+from .orientation import current_orientation
+from .reconcile import Reconciler
+from .resume import save_last_layout
+from .state import read_mode, write_mode
+from .trace import TraceRing, split_reason
+
+# Sběr vstupů pro layout.compute_plan a aplikace plánu přes zobrazovací
+# backend (backends.py). Spouští se buď v procesu agenta, nebo přes
+# asus-check-keyboard-user (python3 -m asus_screen_toggle.apply).
+
+APP_NAME = "asus-screen-toggle"
+
+
+def _(message):
+    return gettext.dgettext(APP_NAME, message)
+
+
+# --- Vstupy ---
+
+def read_orientation():
+    """Orientace ze sdíleného stavu agenta / systémové služby - jeden read(), žádný senzor."""
+    return current_orientation()
+
+
+def build_plan(keyboard_connected, user_mode=None, orientation=None, config=None, env=None):
+    """Posbírá chybějící vstupy (stav, senzor, sezení, konfig) a spočítá plán."""
+    config = config or load_config()
+    env = os.environ if env is None else env
+    if user_mode is None:
+        user_mode = read_mode()
+    if orientation is None:
+        orientation = read_orientation() if uses_orientation(keyboard_connected, user_mode) else ""
+    backend = session_backend(env.get("XDG_SESSION_TYPE", ""), env.get("XDG_CURRENT_DESKTOP", ""))
+    return compute_plan(keyboard_connected, user_mode, orientation, backend,
+                        preferred_mode=config.preferred_mode,
+                        primary=config.primary_display,
+                        secondary=config.secondary_display)
+
+
+# --- Aplikace ---
+
+def _applying_message(name, dual):
+    # Doslovné msgid (shodné s původními shellovými skripty), aby je xgettext
+    # našel a zůstaly platné stávající překlady
+    if name == "x11":
+        return _("Aplikuji: Dual Screen (X11) - %s") if dual else _("Aplikuji: Single Screen (X11)")
+    if name == "kde":
+        return _("Aplikuji: Dual Screen (KDE) - %s") if dual else _("Aplikuji: Single Screen (KDE)")
+    if name == "wlr":
+        return _("Aplikuji: Dual Screen (Wlr) - %s") if dual else _("Aplikuji: Single Screen (Wlr)")
+    return None
+
+
+def apply_plan(plan, backend=None):
+    """
+    Aplikuje plán v aktuálním sezení jednou transakcí backendu (jen rozdíl
+    proti skutečnému stavu). Agent předává svůj dlouhodobý backend, CLI si
+    vytvoří vlastní. Vrací True, pokud vše proběhlo.
+    """
+    if backend is None:
+        display = create_backend(plan.backend)
+        if display is None:
+            return False
+        backend = Reconciler(display)
+
+    message = _applying_message(backend.name, plan.dual)
+    if message and plan.dual:
+        print(message % plan.rotation)
+    elif message and not plan.mirror:
+        print(message)
+    return backend.apply_plan(plan)
+
+
+def _mode_message(mode):
+    # Doslovné msgid jako u _applying_message - překlad se hledá až při volání
+    return {
+        "automatic-disabled": _("Preferováno: Pouze primární displej"),
+        "automatic-enabled": _("Režim Auto: Klávesnice rozhoduje"),
+        "temp-desktop": _("Režim: Desktop (oba displeje)"),
+        "enforce-desktop": _("Režim: Desktop (oba displeje)"),
+        "temp-mirror": _("Dočasně: Zrcadlení"),
+        "temp-reverse-mirror": _("Dočasně: Reverzní zrcadlení (180°)"),
+        "temp-rotated-desktop": _("Dočasně: Otočený Desktop (spodní 180°)"),
+        "temp-primary-only": _("Dočasně: Pouze hlavní"),
+        "temp-secondary-only": _("Dočasně: Pouze sekundární"),
+    }.get(mode)
+
+
+def print_plan_summary(plan, config):
+    print(_("VID: %s, PID: %s") % (config.vendor_id, config.product_id))
+    print(_("User mode: %s") % plan.mode)
+    print(_("Sensor: %s") % plan.orientation)
+    if plan.keyboard_connected:
+        print(_("Fyzická klávesnice: PŘIPOJENA"))
+    else:
+        print(_("Fyzická klávesnice: ODPOJENA"))
+    if plan.revert_to:
+        print(_("Klávesnice připojena → návrat do automatického režimu"))
+    message = _mode_message(plan.mode)
+    if message:
+        print(message)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="asus-check-keyboard-user")
+    parser.add_argument("--keyboard-connected", action="store_true",
+                        help="exit 0 if the keyboard is attached, 1 otherwise")
+    parser.add_argument("--plan", action="store_true",
+                        help="print the computed layout plan as JSON without applying it")
+    args = parser.parse_args(argv)
+    started = time.monotonic_ns()
+
+    config = load_config()
+    keyboard_connected = bool(scan_sysfs(config.vendor_id, config.product_id))
+    if args.keyboard_connected:
+        return 0 if keyboard_connected else 1
+
+    plan = build_plan(keyboard_connected, config=config)
+    if args.plan:
+        print(plan.to_json(indent=2))
+        return 0
+
+    print_plan_summary(plan, config)
+    if plan.revert_to:
+        try:
+            write_mode(plan.revert_to)
+        except OSError as e:
+            print(e, file=sys.stderr)
+
+    if os.environ.get("USER") == "sddm":
+        return 0
+    if not plan.backend:
+        return 0
+    ok = apply_plan(plan)
+    # Přímé volání z dispatcheru nese ID události v ASUS_TRACE_REASON
+    reason, event_ids = split_reason(os.environ.get("ASUS_TRACE_REASON", ""))
+    if event_ids:
+        tracer = TraceRing(enabled=config.enable_trace)
+        tracer.span(event_ids, "user:apply", reason, os.environ.get("XDG_SESSION_ID", ""),
+                    start_ns=started, ok=ok)
+        tracer.close()
+    if not ok:
+        return 1
+    try:
+        # Pro okamžitou aplikaci po probuzení (resume.py)
+        save_last_layout(plan)
+    except OSError as e:
+        print(e, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
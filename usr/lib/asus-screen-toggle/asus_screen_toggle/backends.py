@@ -0,0 +1,425 @@
+import copy
+import json
+import re
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, replace
+
+# Zobrazovací backendy. Každý drží model výstupů (načtený jednou, pak jen
+# aktualizovaný po vlastních změnách nebo signálu) a celé rozložení aplikuje
+# jednou transakcí:
+#   x11  - jedno volání xrandr se všemi výstupy
+#   kde  - KScreen backend přes D-Bus (getConfig/setConfig), fallback jedno kscreen-doctor
+#   wlr  - jedno volání wlr-randr (= jedna wlr-output-management konfigurace)
+#   fake - v paměti, pro testy a benchmarky
+
+ROTATIONS = ("normal", "left", "inverted", "right")
+
+
+@dataclass
+class OutputState:
+    name: str
+    enabled: bool = True
+    rotation: str = "normal"
+    x: int = None
+    y: int = None
+    width: int = 0      # velikost módu (bez rotace)
+    height: int = 0
+    scale: float = 1.0
+    mirror_of: str = ""
+
+    def logical_size(self, rotation=None):
+        rotation = rotation or self.rotation
+        w, h = self.width, self.height
+        if rotation in ("left", "right"):
+            w, h = h, w
+        scale = self.scale or 1.0
+        return int(round(w / scale)), int(round(h / scale))
+
+
+def run_command(argv):
+    """Spustí příkaz, vrátí stdout, nebo None při chybě."""
+    try:
+        res = subprocess.run(argv, stdout=subprocess.PIPE, text=True)
+    except OSError as e:
+        print(f"{argv[0]}: {e}", file=sys.stderr)
+        return None
+    if res.returncode != 0:
+        print(f"{argv[0]}: exit {res.returncode}", file=sys.stderr)
+        return None
+    return res.stdout
+
+
+def target_layout(plan, outputs):
+    """
+    LayoutPlan + model výstupů -> {jméno: OutputState} s absolutními pozicemi.
+    Pokud velikosti výstupů neznáme, zůstanou pozice v dual režimu None a
+    backend použije relativní umístění (plan.placement).
+    """
+    p, s = plan.primary, plan.secondary
+    prim = OutputState(p, enabled=plan.enable_primary, rotation=plan.primary_rotation)
+    sec = OutputState(s, enabled=plan.enable_secondary, rotation=plan.secondary_rotation)
+
+    if plan.mirror and plan.enable_primary and plan.enable_secondary:
+        prim.x = prim.y = sec.x = sec.y = 0
+        sec.mirror_of = p
+    elif plan.dual:
+        if p in outputs and s in outputs and outputs[p].width and outputs[s].width:
+            pw, ph = outputs[p].logical_size(prim.rotation)
+            sw, sh = outputs[s].logical_size(sec.rotation)
+            positions = {
+                "above": ((0, 0), (0, ph)),
+                "below": ((0, sh), (0, 0)),
+                "left-of": ((0, 0), (pw, 0)),
+                "right-of": ((sw, 0), (0, 0)),
+            }
+            (prim.x, prim.y), (sec.x, sec.y) = positions[plan.placement]
+    else:
+        for out in (prim, sec):
+            if out.enabled:
+                out.x = out.y = 0
+    return {p: prim, s: sec}
+
+
+class DisplayBackend:
+    name = ""
+
+    def __init__(self, run=run_command):
+        self.run = run
+        self.outputs = {}
+        self.transactions = 0
+        self.refreshed_at = None
+        # True, pokud model udržují signály (KScreen) - pak se nemusí ověřovat
+        self.live = False
+        # True, pokud model zná skutečné zrcadlení (mirror_of), ne jen překryv na 0,0
+        self.reports_mirror = False
+
+    def refresh(self):
+        """Znovu načte model výstupů z kompozitoru / X serveru."""
+        self.outputs = self._query() or {}
+        self.refreshed_at = time.monotonic()
+        return self.outputs
+
+    def invalidate(self):
+        self.outputs = {}
+        self.refreshed_at = None
+
+    def apply_plan(self, plan):
+        if not self.outputs:
+            self.refresh()
+        return self.apply(target_layout(plan, self.outputs), plan.placement)
+
+    def apply(self, target, placement=""):
+        """Aplikuje celé rozložení jednou transakcí a aktualizuje model."""
+        ok = self._commit(target, placement)
+        if ok:
+            self.transactions += 1
+            for name, state in target.items():
+                current = self.outputs.get(name, OutputState(name))
+                self.outputs[name] = replace(current, enabled=state.enabled, rotation=state.rotation,
+                                             x=state.x, y=state.y, mirror_of=state.mirror_of)
+        else:
+            self.invalidate()
+        return ok
+
+    def _query(self):
+        raise NotImplementedError
+
+    def _commit(self, target, placement):
+        raise NotImplementedError
+
+
+class FakeBackend(DisplayBackend):
+    """Backend v paměti: model je `actual`, každá transakce se zapíše do `log`."""
+    name = "fake"
+
+    def __init__(self, outputs=None, delay=0.0):
+        super().__init__(run=None)
+        self.reports_mirror = True
+        self.actual = {o.name: o for o in (outputs or [
+            OutputState("eDP-1", width=2880, height=1800, x=0, y=0),
+            OutputState("eDP-2", width=2880, height=1800, x=0, y=1800),
+        ])}
+        self.delay = delay
+        self.log = []
+
+    def _query(self):
+        return copy.deepcopy(self.actual)
+
+    def _commit(self, target, placement):
+        if self.delay:
+            time.sleep(self.delay)
+        self.log.append(copy.deepcopy(target))
+        for name, state in target.items():
+            current = self.actual.get(name, OutputState(name))
+            self.actual[name] = replace(current, enabled=state.enabled, rotation=state.rotation,
+                                        x=state.x, y=state.y, mirror_of=state.mirror_of)
+        return True
+
+
+# --- X11 ---
+
+_XRANDR_OUTPUT_RE = re.compile(
+    r"^(\S+) (connected|disconnected)(?: primary)?"
+    r"(?: (\d+)x(\d+)\+(-?\d+)\+(-?\d+))?(?: (normal|left|inverted|right))? ?\(")
+_XRANDR_MODE_RE = re.compile(r"^\s+(\d+)x(\d+)\S*\s+(.*)$")
+
+
+def parse_xrandr_query(text):
+    outputs = {}
+    current = None
+    for line in (text or "").splitlines():
+        m = _XRANDR_OUTPUT_RE.match(line)
+        if m:
+            name, status, w, h, x, y, rotation = m.groups()
+            if status != "connected":
+                current = None
+                continue
+            current = OutputState(name, enabled=w is not None, rotation=rotation or "normal",
+                                  x=int(x) if x is not None else None, y=int(y) if y is not None else None)
+            outputs[name] = current
+            continue
+        m = _XRANDR_MODE_RE.match(line)
+        if m and current is not None:
+            # Aktuální mód (*) má přednost před preferovaným (+)
+            if "*" in m.group(3) or ("+" in m.group(3) and not current.width):
+                current.width, current.height = int(m.group(1)), int(m.group(2))
+    # --same-as dá klonu stejný počátek i velikost jako zdroji; pouhý překryv
+    # výstupů s jiným módem zrcadlení není
+    enabled = [o for o in outputs.values() if o.enabled and o.x is not None]
+    for i, out in enumerate(enabled):
+        for source in enabled[:i]:
+            if (source.x, source.y, source.width, source.height, source.rotation) == \
+                    (out.x, out.y, out.width, out.height, out.rotation) and not source.mirror_of:
+                out.mirror_of = source.name
+                break
+    return outputs
+
+
+class XRandrBackend(DisplayBackend):
+    name = "x11"
+
+    def __init__(self, run=run_command):
+        super().__init__(run)
+        self.reports_mirror = True
+
+    def _query(self):
+        return parse_xrandr_query(self.run(["xrandr", "--query"]))
+
+    def _commit(self, target, placement):
+        argv = ["xrandr"]
+        names = list(target)
+        for name in names:
+            out = target[name]
+            argv += ["--output", name]
+            if not out.enabled:
+                argv.append("--off")
+                continue
+            argv += ["--auto", "--rotate", out.rotation]
+            if out.mirror_of:
+                argv += ["--same-as", out.mirror_of]
+            elif out.x is not None:
+                argv += ["--pos", f"{out.x}x{out.y}"]
+            elif placement and name == names[0]:
+                argv += ["--" + placement, names[1]]
+        return self.run(argv) is not None
+
+
+# --- wlroots ---
+
+_WLR_TRANSFORMS = {"normal": "normal", "left": "90", "inverted": "180", "right": "270"}
+
+
+def parse_wlr_json(text):
+    outputs = {}
+    try:
+        data = json.loads(text or "[]")
+    except ValueError:
+        return outputs
+    rotations = {v: k for k, v in _WLR_TRANSFORMS.items()}
+    for item in data:
+        mode = next((m for m in item.get("modes", []) if m.get("current")), None) \
+            or next((m for m in item.get("modes", []) if m.get("preferred")), {})
+        pos = item.get("position") or {}
+        outputs[item["name"]] = OutputState(
+            item["name"], enabled=bool(item.get("enabled")),
+            rotation=rotations.get(item.get("transform", "normal"), "normal"),
+            x=pos.get("x"), y=pos.get("y"),
+            width=mode.get("width", 0), height=mode.get("height", 0),
+            scale=item.get("scale") or 1.0)
+    return outputs
+
+
+class WlrBackend(DisplayBackend):
+    """wlr-randr pošle celou konfiguraci v jednom wlr-output-management commitu."""
+    name = "wlr"
+
+    def _query(self):
+        return parse_wlr_json(self.run(["wlr-randr", "--json"]))
+
+    def _commit(self, target, placement):
+        argv = ["wlr-randr"]
+        for name, out in target.items():
+            argv += ["--output", name]
+            if not out.enabled:
+                argv.append("--off")
+                continue
+            argv += ["--on", "--preferred", "--transform", _WLR_TRANSFORMS[out.rotation]]
+            # Zrcadlení protokol neumí, výstupy se aspoň překryjí na 0,0
+            x, y = (0, 0) if out.mirror_of else (out.x, out.y)
+            if x is not None:
+                argv += ["--pos", f"{x},{y}"]
+        return self.run(argv) is not None
+
+
+# --- KDE ---
+
+_KSCREEN_ROTATIONS = {"normal": 1, "left": 2, "inverted": 4, "right": 8}
+
+
+def parse_kscreen_config(config):
+    """Konfigurace KScreen (getConfig / kscreen-doctor -j) -> model výstupů."""
+    rotations = {v: k for k, v in _KSCREEN_ROTATIONS.items()}
+    names = {item.get("id"): item.get("name") for item in config.get("outputs", [])}
+    outputs = {}
+    for item in config.get("outputs", []):
+        if not item.get("connected", True):
+            continue
+        mode_id = str(item.get("currentModeId", ""))
+        size = {}
+        for mode in item.get("modes", []):
+            if str(mode.get("id")) == mode_id:
+                size = mode.get("size", {})
+        pos = item.get("pos") or {}
+        outputs[item["name"]] = OutputState(
+            item["name"], enabled=bool(item.get("enabled")),
+            rotation=rotations.get(int(item.get("rotation", 1)), "normal"),
+            x=pos.get("x"), y=pos.get("y"),
+            width=size.get("width", 0), height=size.get("height", 0),
+            scale=item.get("scale") or 1.0,
+            mirror_of=names.get(item["replicationSource"], "") if item.get("replicationSource") else "")
+    return outputs
+
+
+def kscreen_reports_mirror(config):
+    """Starší KScreen replicationSource nezná - zrcadlení je pak jen překryv."""
+    return any("replicationSource" in item for item in (config or {}).get("outputs", []))
+
+
+def _to_variant(value):
+    from gi.repository import GLib
+    if isinstance(value, GLib.Variant):
+        return value
+    if isinstance(value, bool):
+        return GLib.Variant("b", value)
+    if isinstance(value, int):
+        return GLib.Variant("i", value)
+    if isinstance(value, float):
+        return GLib.Variant("d", value)
+    if isinstance(value, str):
+        return GLib.Variant("s", value)
+    if isinstance(value, dict):
+        return GLib.Variant("a{sv}", {str(k): _to_variant(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return GLib.Variant("av", [_to_variant(v) for v in value])
+    return GLib.Variant("s", str(value))
+
+
+class KScreenBackend(DisplayBackend):
+    """
+    Mluví s KScreen backendem (org.kde.KScreen /backend) přes D-Bus:
+    model se drží z getConfig a signálu configChanged, změna je jeden
+    setConfig. Když D-Bus nejde, jedno volání kscreen-doctor.
+    """
+    name = "kde"
+    BUS_NAME = "org.kde.KScreen"
+    OBJECT_PATH = "/backend"
+    IFACE = "org.kde.kscreen.Backend"
+
+    def __init__(self, run=run_command, bus=None):
+        super().__init__(run)
+        self._bus = bus
+        self._proxy = None
+        self._config = None
+        self._subscription = None
+
+    def _dbus(self):
+        if self._proxy is None:
+            if self._bus is None:
+                from pydbus import SessionBus
+                self._bus = SessionBus()
+            self._proxy = self._bus.get(self.BUS_NAME, self.OBJECT_PATH)[self.IFACE]
+            self._subscription = self._bus.subscribe(
+                sender=self.BUS_NAME, iface=self.IFACE, signal="configChanged",
+                object=self.OBJECT_PATH, signal_fired=self._on_config_changed)
+            self.live = True
+        return self._proxy
+
+    def _on_config_changed(self, sender, path, iface, signal, params):
+        self._config = params[0]
+        self.outputs = parse_kscreen_config(self._config)
+        self.refreshed_at = time.monotonic()
+
+    def _query(self):
+        try:
+            self._config = self._dbus().getConfig()
+            self.reports_mirror = kscreen_reports_mirror(self._config)
+            return parse_kscreen_config(self._config)
+        except Exception as e:
+            print(f"KScreen D-Bus nedostupný ({e}), čtu kscreen-doctor -j", file=sys.stderr)
+            self._proxy = None
+            self.live = False
+            self._config = None
+        # kscreen-doctor zrcadlení nastavit neumí, porovnává se jen pozice
+        self.reports_mirror = False
+        try:
+            return parse_kscreen_config(json.loads(self.run(["kscreen-doctor", "-j"]) or "{}"))
+        except ValueError:
+            return {}
+
+    def _commit(self, target, placement):
+        if self._config is not None:
+            config = copy.deepcopy(self._config)
+            ids = {item.get("name"): item.get("id") for item in config.get("outputs", [])}
+            for item in config.get("outputs", []):
+                out = target.get(item.get("name"))
+                if out is None:
+                    continue
+                item["enabled"] = out.enabled
+                if out.enabled:
+                    item["rotation"] = _KSCREEN_ROTATIONS[out.rotation]
+                    if out.x is not None:
+                        item["pos"] = {"x": out.x, "y": out.y}
+                if "replicationSource" in item:
+                    item["replicationSource"] = ids.get(out.mirror_of, 0) if out.mirror_of else 0
+            try:
+                self._config = self._dbus().setConfig({k: _to_variant(v) for k, v in config.items()})
+                return True
+            except Exception as e:
+                print(f"KScreen setConfig selhal ({e}), zkouším kscreen-doctor", file=sys.stderr)
+                self._proxy = None
+                self.live = False
+                self._config = None
+
+        argv = ["kscreen-doctor"]
+        for name, out in target.items():
+            if not out.enabled:
+                argv.append(f"output.{name}.disable")
+                continue
+            argv += [f"output.{name}.enable", f"output.{name}.rotation.{out.rotation}"]
+            if out.x is not None:
+                argv.append(f"output.{name}.position.{out.x},{out.y}")
+        return self.run(argv) is not None
+
+
+BACKENDS = {
+    "x11": XRandrBackend,
+    "kde": KScreenBackend,
+    "wlr": WlrBackend,
+}
+
+
+def create_backend(kind, **kwargs):
+    cls = BACKENDS.get(kind)
+    return cls(**kwargs) if cls else None
@@ -0,0 +1,564 @@
+import json
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from . import ipc
+from .config import runtime_dir
+from .trace import split_reason
+
+# Výběr kanálu, kterým systémový dispatcher probudí uživatelské sezení
+# (systemd / dbus / signal / direct - stejné příkazy jako src/bin/channels,
+# navíc socket - unix socket agenta přímo z tohoto procesu, bez forku).
+#
+# Místo pevného pořadí pro každé sezení a každou událost:
+#   - jako první se zkusí kanál, který v sezení naposledy uspěl,
+#   - kanál, který selhal, se po dobu backoffu (exponenciálně rostoucí)
+#     přeskakuje - mrtvý agent tak nestojí D-Bus timeout při každé události,
+#   - volitelně se dva kanály, které jen "šťouchnou" do téhož agenta
+#     (dbus, signal - agent triggery slučuje), pustí souběžně.
+# Stav a čítače se drží v channels.json v runtime adresáři, aby přežily mezi
+# jednotlivými běhy dispatcheru (ty už serializuje flock).
+#
+# Sezení se obesílají souběžně (fan_out): omezený počet vláken, každé sezení
+# má vlastní deadline, pomalé sezení tak nezdrží ostatní. Příkazy kanálů
+# běží ve vlastních skupinách procesů (ChildSet) a po deadlinu se zabijí -
+# nic nesmí přežít router, flock dispatcheru už je pak uvolněný.
+
+CHANNEL_ORDER = ("socket", "systemd", "dbus", "signal", "direct")
+# Kanály bez shellového snippetu - nezávisí na CHANNELS z Makefile
+ROUTER_ONLY = ("socket",)
+RACE_SAFE = ("socket", "dbus", "signal")
+
+BACKOFF_MIN_S = 5.0
+BACKOFF_MAX_S = 300.0
+
+STATE_FILE_NAME = "channels.json"
+
+# TriggerAndWait odpoví až po aplikaci (nejdéle DBUS_WAIT_MS), odpověď má rezervu
+DBUS_WAIT_MS = 3000
+DBUS_REPLY_TIMEOUT_MS = 4000
+# Horní mez pro celý příkaz kanálu (sudo, systemctl ...); direct aplikuje rozložení
+CHANNEL_TIMEOUTS = {"socket": 1, "systemd": 10, "dbus": 5, "signal": 5, "direct": 30}
+
+# Souběžně obsluhovaná sezení a deadline jednoho sezení (přes všechny kanály)
+DISPATCH_WORKERS = 4
+DISPATCH_DEADLINE_MS = 8000
+
+# Po SIGTERM skupině procesů čas na úklid, pak SIGKILL
+KILL_GRACE_S = 0.5
+
+USER_BIN = shutil.which("asus-check-keyboard-user") or "/usr/bin/asus-check-keyboard-user"
+
+
+def _signal_group(proc, sig):
+    try:
+        os.killpg(proc.pid, sig)
+    except OSError:
+        pass
+
+
+def _terminate(proc):
+    _signal_group(proc, signal.SIGTERM)
+    try:
+        proc.communicate(timeout=KILL_GRACE_S)
+    except subprocess.TimeoutExpired:
+        _signal_group(proc, signal.SIGKILL)
+        proc.communicate()
+
+
+class ChildSet:
+    """
+    Podprocesy kanálů jednoho sezení. Každý běží ve vlastní skupině procesů
+    (sudo i to, co spustil); `kill()` je ukončí všechny a další už nespustí.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._procs = set()
+        self.cancelled = False
+
+    def run(self, argv, timeout, capture=False):
+        """(návratový kód, stdout) nebo None - nespustitelné, timeout, zrušeno."""
+        with self._lock:
+            if self.cancelled:
+                return None
+            try:
+                proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL, text=True, start_new_session=True)
+            except OSError:
+                return None
+            self._procs.add(proc)
+        try:
+            out, _err = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _terminate(proc)
+            return None
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        if self.cancelled:
+            # sudo skončil, potomci ve skupině ještě můžou běžet
+            _signal_group(proc, signal.SIGKILL)
+            return None
+        return proc.returncode, out
+
+    def kill(self):
+        with self._lock:
+            self.cancelled = True
+            procs = list(self._procs)
+        for proc in procs:
+            _signal_group(proc, signal.SIGTERM)
+        if procs:
+            timer = threading.Timer(KILL_GRACE_S, lambda: [_signal_group(p, signal.SIGKILL)
+                                                           for p in procs if p.poll() is None])
+            timer.daemon = True
+            timer.start()
+
+
+# Podprocesy aktuálního sezení (nastavuje fan_out pro svá vlákna)
+_local = threading.local()
+
+
+def _children():
+    return getattr(_local, "children", None) or ChildSet()
+
+
+def _run(argv, timeout):
+    result = _children().run(argv, timeout)
+    return result is not None and result[0] == 0
+
+
+def _output(argv, timeout):
+    """stdout příkazu, nebo None při chybě / nenulovém kódu."""
+    result = _children().run(argv, timeout, capture=True)
+    return result[1] if result is not None and result[0] == 0 else None
+
+
+def dbus_reply_ok(text):
+    """Výstup `dbus-send --print-reply` -> je první hodnota odpovědi 'boolean true'?"""
+    lines = (text or "").splitlines()
+    return len(lines) >= 2 and lines[1].strip() == "boolean true"
+
+
+def _dbus_address(session):
+    return f"unix:path={session.runtime_path or f'/run/user/{session.uid}'}/bus"
+
+
+def call_socket(session, reason, run=None):
+    path = ipc.socket_path(session.runtime_path or f"/run/user/{session.uid}")
+    try:
+        ok, text = ipc.request(path, f"TRIGGER {reason}", timeout=CHANNEL_TIMEOUTS["socket"],
+                               expected_uid=session.uid)
+    except OSError:
+        return False
+    return ok
+
+
+def call_systemd(session, reason, run=_run):
+    return run(["systemctl", "--user", f"--machine={session.uid}@.host",
+                "start", "asus-screen-toggle.service"], CHANNEL_TIMEOUTS["systemd"])
+
+
+def call_dbus(session, reason, run=_output):
+    # Odpověď (ok=False, "timeout"/"failed") je také odpověď - úspěch je jen ok=True
+    return dbus_reply_ok(run(["sudo", "-u", session.name, f"DBUS_SESSION_BUS_ADDRESS={_dbus_address(session)}",
+                              "dbus-send", "--session", "--print-reply", f"--reply-timeout={DBUS_REPLY_TIMEOUT_MS}",
+                              "--dest=org.asus.ScreenToggle", "/org/asus/ScreenToggle",
+                              "org.asus.ScreenToggle.Wait.TriggerAndWait",
+                              f"string:{reason}", f"uint32:{DBUS_WAIT_MS}"],
+                             CHANNEL_TIMEOUTS["dbus"]))
+
+
+def call_signal(session, reason, run=_output):
+    out = run(["pgrep", "-u", session.name, "-f", "asus-user-agent"], CHANNEL_TIMEOUTS["signal"])
+    try:
+        os.kill(int(out.split()[0]), signal.SIGUSR1)
+        return True
+    except (OSError, ValueError, IndexError, AttributeError):
+        return False
+
+
+def call_direct(session, reason, run=_run):
+    env = [f"XDG_SESSION_ID={session.sid}", f"XDG_SESSION_TYPE={session.type}",
+           f"XDG_CURRENT_DESKTOP={session.desktop}",
+           f"XDG_RUNTIME_DIR={session.runtime_path or f'/run/user/{session.uid}'}",
+           f"DBUS_SESSION_BUS_ADDRESS={_dbus_address(session)}",
+           # ID události pro trasování (asus-check-keyboard-user nemá důvod v argumentech)
+           f"ASUS_TRACE_REASON={reason}"]
+    if session.type == "x11":
+        if not os.path.isfile(f"/home/{session.name}/.Xauthority"):
+            return False
+        env.insert(0, f"DISPLAY={session.display}")
+    elif session.type == "wayland":
+        env.insert(0, f"WAYLAND_DISPLAY={session.wayland_display or 'wayland-0'}")
+    else:
+        return False
+    return run(["sudo", "-u", session.name, "env"] + env + [USER_BIN], CHANNEL_TIMEOUTS["direct"])
+
+
+CHANNELS = {
+    "socket": call_socket,
+    "systemd": call_systemd,
+    "dbus": call_dbus,
+    "signal": call_signal,
+    "direct": call_direct,
+}
+
+
+def enabled_channels(config, built=CHANNEL_ORDER):
+    """Kanály v pevném pořadí, které jsou zabudované (CHANNELS v Makefile) i povolené v konfiguraci."""
+    flags = {
+        "socket": config.enable_socket,
+        "systemd": config.enable_systemd_call,
+        "dbus": config.enable_dbus,
+        "signal": config.enable_signal,
+        "direct": config.enable_direct_call,
+    }
+    return [name for name in CHANNEL_ORDER if (name in built or name in ROUTER_ONLY) and flags[name]]
+
+
+def _state_path():
+    directory = runtime_dir()
+    return os.path.join(directory, STATE_FILE_NAME) if directory else None
+
+
+class ChannelRouter:
+    """
+    `dispatch(session, channels)` zkusí kanály v naučeném pořadí a vrátí
+    jméno kanálu, který uspěl (nebo None). Kanály jsou injektovatelné
+    (`{jméno: callable(session, reason) -> bool}`), stejně jako hodiny.
+    S `tracer` (trace.TraceRing) se každý pokus zapíše jako úsek.
+    """
+
+    def __init__(self, state_path=None, channels=CHANNELS, race=False,
+                 backoff_min=BACKOFF_MIN_S, backoff_max=BACKOFF_MAX_S, clock=time.time, tracer=None):
+        self.state_path = state_path if state_path is not None else _state_path()
+        self.channels = channels
+        self.race = race
+        self.tracer = tracer
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self.sessions = {}
+        self.counters = {}
+        self.last_dispatch = {}
+        self._lock = threading.Lock()
+        self._racers = []
+        self.load()
+
+    # --- stav ---
+    def load(self):
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.sessions = data.get("sessions", {})
+        self.counters = data.get("channels", {})
+        self.last_dispatch = data.get("last_dispatch", {})
+
+    def save(self):
+        # Poražený v souběhu ještě může zapisovat výsledek (join mimo zámek, _record ho potřebuje)
+        with self._lock:
+            racers, self._racers = self._racers, []
+        for thread in racers:
+            thread.join()
+        if not self.state_path:
+            return
+        directory = os.path.dirname(self.state_path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".channels-", dir=directory)
+            # Sezení po deadlinu může ještě dobíhat a zapisovat výsledek
+            with self._lock, os.fdopen(fd, 'w') as f:
+                json.dump({"updated": self.clock(), "sessions": self.sessions, "channels": self.counters,
+                           "last_dispatch": self.last_dispatch},
+                          f, indent=1, sort_keys=True)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            print(f"ChannelRouter: {self.state_path} nelze zapsat: {e}")
+
+    def prune(self, keys):
+        """Zahodí stav sezení, která už neexistují."""
+        self.sessions = {key: value for key, value in self.sessions.items() if key in keys}
+
+    # --- pořadí ---
+    @staticmethod
+    def session_key(session):
+        return f"{session.uid}:{session.sid}"
+
+    def order(self, key, channels):
+        """(pořadí k vyzkoušení, přeskočené kvůli backoffu)."""
+        state = self.sessions.get(key, {})
+        now = self.clock()
+        backoff = state.get("backoff", {})
+        ready = [ch for ch in channels if backoff.get(ch, {}).get("until", 0) <= now]
+        skipped = [ch for ch in channels if ch not in ready]
+        if not ready:
+            # Všechny v backoffu - raději zkusit než nic neudělat
+            ready, skipped = list(channels), []
+        last = state.get("last_good")
+        if last in ready:
+            ready.remove(last)
+            ready.insert(0, last)
+        return ready, skipped
+
+    # --- běh ---
+    def dispatch(self, session, channels, reason="UNKNOWN", deadline=None):
+        """`deadline` (time.monotonic()) - po něm se další kanál už nezkouší."""
+        key = self.session_key(session)
+        ready, skipped = self.order(key, channels)
+        with self._lock:
+            for name in skipped:
+                self._count(name, "skipped")
+
+        while ready:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            if self.race and len(ready) >= 2 and ready[0] in RACE_SAFE and ready[1] in RACE_SAFE:
+                pair, ready = ready[:2], ready[2:]
+                winner = self._race(session, key, pair, reason)
+            else:
+                name, ready = ready[0], ready[1:]
+                winner = name if self._attempt(session, key, name, reason) else None
+            if winner is not None:
+                return winner
+        return None
+
+    def _attempt(self, session, key, name, reason):
+        start = time.monotonic()
+        start_ns = time.monotonic_ns()
+        try:
+            ok = bool(self.channels[name](session, reason))
+        except Exception as e:
+            print(f"ChannelRouter: kanál {name} selhal: {e}")
+            ok = False
+        self._record(key, name, ok, time.monotonic() - start)
+        if self.tracer is not None:
+            clean, event_ids = split_reason(reason)
+            self.tracer.span(event_ids, f"channel:{name}", clean, key, start_ns=start_ns, ok=ok)
+        return ok
+
+    def _race(self, session, key, pair, reason):
+        """Oba kanály souběžně, vyhrává první úspěch."""
+        done = threading.Condition()
+        results = {}
+        children = getattr(_local, "children", None)
+
+        def worker(name):
+            # Podprocesy souběhu patří stejnému sezení (kill po deadlinu)
+            _local.children = children
+            ok = self._attempt(session, key, name, reason)
+            with done:
+                results[name] = ok
+                done.notify_all()
+
+        for name in pair:
+            thread = threading.Thread(target=worker, args=(name,), daemon=True)
+            thread.start()
+            with self._lock:
+                self._racers.append(thread)
+        with done:
+            while True:
+                winners = [name for name in pair if results.get(name)]
+                if winners:
+                    return winners[0]
+                if len(results) == len(pair):
+                    return None
+                done.wait()
+
+    def _record(self, key, name, ok, duration):
+        with self._lock:
+            self._count(name, "ok" if ok else "failed", duration)
+            state = self.sessions.setdefault(key, {})
+            backoff = state.setdefault("backoff", {})
+            if ok:
+                state["last_good"] = name
+                backoff.pop(name, None)
+            else:
+                if state.get("last_good") == name:
+                    del state["last_good"]
+                delay = min(self.backoff_max, backoff.get(name, {}).get("delay", self.backoff_min / 2) * 2)
+                backoff[name] = {"delay": delay, "until": self.clock() + delay}
+
+    def _count(self, name, result, duration=None):
+        counters = self.counters.setdefault(name, {"ok": 0, "failed": 0, "skipped": 0,
+                                                   "total_ms": 0.0, "last_ms": 0.0})
+        counters[result] += 1
+        if duration is not None:
+            ms = round(duration * 1000.0, 3)
+            counters["total_ms"] = round(counters["total_ms"] + ms, 3)
+            counters["last_ms"] = ms
+
+    def record_dispatch(self, reason, report, total_ms):
+        """Výsledek posledního fan_out pro `--last`."""
+        with self._lock:
+            self.last_dispatch = {
+                "reason": reason,
+                "at": self.clock(),
+                "total_ms": total_ms,
+                "sessions": {self.session_key(session): {"result": result, "ms": ms}
+                             for session, result, ms in report},
+            }
+
+    def stats(self):
+        """{kanál: {ok, failed, skipped, total_ms, last_ms, avg_ms}}."""
+        result = {}
+        for name, counters in self.counters.items():
+            attempts = counters["ok"] + counters["failed"]
+            result[name] = dict(counters, avg_ms=round(counters["total_ms"] / attempts, 3) if attempts else 0.0)
+        return result
+
+
+TIMEOUT = "timeout"
+
+# Kód main(), na který dispatcher přepne na skriptové kanály: sezení se
+# nepodařilo načíst, žádné tedy nic nedostalo. Jiný nenulový kód = chyba
+# až při obesílání nebo po něm, skriptové kanály se už nespouští.
+EXIT_NO_SESSIONS = 2
+
+
+def fan_out(router, sessions, channels, reason="UNKNOWN", workers=DISPATCH_WORKERS,
+            deadline_ms=DISPATCH_DEADLINE_MS):
+    """
+    Obešle sezení souběžně, nejvýš `workers` najednou. Každé sezení má
+    `deadline_ms` od chvíle, kdy na něj přišla řada; po deadlinu se hlásí
+    TIMEOUT a podprocesy jeho kanálů se zabijí, takže vlákno hned pokračuje
+    dalším sezením. Vrací se až po doběhnutí všech vláken - po návratu žádný
+    příkaz kanálu neběží. Výsledek [(session, kanál | None | TIMEOUT, ms)]
+    v pořadí `sessions`.
+    """
+    sessions = list(sessions)
+    deadline_s = deadline_ms / 1000.0
+    queue = list(sessions)
+    started = {}
+    children = {}
+    results = {}
+    cond = threading.Condition()
+
+    def worker():
+        while True:
+            with cond:
+                if not queue:
+                    return
+                session = queue.pop(0)
+                start = started[id(session)] = time.monotonic()
+                _local.children = children[id(session)] = ChildSet()
+                cond.notify_all()
+            try:
+                winner = router.dispatch(session, channels, reason, deadline=start + deadline_s)
+            except Exception as e:
+                print(f"fan_out: sezení {session.sid}: {e}")
+                winner = None
+            with cond:
+                # Po deadlinu už je zapsaný TIMEOUT
+                results.setdefault(id(session), (winner, round((time.monotonic() - start) * 1000.0, 3)))
+                cond.notify_all()
+
+    threads = [threading.Thread(target=worker, daemon=True)
+               for _i in range(min(max(1, workers), len(sessions)))]
+    for thread in threads:
+        thread.start()
+
+    with cond:
+        while len(results) < len(sessions):
+            now = time.monotonic()
+            wake = None
+            for session in sessions:
+                start = started.get(id(session))
+                if id(session) in results or start is None:
+                    continue
+                if now >= start + deadline_s:
+                    results[id(session)] = (TIMEOUT, round((now - start) * 1000.0, 3))
+                    children[id(session)].kill()
+                else:
+                    wake = min(wake, start + deadline_s - now) if wake is not None else start + deadline_s - now
+            if len(results) < len(sessions):
+                cond.wait(wake)
+    for thread in threads:
+        thread.join()
+    return [(session,) + results[id(session)] for session in sessions]
+
+
+def dispatch_sessions(router, tracer, cache, channels, tagged_reason, config):
+    """Obešle oprávněná sezení z `cache`, vypíše výsledek a uloží stav routeru."""
+    router.prune({router.session_key(s) for s in cache.sessions.values()})
+    reason, event_ids = split_reason(tagged_reason)
+    started = time.monotonic()
+    started_ns = time.monotonic_ns()
+    report = fan_out(router, cache.eligible(), channels, tagged_reason,
+                     workers=config.dispatch_workers, deadline_ms=config.dispatch_deadline_ms)
+    total_ms = round((time.monotonic() - started) * 1000.0, 3)
+    for session, result, ms in report:
+        if result == TIMEOUT:
+            result = f"deadline {config.dispatch_deadline_ms} ms vypršel"
+        print(f"{reason}: sezení {session.sid} ({session.name}) -> {result or 'žádný kanál neuspěl'}"
+              f" [{ms:.1f} ms]")
+    if report:
+        print(f"{reason}: {len(report)} sezení za {total_ms:.1f} ms "
+              f"(nejpomalejší {max(ms for _s, _r, ms in report):.1f} ms)")
+    tracer.span(event_ids, "fan-out", reason, start_ns=started_ns,
+                ok=all(r not in (None, TIMEOUT) for _s, r, _ms in report))
+    router.record_dispatch(reason, report, total_ms)
+    router.save()
+    return report
+
+
+def main(argv=None):
+    import argparse
+    import sys
+    from .config import load_system_config
+    from .sessions import SessionCache
+    from .trace import TraceRing
+
+    parser = argparse.ArgumentParser(prog="python3 -m asus_screen_toggle.channels")
+    parser.add_argument("reason", nargs="?", default="UNKNOWN")
+    parser.add_argument("--channels", default=" ".join(CHANNEL_ORDER),
+                        help="channels built into the dispatcher (space separated)")
+    parser.add_argument("--stats", action="store_true", help="print per-channel counters and exit")
+    parser.add_argument("--last", action="store_true",
+                        help="print per-session results and timings of the last dispatch and exit")
+    args = parser.parse_args(argv)
+
+    config = load_system_config()
+    tracer = TraceRing(enabled=config.enable_trace) if not (args.stats or args.last) else None
+    router = ChannelRouter(race=config.channel_race, tracer=tracer)
+    if args.stats:
+        print(json.dumps(router.stats(), indent=2, sort_keys=True))
+        return 0
+    if args.last:
+        print(json.dumps(router.last_dispatch, indent=2, sort_keys=True))
+        return 0
+
+    channels = enabled_channels(config, args.channels.split())
+    cache = SessionCache()
+    try:
+        # Snímek rezidentní služby (udržovaný ze signálů logind), jinak vlastní dotaz
+        if not cache.load_snapshot():
+            cache.refresh()
+    except Exception as e:
+        # Nikdo nic nedostal - dispatcher pak použije skriptové kanály
+        print(f"logind nedostupný: {e}", file=sys.stderr)
+        return EXIT_NO_SESSIONS
+
+    # Od teď už sezení mohla důvod dostat - chyba nesmí skončit kódem 2,
+    # jinak by ho dispatcher poslal znovu skriptovými kanály
+    try:
+        dispatch_sessions(router, tracer, cache, channels, args.reason, config)
+    except Exception as e:
+        print(f"ChannelRouter: chyba při obesílání: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,275 @@
+import os
+import shlex
+import tempfile
+from dataclasses import dataclass, fields
+
+# Jediné místo pro konfiguraci. Vrstvy (poslední vyhrává):
+#   1. defaulty (Config)
+#   2. /etc/asus-screen-toggle.conf          - správce, hardware
+#   3. ~/.config/asus-screen-toggle/config.conf
+#   4. ~/.config/asus-screen-toggle/user.conf - GUI Settings
+# ENABLE_DBUS / ENABLE_SIGNAL / ENABLE_SOCKET vypnuté v /etc (i defaultem, když
+# tam klíč chybí) uživatel zapnout nemůže.
+# Výsledek se drží v ConfigStore (invalidace podle mtime / inotify) a pro
+# shell se zapisuje jako config.env do runtime adresáře.
+
+SYSTEM_CONFIG_FILE = "/etc/asus-screen-toggle.conf"
+USER_CONFIG_DIR = os.path.expanduser("~/.config/asus-screen-toggle")
+AGENT_CONFIG_FILE = os.path.join(USER_CONFIG_DIR, "config.conf")
+USER_CONFIG_FILE = os.path.join(USER_CONFIG_DIR, "user.conf")
+
+USER_LAYERS = (SYSTEM_CONFIG_FILE, AGENT_CONFIG_FILE, USER_CONFIG_FILE)
+SYSTEM_LAYERS = (SYSTEM_CONFIG_FILE,)
+
+# Klíče, které smí /etc jen zakázat, ne uživatel povolit
+POLICY_KEYS = ("ENABLE_DBUS", "ENABLE_SIGNAL", "ENABLE_SOCKET")
+
+ENV_FILE_NAME = "config.env"
+
+
+@dataclass(frozen=True)
+class Config:
+    vendor_id: str = "0b05"
+    product_id: str = "1bf2"
+    primary_display: str = "eDP-1"
+    secondary_display: str = "eDP-2"
+    lid: str = "LID"
+    # Kanály mají stejné defaulty jako skriptové kanály dispatcheru
+    # (${ENABLE_*:-false} v src/bin/channels) - chybějící klíč v /etc jinak
+    # zapnul kanál jen v pythonovém routeru a config.env, ne ve skriptu
+    enable_direct_call: bool = False
+    enable_dbus: bool = False
+    enable_signal: bool = False
+    # Nový kanál - na stávajících instalacích až po výslovném zapnutí správcem
+    enable_socket: bool = False
+    enable_systemd_call: bool = False
+    preferred_mode: str = "automatic-enabled"
+    trigger_quiet_ms: int = 50
+    # udev události zpracovává rezidentní služba, pravidla nic nespouští;
+    # jen na výslovné přání správce - zastavená služba by pak hotplug neobsloužila
+    dispatcher_daemon: bool = False
+    # Souběh kanálů dbus + signal v dispatcheru (asus_screen_toggle.channels)
+    channel_race: bool = False
+    # Souběžné obesílání sezení v dispatcheru (channels.fan_out)
+    dispatch_workers: int = 4
+    dispatch_deadline_ms: int = 8000
+    # Záznamy do trasovacího kruhu (trace.py, export asus-screen-trace)
+    enable_trace: bool = True
+    # Filtr orientace (orientation.OrientationFilter): doba ustálení
+    # a příplatek za návrat do právě opuštěné orientace
+    rotation_stable_ms: int = 300
+    rotation_hysteresis_ms: int = 700
+
+    def to_env(self):
+        """{KLÍČ: text} ve tvaru, jaký čtou shell skripty (true/false, čísla jako text)."""
+        env = {}
+        for key, name in KEYS.items():
+            value = getattr(self, name)
+            env[key] = ("true" if value else "false") if isinstance(value, bool) else str(value)
+        return env
+
+
+# Jméno v souboru -> pole Config
+KEYS = {
+    "VENDOR_ID": "vendor_id",
+    "PRODUCT_ID": "product_id",
+    "PRIMARY_DISPLAY_NAME": "primary_display",
+    "SECONDARY_DISPLAY_NAME": "secondary_display",
+    "LID": "lid",
+    "ENABLE_DIRECT_CALL": "enable_direct_call",
+    "ENABLE_DBUS": "enable_dbus",
+    "ENABLE_SIGNAL": "enable_signal",
+    "ENABLE_SOCKET": "enable_socket",
+    "ENABLE_SYSTEMD_CALL": "enable_systemd_call",
+    "PREFERRED_MODE": "preferred_mode",
+    "TRIGGER_QUIET_MS": "trigger_quiet_ms",
+    "DISPATCHER_DAEMON": "dispatcher_daemon",
+    "CHANNEL_RACE": "channel_race",
+    "DISPATCH_WORKERS": "dispatch_workers",
+    "DISPATCH_DEADLINE_MS": "dispatch_deadline_ms",
+    "ENABLE_TRACE": "enable_trace",
+    "ROTATION_STABLE_MS": "rotation_stable_ms",
+    "ROTATION_HYSTERESIS_MS": "rotation_hysteresis_ms",
+}
+_TYPES = {f.name: f.type for f in fields(Config)}
+
+
+def parse_config_file(filepath):
+    """KEY=VALUE soubor (shell syntaxe bez expanzí) -> dict, true/false -> bool."""
+    data = {}
+    try:
+        with open(filepath, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#") or "=" not in line: continue
+                key, val = line.split("=", 1)
+                key = key.strip()
+                val = val.strip().replace('"', '')
+
+                if val.lower() == "true": data[key] = True
+                elif val.lower() == "false": data[key] = False
+                else: data[key] = val
+    except OSError:
+        pass
+    return data
+
+
+def _coerce(name, value):
+    kind = _TYPES[name]
+    if kind is bool:
+        return value if isinstance(value, bool) else str(value).lower() == "true"
+    if kind is int:
+        return int(value)
+    return str(value)
+
+
+def _system_allows(key, system):
+    """Politický klíč vypnutý v /etc - výslovně, nebo defaultem, když tam chybí."""
+    name = KEYS[key]
+    try:
+        return _coerce(name, system.get(key, getattr(Config, name)))
+    except ValueError:
+        return False
+
+
+def merge_layers(layers):
+    """[dict ze souboru] v pořadí vrstev -> Config. První vrstva je systémová."""
+    values = {}
+    for index, data in enumerate(layers):
+        for key, value in data.items():
+            name = KEYS.get(key)
+            if name is None:
+                continue
+            if index > 0 and key in POLICY_KEYS and not _system_allows(key, layers[0]):
+                continue
+            try:
+                values[name] = _coerce(name, value)
+            except ValueError:
+                continue
+    return Config(**values)
+
+
+def load_config(paths=USER_LAYERS):
+    return merge_layers([parse_config_file(path) for path in paths])
+
+
+def load_system_config(path=SYSTEM_CONFIG_FILE):
+    """Jen defaulty + /etc (systémová služba, dispatcher, HW karta v Settings)."""
+    return load_config((path,))
+
+
+def runtime_dir():
+    """$XDG_RUNTIME_DIR/asus-screen-toggle, pro root bez sezení /run/asus-screen-toggle."""
+    base = os.environ.get("XDG_RUNTIME_DIR") or ("/run" if os.geteuid() == 0 else None)
+    return os.path.join(base, "asus-screen-toggle") if base else None
+
+
+def write_env_snapshot(config, path=None):
+    """Atomicky zapíše KEY='value' řádky pro `source` v shell skriptech."""
+    if path is None:
+        directory = runtime_dir()
+        if directory is None:
+            return None
+        path = os.path.join(directory, ENV_FILE_NAME)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".config-", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write("# Vygenerováno z asus_screen_toggle.config - neupravovat\n")
+            for key, value in config.to_env().items():
+                f.write(f"{key}={shlex.quote(value)}\n")
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+    return path
+
+
+class ConfigStore:
+    """
+    Sloučená konfigurace v paměti. `get()` jen porovná mtime vrstev (stat,
+    žádné parsování), `watch()` navíc hlásí změny přes inotify a volá
+    `callback(config)` - náhrada ručního SIGHUP reloadu.
+    """
+
+    def __init__(self, paths=USER_LAYERS, callback=None, env_path=None, write_env=True):
+        self.paths = tuple(paths)
+        self.callback = callback
+        self.env_path = env_path
+        self.write_env = write_env
+        self._stamp = None
+        self._config = None
+        self._watchers = []
+
+    def _current_stamp(self):
+        stamp = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def get(self):
+        stamp = self._current_stamp()
+        if self._config is None or stamp != self._stamp:
+            self._reload(stamp)
+        return self._config
+
+    def _reload(self, stamp=None):
+        self._stamp = stamp if stamp is not None else self._current_stamp()
+        self._config = load_config(self.paths)
+        if self.write_env:
+            try:
+                write_env_snapshot(self._config, self.env_path)
+            except OSError as e:
+                print(f"ConfigStore: config.env nelze zapsat: {e}")
+
+    def watch(self):
+        from .state import StateWatcher
+        for path in self.paths:
+            watcher = StateWatcher(self._on_file_changed, path)
+            watcher.start()
+            self._watchers.append(watcher)
+
+    def stop(self):
+        for watcher in self._watchers:
+            watcher.stop()
+        self._watchers = []
+
+    def _on_file_changed(self):
+        previous = self._config
+        if self._current_stamp() == self._stamp:
+            return
+        self._reload()
+        if self.callback and self._config != previous:
+            self.callback(self._config)
+
+
+def main(argv=None):
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(prog="python3 -m asus_screen_toggle.config")
+    parser.add_argument("--system", action="store_true", help="only defaults and /etc (root/dispatcher view)")
+    parser.add_argument("--write-env", action="store_true", help="write config.env into the runtime dir")
+    args = parser.parse_args(argv)
+
+    config = load_config(SYSTEM_LAYERS if args.system else USER_LAYERS)
+    if args.write_env:
+        path = write_env_snapshot(config)
+        if path is None:
+            print("XDG_RUNTIME_DIR není nastaven", file=sys.stderr)
+            return 1
+        print(path)
+        return 0
+    for key, value in config.to_env().items():
+        print(f"{key}={shlex.quote(value)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+# D-Bus rozhraní s odloženou odpovědí. pydbus odpoví v okamžiku, kdy metoda
+# vrátí hodnotu - metoda, která má odpovědět až po dokončení práce
+# (TriggerAndWait), by musela točit vnořenou hlavní smyčku. Takové rozhraní
+# se proto registruje přímo přes Gio na stejné cestě jako objekt pydbus
+# (Gio dovoluje víc rozhraní na jedné cestě) a handler dostane PendingReply,
+# na kterou odpoví později z hlavní smyčky.
+
+ERROR_FAILED = "org.freedesktop.DBus.Error.Failed"
+ERROR_UNKNOWN_METHOD = "org.freedesktop.DBus.Error.UnknownMethod"
+
+
+class PendingReply:
+    """Jedna čekající odpověď; `reply()` nebo `error()` se pošle nejvýš jednou."""
+
+    def __init__(self, invocation, signature):
+        self._invocation = invocation
+        self.signature = signature
+        self.done = False
+
+    def reply(self, *values):
+        if self.done:
+            return False
+        self.done = True
+        from gi.repository import GLib
+        self._invocation.return_value(GLib.Variant(self.signature, values))
+        return True
+
+    def error(self, message, name=ERROR_FAILED):
+        if self.done:
+            return False
+        self.done = True
+        self._invocation.return_dbus_error(name, message)
+        return True
+
+
+class DeferredInterface:
+    """
+    Jedno rozhraní z `xml` na `path`. `handlers` = {metoda: callable(PendingReply,
+    *argumenty)}; handler odpoví sám, hned nebo později. Výjimka z handleru
+    se vrátí jako chyba D-Bus.
+    """
+
+    def __init__(self, connection, path, xml, handlers):
+        self.connection = connection
+        self.path = path
+        self.xml = xml
+        self.handlers = handlers
+        self._info = None
+        self._registration = None
+
+    def register(self):
+        from gi.repository import Gio
+        self._info = Gio.DBusNodeInfo.new_for_xml(self.xml).interfaces[0]
+        self._registration = self.connection.register_object(self.path, self._info, self._on_call, None, None)
+
+    def unregister(self):
+        if self._registration is not None:
+            self.connection.unregister_object(self._registration)
+            self._registration = None
+
+    def _on_call(self, connection, sender, path, iface, method, params, invocation):
+        handler = self.handlers.get(method)
+        if handler is None:
+            invocation.return_dbus_error(ERROR_UNKNOWN_METHOD, method)
+            return
+        out_args = self._info.lookup_method(method).out_args
+        pending = PendingReply(invocation, "(" + "".join(arg.signature for arg in out_args) + ")")
+        try:
+            handler(pending, *params.unpack())
+        except Exception as e:
+            print(f"DeferredInterface: {method}: {e}")
+            pending.error(str(e))
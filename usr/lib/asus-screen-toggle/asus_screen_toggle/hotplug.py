@@ -0,0 +1,197 @@
+import json
+import time
+
+from .scheduler import TriggerScheduler
+from .trace import new_event_id, tag_reason
+
+# Rezidentní zpracování hotplug událostí pro systémovou službu místo udev
+# RUN+="systemctl reload|start ..." na každou událost (nový proces, který
+# buď prohrál `flock -n` a událost zahodil, nebo pevně spal 0.5 s).
+#
+# Každý důvod má vlastní okno klidu: událost okno posune (nejdéle
+# DEBOUNCE_MAX_WAIT_MS od první), po uplynutí se důvod jednou předá dál.
+# Poslední událost dávky se tak nikdy neztratí a dispatcher se spustí
+# jednou za ustálený stav.
+
+USB_ADD = "USB_ADD"
+USB_REMOVE = "USB_REMOVE"
+DRM_CHANGE = "DRM_CHANGE"
+
+DEBOUNCE_MS = {
+    USB_ADD: 200,
+    USB_REMOVE: 200,
+    # Připojení monitoru posílá sérii change událostí (EDID, režimy, ...)
+    DRM_CHANGE: 500,
+}
+DEBOUNCE_MAX_WAIT_MS = 2000
+
+
+class ReasonDebouncer:
+    """
+    `sink(reason)` se zavolá jednou za dávku událostí daného důvodu.
+    Okno každého důvodu je vlastní TriggerScheduler (trailing edge,
+    max_wait), jehož "běh" jen předá důvod dál - časovače jsou tak
+    injektovatelné stejně jako u plánovače.
+    """
+
+    def __init__(self, sink, windows=DEBOUNCE_MS, max_wait_ms=DEBOUNCE_MAX_WAIT_MS, **timers):
+        self.sink = sink
+        self.max_wait_ms = max_wait_ms
+        self._timers = timers
+        self._windows = {reason: self._window(reason, ms) for reason, ms in windows.items()}
+        self.events = {}
+        self.settled = {}
+
+    def _window(self, reason, ms):
+        def forward(_merged, done):
+            self.settled[reason] = self.settled.get(reason, 0) + 1
+            try:
+                self.sink(reason)
+            finally:
+                done(True)
+        return TriggerScheduler(forward, quiet_ms=ms, max_wait_ms=max(ms, self.max_wait_ms), **self._timers)
+
+    def event(self, reason):
+        self.events[reason] = self.events.get(reason, 0) + 1
+        window = self._windows.get(reason)
+        if window is None:
+            # Neznámý důvod bez okna - rovnou dál
+            self.settled[reason] = self.settled.get(reason, 0) + 1
+            self.sink(reason)
+            return
+        window.trigger(reason)
+
+    def stats(self):
+        return {"events": dict(self.events), "settled": dict(self.settled)}
+
+
+class DrmEventSource:
+    """GUdev monitor subsystému drm, `callback(action, name)` v hlavní smyčce."""
+
+    def __init__(self):
+        import gi
+        gi.require_version('GUdev', '1.0')
+        from gi.repository import GUdev
+        self._client = GUdev.Client.new(["drm"])
+        self._handler_id = None
+
+    def subscribe(self, callback):
+        def on_uevent(client, action, device):
+            callback(action, device.get_name())
+
+        self._handler_id = self._client.connect("uevent", on_uevent)
+
+    def close(self):
+        if self._handler_id is not None:
+            self._client.disconnect(self._handler_id)
+            self._handler_id = None
+
+
+class HotplugDispatcher:
+    """
+    Udev události (klávesnice přes KeyboardMonitor, drm) -> okna klidu -> scheduler.
+    S `tracer` (trace.TraceRing) dostane každá dávka ID události, které jde
+    dál v důvodu (USB_ADD.<id>).
+    """
+
+    def __init__(self, keyboard, scheduler, drm_source=None, tracer=None):
+        self.scheduler = scheduler
+        self.debouncer = ReasonDebouncer(self._on_settled)
+        self.drm_source = drm_source
+        self.tracer = tracer
+        self.enabled = False
+        # Důvod -> (ID události, začátek dávky v ns)
+        self._batches = {}
+        keyboard.connect(self._on_keyboard)
+
+    def set_enabled(self, enabled):
+        """Vrací, jestli dispečer běží; neúspěšné zapnutí zkusí další set_enabled(True) znovu."""
+        if enabled == self.enabled:
+            return self.enabled
+        if not enabled:
+            self.enabled = False
+            if self.drm_source is not None:
+                self.drm_source.close()
+            return False
+        try:
+            if self.drm_source is None:
+                self.drm_source = DrmEventSource()
+            self.drm_source.subscribe(self._on_drm)
+        except (ImportError, ValueError) as e:
+            print(f"HotplugDispatcher: drm monitor nedostupný: {e}")
+            return False
+        self.enabled = True
+        return True
+
+    def _event(self, reason):
+        if self.tracer is not None and self.tracer.enabled:
+            if reason not in self._batches:
+                self._batches[reason] = (new_event_id(), time.monotonic_ns())
+            self.tracer.mark([self._batches[reason][0]], "udev", reason)
+        self.debouncer.event(reason)
+
+    def _on_settled(self, reason):
+        batch = self._batches.pop(reason, None)
+        if batch is None:
+            self.scheduler.trigger(reason)
+            return
+        event_id, started = batch
+        self.tracer.span([event_id], "debounce", reason, start_ns=started)
+        self.scheduler.trigger(tag_reason(reason, event_id))
+
+    def _on_keyboard(self, connected):
+        if self.enabled:
+            self._event(USB_ADD if connected else USB_REMOVE)
+
+    def _on_drm(self, action, name):
+        if action == "change":
+            self._event(DRM_CHANGE)
+
+
+class _ReplayChannel:
+    """Jeden subsystém přehrávaného proudu, rozhraní jako skutečný event source."""
+
+    def __init__(self):
+        self._callback = None
+
+    def subscribe(self, callback):
+        self._callback = callback
+
+    def close(self):
+        self._callback = None
+
+    def emit(self, *args):
+        if self._callback is not None:
+            self._callback(*args)
+
+
+class ReplayEventSource:
+    """
+    Syntetický proud událostí místo netlinku. JSON řádky
+    {"at_ms": 0, "subsystem": "usb", "action": "add", "name": "3-2",
+     "vendor": "0b05", "product": "1bf2"} se po `start()` přehrají
+    v hlavní smyčce. `usb` se předá KeyboardMonitoru jako event_source,
+    `drm` nahrazuje DrmEventSource.
+    """
+
+    def __init__(self, path, timer_add=None):
+        with open(path, 'r') as f:
+            self.events = [json.loads(line) for line in f if line.strip()]
+        self._timer_add = timer_add
+        self.usb = _ReplayChannel()
+        self.drm = _ReplayChannel()
+
+    def start(self):
+        timer_add = self._timer_add
+        if timer_add is None:
+            from gi.repository import GLib
+            timer_add = GLib.timeout_add
+        for event in self.events:
+            timer_add(int(event.get("at_ms", 0)), lambda event=event: self._fire(event))
+
+    def _fire(self, event):
+        if event.get("subsystem") == "usb":
+            self.usb.emit(event.get("action"), event.get("name"), event.get("vendor"), event.get("product"))
+        else:
+            self.drm.emit(event.get("action"), event.get("name", "card0"))
+        return False
@@ -0,0 +1,210 @@
+import os
+import socket
+import struct
+
+from .config import runtime_dir
+
+# Rychlá cesta do agenta přes unix socket v $XDG_RUNTIME_DIR - bez
+# `sudo -u ... dbus-send` nebo `pgrep` + `kill` (několik forků) a na rozdíl
+# od signálu nese důvod a vrací výsledek.
+#
+# Protokol: jeden řádek ASCII na požadavek, jeden na odpověď, spojení může
+# poslat víc požadavků za sebou.
+#   TRIGGER <důvod>  -> OK queued | OK ignored <režim> | ERR disabled
+#   MODE             -> OK <režim>
+#   LAST             -> OK <výsledek|-> <unix čas> <trvání ms>
+#   PING             -> OK pong
+# Přijímají se jen spojení od vlastníka agenta a od roota (SO_PEERCRED).
+
+SOCKET_NAME = "agent.sock"
+MAX_LINE = 256
+
+_PEERCRED = struct.Struct("3i")
+
+
+def socket_path(runtime=None):
+    """`runtime` = XDG_RUNTIME_DIR cílového uživatele (dispatcher), jinak vlastní."""
+    directory = os.path.join(runtime, "asus-screen-toggle") if runtime else runtime_dir()
+    return os.path.join(directory, SOCKET_NAME) if directory else None
+
+
+def peer_credentials(sock):
+    """(pid, uid, gid) druhé strany spojení."""
+    return _PEERCRED.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size))
+
+
+def parse_request(line):
+    """'TRIGGER USB_ADD' -> ('TRIGGER', 'USB_ADD'); neplatný řádek -> (None, None)."""
+    parts = line.strip().split(None, 1)
+    if not parts or not parts[0].isalpha():
+        return None, None
+    arg = parts[1] if len(parts) > 1 else ""
+    if not all(c.isalnum() or c in "_-+.:" for c in arg):
+        return None, None
+    return parts[0].upper(), arg
+
+
+class _Connection:
+    def __init__(self, sock, creds):
+        self.sock = sock
+        self.creds = creds
+        self.buffer = b""
+        self.watch_id = None
+
+
+class AgentSocketServer:
+    """
+    Naslouchá v hlavní smyčce GLib (io watch, žádné vlákno). `handler(command,
+    arg, creds)` vrací (ok, text); odpověď se pošle jako 'OK text' / 'ERR text'.
+    """
+
+    def __init__(self, handler, path=None, allowed_uids=None):
+        self.handler = handler
+        self.path = path or socket_path()
+        self.allowed_uids = set(allowed_uids) if allowed_uids is not None else {os.getuid(), 0}
+        self.sock = None
+        self._watch_id = None
+        self._connections = {}
+        self.requests = 0
+        self.rejected = 0
+
+    def start(self):
+        from gi.repository import GLib
+        if self.path is None:
+            raise OSError("XDG_RUNTIME_DIR není nastaven")
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        try:
+            # Socket po předchozím (spadlém) agentovi; druhý agent se nespustí díky D-Bus jménu
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC)
+        sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        sock.listen(8)
+        sock.setblocking(False)
+        self.sock = sock
+        self._watch_id = GLib.io_add_watch(sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_accept)
+
+    def stop(self):
+        from gi.repository import GLib
+        for conn in list(self._connections.values()):
+            self._close(conn)
+        if self._watch_id is not None:
+            GLib.source_remove(self._watch_id)
+            self._watch_id = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try: os.unlink(self.path)
+            except OSError: pass
+
+    def _on_accept(self, fd, condition):
+        try:
+            sock, _addr = self.sock.accept()
+        except OSError:
+            return True
+        creds = peer_credentials(sock)
+        if creds[1] not in self.allowed_uids:
+            self.rejected += 1
+            print(f"AgentSocketServer: odmítnuto spojení od uid {creds[1]} (pid {creds[0]})")
+            sock.close()
+            return True
+        from gi.repository import GLib
+        sock.setblocking(False)
+        conn = _Connection(sock, creds)
+        conn.watch_id = GLib.io_add_watch(sock.fileno(), GLib.PRIORITY_DEFAULT,
+                                          GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self._on_data, conn)
+        self._connections[sock.fileno()] = conn
+        return True
+
+    def _on_data(self, fd, condition, conn):
+        try:
+            data = conn.sock.recv(4096)
+        except BlockingIOError:
+            return True
+        except OSError:
+            data = b""
+        if not data:
+            self._close(conn, remove_watch=False)
+            return False
+        conn.buffer += data
+        while b"\n" in conn.buffer:
+            line, conn.buffer = conn.buffer.split(b"\n", 1)
+            self._respond(conn, line)
+        if len(conn.buffer) > MAX_LINE:
+            self._reply(conn, False, "line too long")
+            self._close(conn, remove_watch=False)
+            return False
+        return True
+
+    def _respond(self, conn, line):
+        self.requests += 1
+        command, arg = parse_request(line.decode("ascii", "replace"))
+        if command is None:
+            self._reply(conn, False, "bad request")
+            return
+        try:
+            ok, text = self.handler(command, arg, conn.creds)
+        except Exception as e:
+            ok, text = False, f"internal error: {e}"
+        self._reply(conn, ok, text)
+
+    def _reply(self, conn, ok, text):
+        try:
+            conn.sock.sendall(f"{'OK' if ok else 'ERR'} {text}\n".encode("ascii", "replace"))
+        except OSError:
+            pass
+
+    def _close(self, conn, remove_watch=True):
+        from gi.repository import GLib
+        if remove_watch and conn.watch_id is not None:
+            GLib.source_remove(conn.watch_id)
+        conn.watch_id = None
+        self._connections.pop(conn.sock.fileno(), None)
+        conn.sock.close()
+
+
+def request(path, line, timeout=1.0, expected_uid=None):
+    """
+    Jeden požadavek, vrací (ok, text). `expected_uid` ověří, že socket
+    opravdu drží agent daného uživatele (dispatcher běží jako root).
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        if expected_uid is not None and peer_credentials(sock)[1] != expected_uid:
+            return False, "socket owned by another user"
+        sock.sendall(line.encode("ascii") + b"\n")
+        data = b""
+        while not data.endswith(b"\n") and len(data) <= MAX_LINE:
+            chunk = sock.recv(MAX_LINE)
+            if not chunk:
+                break
+            data += chunk
+    status, _sep, text = data.decode("ascii", "replace").strip().partition(" ")
+    return status == "OK", text
+
+
+def main(argv=None):
+    import argparse
+    import sys
+    import time
+    parser = argparse.ArgumentParser(prog="python3 -m asus_screen_toggle.ipc")
+    parser.add_argument("request", nargs="+", help="e.g. TRIGGER MANUAL | MODE | LAST | PING")
+    parser.add_argument("--socket", help="socket path (default: own runtime dir)")
+    args = parser.parse_args(argv)
+
+    path = args.socket or socket_path()
+    started = time.perf_counter()
+    try:
+        ok, text = request(path, " ".join(args.request))
+    except OSError as e:
+        print(f"{path}: {e}", file=sys.stderr)
+        return 2
+    print(f"{'OK' if ok else 'ERR'} {text}  ({(time.perf_counter() - started) * 1000:.3f} ms)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Externí příkazy mimo GTK vlákno. Každá úloha má klíč; nová úloha se
+# stejným klíčem tu starou zruší (proces dostane SIGTERM) a její výsledek
+# se už nedoručí. Dokončení se hlásí callbackem přes GLib.idle_add.
+
+
+class JobResult:
+    def __init__(self, returncode=None, stdout="", stderr="", value=None, error=None):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None and self.returncode in (None, 0)
+
+
+class _Job:
+    def __init__(self, key, generation):
+        self.key = key
+        self.generation = generation
+        self.process = None
+        self.cancelled = False
+
+
+def _glib_idle_add(callback, *args):
+    from gi.repository import GLib
+    GLib.idle_add(callback, *args)
+
+
+class JobRunner:
+    def __init__(self, max_workers=4, idle_add=_glib_idle_add):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asus-job")
+        self._idle_add = idle_add
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._generation = 0
+
+    def pending(self, key):
+        with self._lock:
+            return key in self._jobs
+
+    def run(self, key, command, on_done=None):
+        """
+        `command` je argv (spustí se jako proces) nebo callable (zavolá se
+        ve vlákně, návratová hodnota je v JobResult.value).
+        `on_done(result)` běží v hlavní smyčce, jen pokud úlohu nic nepřebilo.
+        """
+        with self._lock:
+            self._cancel_locked(key)
+            self._generation += 1
+            job = _Job(key, self._generation)
+            self._jobs[key] = job
+        self._executor.submit(self._work, job, command, on_done)
+        return job
+
+    def cancel(self, key):
+        with self._lock:
+            self._cancel_locked(key)
+
+    def shutdown(self):
+        with self._lock:
+            for key in list(self._jobs):
+                self._cancel_locked(key)
+        self._executor.shutdown(wait=False)
+
+    def _cancel_locked(self, key):
+        job = self._jobs.pop(key, None)
+        if job is None:
+            return
+        job.cancelled = True
+        if job.process is not None and job.process.poll() is None:
+            try: job.process.terminate()
+            except OSError: pass
+
+    def _work(self, job, command, on_done):
+        try:
+            if callable(command):
+                result = JobResult(value=command())
+            else:
+                with self._lock:
+                    if job.cancelled:
+                        return
+                    job.process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                                   stderr=subprocess.PIPE, text=True)
+                out, err = job.process.communicate()
+                result = JobResult(job.process.returncode, out, err)
+        except Exception as e:
+            result = JobResult(error=e)
+        self._idle_add(self._finish, job, result, on_done)
+
+    def _finish(self, job, result, on_done):
+        with self._lock:
+            if job.cancelled or self._jobs.get(job.key) is not job:
+                return False
+            del self._jobs[job.key]
+        if on_done is not None:
+            on_done(result)
+        return False
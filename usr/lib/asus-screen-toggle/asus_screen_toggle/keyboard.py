@@ -0,0 +1,140 @@
+import glob
+import os
+
+# Výchozí hodnoty odpovídají /etc/asus-screen-toggle.conf z postinst
+DEFAULT_VENDOR_ID = "0b05"
+DEFAULT_PRODUCT_ID = "1bf2"
+
+# Přepis cesty jen pro benchmark/vývoj (utilities/bench), jinak sysfs
+SYSFS_USB_DEVICES = os.environ.get("ASUS_SCREEN_TOGGLE_SYSFS", "/sys/bus/usb/devices")
+
+
+def _read_attr(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip().lower()
+    except OSError:
+        return None
+
+
+def scan_sysfs(vendor_id, product_id, sysfs_root=SYSFS_USB_DEVICES):
+    """Vrátí množinu jmen USB zařízení (např. '3-2'), která odpovídají VID:PID."""
+    vendor_id = vendor_id.lower()
+    product_id = product_id.lower()
+    found = set()
+    for dev in glob.glob(os.path.join(sysfs_root, "*")):
+        if _read_attr(os.path.join(dev, "idVendor")) != vendor_id:
+            continue
+        if _read_attr(os.path.join(dev, "idProduct")) != product_id:
+            continue
+        found.add(os.path.basename(dev))
+    return found
+
+
+class UdevEventSource:
+    """
+    Netlink monitor přes GUdev. Události chodí v hlavní smyčce GLib,
+    callback dostává (action, name, vendor_id, product_id).
+    """
+
+    def __init__(self, subsystems=("usb",)):
+        import gi
+        gi.require_version('GUdev', '1.0')
+        from gi.repository import GUdev
+        self._client = GUdev.Client.new(list(subsystems))
+        self._handler_id = None
+
+    def subscribe(self, callback):
+        def on_uevent(client, action, device):
+            if device.get_devtype() != "usb_device":
+                return
+            vendor = device.get_sysfs_attr("idVendor") or device.get_property("ID_VENDOR_ID")
+            product = device.get_sysfs_attr("idProduct") or device.get_property("ID_MODEL_ID")
+            callback(action, device.get_name(), vendor, product)
+
+        self._handler_id = self._client.connect("uevent", on_uevent)
+
+    def close(self):
+        if self._handler_id is not None:
+            self._client.disconnect(self._handler_id)
+            self._handler_id = None
+
+
+class KeyboardMonitor:
+    """
+    Sleduje přítomnost klávesnice v rámci procesu.
+
+    Při startu jednou projde sysfs, dál už jen reaguje na add/remove
+    z event source. Stav je v atributu `connected`, jeho čtení nic nespouští.
+    Bez event source (chybí GUdev) se při každém čtení znovu projde sysfs,
+    což je pořád jen pár čtení souborů bez forku.
+    """
+
+    def __init__(self, vendor_id=DEFAULT_VENDOR_ID, product_id=DEFAULT_PRODUCT_ID,
+                 sysfs_root=SYSFS_USB_DEVICES, event_source=None):
+        self.vendor_id = vendor_id.lower()
+        self.product_id = product_id.lower()
+        self.sysfs_root = sysfs_root
+        self._event_source = event_source
+        self._devices = set()
+        self._connected = False
+        self._listeners = []
+        self.live = False
+
+    @property
+    def connected(self):
+        if not self.live:
+            self.rescan()
+        return self._connected
+
+    def connect(self, callback):
+        """Callback(connected) se zavolá při každé změně stavu."""
+        self._listeners.append(callback)
+
+    def start(self):
+        self.rescan()
+        if self._event_source is None:
+            try:
+                self._event_source = UdevEventSource()
+            except (ImportError, ValueError) as e:
+                print(f"KeyboardMonitor: udev monitor nedostupný ({e}), čtu sysfs při dotazu")
+        if self._event_source is not None:
+            self._event_source.subscribe(self.handle_event)
+            self.live = True
+        return self._connected
+
+    def stop(self):
+        if self._event_source is not None:
+            self._event_source.close()
+        self.live = False
+
+    def set_ids(self, vendor_id, product_id):
+        """Změna VID:PID (reload konfigurace) - stav se přepočítá ze sysfs."""
+        self.vendor_id = vendor_id.lower()
+        self.product_id = product_id.lower()
+        self.rescan()
+
+    def rescan(self):
+        self._devices = scan_sysfs(self.vendor_id, self.product_id, self.sysfs_root)
+        self._update()
+
+    def handle_event(self, action, name, vendor_id=None, product_id=None):
+        if action == "add":
+            if (vendor_id or "").lower() != self.vendor_id or (product_id or "").lower() != self.product_id:
+                return
+            self._devices.add(name)
+        elif action == "remove":
+            # Při remove už sysfs atributy nejsou, stačí jméno zařízení
+            if name not in self._devices:
+                return
+            self._devices.discard(name)
+        else:
+            return
+        self._update()
+
+    def _update(self):
+        connected = bool(self._devices)
+        if connected != self._connected:
+            self._connected = connected
+            for callback in self._listeners:
+                callback(connected)
@@ -0,0 +1,172 @@
+import json
+from dataclasses import dataclass, asdict
+
+# Rozhodovací logika (dříve "Matrix" v asus-check-keyboard-user.sh).
+# Čistě funkční: žádné soubory, procesy ani prostředí, jen vstupy -> plán.
+
+USER_MODES = [
+    "automatic-enabled", "automatic-disabled",
+    "enforce-desktop", "enforce-primary-only",
+    "temp-desktop", "temp-mirror", "temp-reverse-mirror",
+    "temp-rotated-desktop", "temp-primary-only", "temp-secondary-only",
+]
+
+# Orientace z iio-sensor-proxy -> rotace výstupu (xrandr/kscreen/wlr názvosloví)
+ORIENTATIONS = {
+    "normal": "normal",
+    "bottom-up": "inverted",
+    "left-up": "left",
+    "right-up": "right",
+}
+
+SESSION_BACKENDS = ("x11", "kde", "wlr")
+
+# Umístění primárního displeje vůči sekundárnímu podle rotace (dual režim)
+PLACEMENTS = {
+    "left": "right-of",
+    "right": "left-of",
+    "inverted": "below",
+    "normal": "above",
+}
+
+
+def parse_orientation(text):
+    """Z řádku monitor-sensor (nebo DIR=...) vytáhne orientaci, jinak vrátí ''."""
+    text = text or ""
+    # Pořadí odpovídá původnímu `case` v bashi
+    for name in ("normal", "bottom-up", "left-up", "right-up"):
+        if name in text:
+            return name
+    return ""
+
+
+def uses_orientation(keyboard_connected, user_mode):
+    """Má pro daný stav smysl číst senzor? (jinak compute_plan rotaci ignoruje)"""
+    if keyboard_connected:
+        return False
+    return user_mode not in ("automatic-disabled", "temp-reverse-mirror", "temp-rotated-desktop")
+
+
+def session_backend(session_type, desktop):
+    """Typ sezení -> 'x11' | 'kde' | 'wlr' | None (nic neaplikovat)."""
+    if session_type == "x11":
+        return "x11"
+    if session_type == "wayland":
+        return "kde" if desktop == "KDE" else "wlr"
+    return None
+
+
+@dataclass
+class LayoutPlan:
+    mode: str
+    revert_to: str
+    keyboard_connected: bool
+    orientation: str
+    backend: str
+    primary: str
+    secondary: str
+    enable_primary: bool
+    enable_secondary: bool
+    mirror: bool
+    reverse: bool
+    rotation: str
+    primary_rotation: str
+    secondary_rotation: str
+    placement: str
+
+    @property
+    def dual(self):
+        return self.enable_primary and self.enable_secondary and not self.mirror
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def compute_plan(keyboard_connected, user_mode, orientation, backend,
+                 preferred_mode="automatic-enabled",
+                 primary="eDP-1", secondary="eDP-2"):
+    """
+    (klávesnice, uživatelský režim, orientace, typ sezení) -> LayoutPlan.
+    `orientation` je název z iio-sensor-proxy ('left-up', ...) nebo ''.
+    """
+    force_mirror = False
+    force_reverse = False
+    enable_primary = True
+    disable_rotation = False
+    revert_to = ""
+
+    # A) Fyzicky připojená klávesnice vypíná rotaci
+    if keyboard_connected:
+        disable_rotation = True
+
+    # Automatický návrat z dočasných režimů
+    if keyboard_connected and user_mode.startswith("temp-"):
+        user_mode = preferred_mode or "automatic-enabled"
+        revert_to = user_mode
+
+    # B) Auto: klávesnice připojená => vypnout spodek
+    enable_secondary = not keyboard_connected
+
+    # C) Sada režimů (overrides)
+    if user_mode == "automatic-disabled":
+        enable_secondary = False
+        disable_rotation = True
+    elif user_mode in ("temp-desktop", "enforce-desktop"):
+        enable_secondary = True
+    elif user_mode == "temp-mirror":
+        enable_secondary = True
+        force_mirror = True
+    elif user_mode == "temp-reverse-mirror":
+        enable_secondary = True
+        force_mirror = True
+        force_reverse = True
+        disable_rotation = True
+    elif user_mode == "temp-rotated-desktop":
+        enable_secondary = True
+        force_reverse = True
+        disable_rotation = True
+    elif user_mode == "temp-primary-only":
+        enable_secondary = False
+    elif user_mode == "temp-secondary-only":
+        enable_secondary = True
+        enable_primary = False
+
+    # Rotace
+    rotation = "normal"
+    primary_rotation = "normal"
+    secondary_rotation = "normal"
+    if disable_rotation or force_reverse:
+        if force_reverse:
+            primary_rotation = "inverted"
+    elif orientation in ORIENTATIONS:
+        rotation = ORIENTATIONS[orientation]
+        primary_rotation = rotation
+        secondary_rotation = rotation
+
+    if force_mirror and enable_primary and enable_secondary:
+        placement = "same-as"
+    elif enable_primary and enable_secondary:
+        placement = PLACEMENTS[rotation]
+    else:
+        placement = ""
+
+    return LayoutPlan(
+        mode=user_mode,
+        revert_to=revert_to,
+        keyboard_connected=keyboard_connected,
+        orientation=orientation,
+        backend=backend or "",
+        primary=primary,
+        secondary=secondary,
+        enable_primary=enable_primary,
+        enable_secondary=enable_secondary,
+        mirror=force_mirror,
+        reverse=force_reverse,
+        rotation=rotation,
+        primary_rotation=primary_rotation,
+        secondary_rotation=secondary_rotation,
+        placement=placement,
+    )
@@ -0,0 +1,273 @@
+# Jeden dlouhodobý model tray menu. Změna režimu nebo klávesnice mění jen
+# stav položek (radio, citlivost); vykreslení obstarává buď GtkMenuRenderer
+# (AppIndicator, záložní ContextMenu), nebo DBusMenuExporter
+# (com.canonical.dbusmenu pro SNI - KDE menu kreslí samo, bez našeho Gtk).
+
+try:
+    from pydbus.generic import signal as _signal
+except ImportError:
+    # Bez pydbus jde použít model a Gtk renderer, jen ne exportér
+    def _signal():
+        return None
+
+STANDARD = "standard"
+SEPARATOR = "separator"
+RADIO = "radio"
+
+
+class MenuItem:
+    def __init__(self, item_id, label="", kind=STANDARD, enabled=True, action=None):
+        self.id = item_id
+        self.label = label
+        self.kind = kind
+        self.enabled = enabled
+        self.toggled = False
+        self.action = action
+
+
+class MenuModel:
+    """
+    Položky menu s ID (0 je kořen pro dbusmenu). Posluchači
+    `listener(items)` dostanou seznam položek, jejichž stav se změnil.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.by_id = {}
+        self.revision = 1
+        self._listeners = []
+
+    def add(self, label="", kind=STANDARD, enabled=True, action=None):
+        item = MenuItem(len(self.items) + 1, label, kind, enabled, action)
+        self.items.append(item)
+        self.by_id[item.id] = item
+        return item
+
+    def separator(self):
+        return self.add(kind=SEPARATOR)
+
+    def connect(self, listener):
+        self._listeners.append(listener)
+
+    def update(self, changes):
+        """`changes` = {item: (enabled, toggled)}; posluchače volá jen při skutečné změně."""
+        changed = []
+        for item, (enabled, toggled) in changes.items():
+            if item.enabled != enabled or item.toggled != toggled:
+                item.enabled = enabled
+                item.toggled = toggled
+                changed.append(item)
+        if changed:
+            for listener in self._listeners:
+                listener(changed)
+        return changed
+
+    def activate(self, item_id):
+        item = self.by_id.get(item_id)
+        if item is None or not item.enabled or item.action is None:
+            return False
+        item.action()
+        return True
+
+
+class GtkMenuRenderer:
+    """Gtk.Menu postavené jednou z modelu, změny modelu se promítají na místě."""
+
+    def __init__(self, model):
+        import gi
+        gi.require_version('Gtk', '3.0')
+        from gi.repository import Gtk
+
+        self.model = model
+        self.widgets = {}
+        self._syncing = False
+        self.menu = Gtk.Menu()
+        for item in model.items:
+            if item.kind == SEPARATOR:
+                widget = Gtk.SeparatorMenuItem()
+            elif item.kind == RADIO:
+                # CheckMenuItem kreslený jako radio - skupina Gtk by vždy jednu položku zaškrtla
+                widget = Gtk.CheckMenuItem(label=item.label)
+                widget.set_draw_as_radio(True)
+                widget.set_active(item.toggled)
+                widget.connect("toggled", self._on_toggled, item)
+            else:
+                widget = Gtk.MenuItem(label=item.label)
+                widget.connect("activate", self._on_activate, item)
+            widget.set_sensitive(item.enabled)
+            self.menu.append(widget)
+            self.widgets[item.id] = widget
+        self.menu.show_all()
+        model.connect(self._on_model_changed)
+
+    def _on_activate(self, widget, item):
+        self.model.activate(item.id)
+
+    def _on_toggled(self, widget, item):
+        if self._syncing:
+            return
+        if widget.get_active():
+            self.model.activate(item.id)
+        # Stav zaškrtnutí určuje model, ne klik (např. klik na už aktivní položku)
+        self._sync([item])
+
+    def _on_model_changed(self, items):
+        self._sync(items)
+
+    def _sync(self, items):
+        self._syncing = True
+        try:
+            for item in items:
+                widget = self.widgets[item.id]
+                widget.set_sensitive(item.enabled)
+                if item.kind == RADIO and widget.get_active() != item.toggled:
+                    widget.set_active(item.toggled)
+        finally:
+            self._syncing = False
+
+
+def _variant(signature, value):
+    from gi.repository import GLib
+    return GLib.Variant(signature, value)
+
+
+class DBusMenuExporter:
+    """
+    <node>
+      <interface name="com.canonical.dbusmenu">
+        <property name="Version" type="u" access="read"/>
+        <property name="TextDirection" type="s" access="read"/>
+        <property name="Status" type="s" access="read"/>
+        <property name="IconThemePath" type="as" access="read"/>
+        <method name="GetLayout">
+          <arg type="i" name="parentId" direction="in"/>
+          <arg type="i" name="recursionDepth" direction="in"/>
+          <arg type="as" name="propertyNames" direction="in"/>
+          <arg type="u" name="revision" direction="out"/>
+          <arg type="(ia{sv}av)" name="layout" direction="out"/>
+        </method>
+        <method name="GetGroupProperties">
+          <arg type="ai" name="ids" direction="in"/>
+          <arg type="as" name="propertyNames" direction="in"/>
+          <arg type="a(ia{sv})" name="properties" direction="out"/>
+        </method>
+        <method name="GetProperty">
+          <arg type="i" name="id" direction="in"/>
+          <arg type="s" name="name" direction="in"/>
+          <arg type="v" name="value" direction="out"/>
+        </method>
+        <method name="Event">
+          <arg type="i" name="id" direction="in"/>
+          <arg type="s" name="eventId" direction="in"/>
+          <arg type="v" name="data" direction="in"/>
+          <arg type="u" name="timestamp" direction="in"/>
+        </method>
+        <method name="EventGroup">
+          <arg type="a(isvu)" name="events" direction="in"/>
+          <arg type="ai" name="idErrors" direction="out"/>
+        </method>
+        <method name="AboutToShow">
+          <arg type="i" name="id" direction="in"/>
+          <arg type="b" name="needUpdate" direction="out"/>
+        </method>
+        <method name="AboutToShowGroup">
+          <arg type="ai" name="ids" direction="in"/>
+          <arg type="ai" name="updatesNeeded" direction="out"/>
+          <arg type="ai" name="idErrors" direction="out"/>
+        </method>
+        <signal name="ItemsPropertiesUpdated">
+          <arg type="a(ia{sv})" name="updatedProps"/>
+          <arg type="a(ias)" name="removedProps"/>
+        </signal>
+        <signal name="LayoutUpdated">
+          <arg type="u" name="revision"/>
+          <arg type="i" name="parent"/>
+        </signal>
+        <signal name="ItemActivationRequested">
+          <arg type="i" name="id"/>
+          <arg type="u" name="timestamp"/>
+        </signal>
+      </interface>
+    </node>
+    """
+    ItemsPropertiesUpdated = _signal()
+    LayoutUpdated = _signal()
+    ItemActivationRequested = _signal()
+
+    OBJECT_PATH = "/MenuBar"
+
+    def __init__(self, model):
+        self.model = model
+        model.connect(self._on_model_changed)
+
+    @property
+    def Version(self): return 3
+    @property
+    def TextDirection(self): return "ltr"
+    @property
+    def Status(self): return "normal"
+    @property
+    def IconThemePath(self): return []
+
+    def _properties(self, item, names=()):
+        props = {"visible": _variant("b", True), "enabled": _variant("b", item.enabled)}
+        if item.kind == SEPARATOR:
+            props["type"] = _variant("s", "separator")
+        else:
+            props["label"] = _variant("s", item.label)
+        if item.kind == RADIO:
+            props["toggle-type"] = _variant("s", "radio")
+            props["toggle-state"] = _variant("i", 1 if item.toggled else 0)
+        if names:
+            props = {k: v for k, v in props.items() if k in names}
+        return props
+
+    def GetLayout(self, parentId, recursionDepth, propertyNames):
+        children = []
+        if parentId == 0 and recursionDepth != 0:
+            children = [_variant("(ia{sv}av)", (item.id, self._properties(item, propertyNames), []))
+                        for item in self.model.items]
+        elif parentId in self.model.by_id:
+            item = self.model.by_id[parentId]
+            return (self.model.revision, (item.id, self._properties(item, propertyNames), []))
+        root = {"children-display": _variant("s", "submenu")}
+        return (self.model.revision, (0, root, children))
+
+    def GetGroupProperties(self, ids, propertyNames):
+        items = self.model.items if not ids else [self.model.by_id[i] for i in ids if i in self.model.by_id]
+        return [(item.id, self._properties(item, propertyNames)) for item in items]
+
+    def GetProperty(self, id, name):
+        item = self.model.by_id.get(id)
+        if item is None:
+            return _variant("s", "")
+        return self._properties(item).get(name, _variant("s", ""))
+
+    def Event(self, id, eventId, data, timestamp):
+        if eventId == "clicked":
+            # Akce (ukládání režimu, trigger) až z hlavní smyčky, ne uvnitř volání metody
+            from gi.repository import GLib
+            GLib.idle_add(self._activate, id)
+
+    def _activate(self, item_id):
+        self.model.activate(item_id)
+        return False
+
+    def EventGroup(self, events):
+        errors = []
+        for item_id, event_id, data, timestamp in events:
+            if item_id not in self.model.by_id:
+                errors.append(item_id)
+                continue
+            self.Event(item_id, event_id, data, timestamp)
+        return errors
+
+    def AboutToShow(self, id):
+        # Model se udržuje průběžně, před zobrazením není co obnovovat
+        return False
+
+    def AboutToShowGroup(self, ids):
+        return ([], [i for i in ids if i != 0 and i not in self.model.by_id])
+
+    def _on_model_changed(self, items):
+        self.ItemsPropertiesUpdated([(item.id, self._properties(item)) for item in items], [])
@@ -0,0 +1,396 @@
+import os
+import struct
+import tempfile
+import time
+from dataclasses import dataclass
+
+from .config import runtime_dir
+from .layout import parse_orientation
+from .scheduler import _glib_timer_add, _glib_timer_remove
+from .sessions import _alive
+
+# Orientace přímo z iio-sensor-proxy přes D-Bus (net.hadess.SensorProxy)
+# místo parsování výstupu monitor-sensor.
+
+SENSOR_PROXY_NAME = "net.hadess.SensorProxy"
+SENSOR_PROXY_PATH = "/net/hadess/SensorProxy"
+SENSOR_PROXY_IFACE = "net.hadess.SensorProxy"
+PROPS_IFACE = "org.freedesktop.DBus.Properties"
+
+DEFAULT_STABLE_MS = 300
+DEFAULT_HYSTERESIS_MS = 700
+
+# Sdílený stav orientace: rezidentní vlastník senzoru (agent v
+# $XDG_RUNTIME_DIR/asus-screen-toggle, systémová služba v /run/asus-screen-toggle)
+# ho zapisuje atomicky, ostatní ho čtou jedním read() bez spouštění
+# senzorového klienta. Záznam pevné délky:
+#   magic "ASOR", verze, kód orientace, příznaky, pid vlastníka, čas zápisu
+# Čas je CLOCK_MONOTONIC (společný všem procesům, během uspání stojí).
+# Dokud vlastník senzor drží, obnovuje ho každých STATE_HEARTBEAT_S;
+# záznam starší než STATE_MAX_AGE_S patří vlastníkovi, který visí.
+ORIENTATION_STATE_NAME = "orientation"
+SYSTEM_STATE_DIR = "/run/asus-screen-toggle"
+STATE_MAGIC = b"ASOR"
+STATE_VERSION = 3
+FLAG_CLAIMED = 0x1
+STATE_HEARTBEAT_S = 10
+STATE_MAX_AGE_S = 3 * STATE_HEARTBEAT_S
+
+_STATE_RECORD = struct.Struct("<4sBBHid")
+ORIENTATION_CODES = ("", "normal", "bottom-up", "left-up", "right-up")
+
+
+@dataclass(frozen=True)
+class OrientationState:
+    orientation: str
+    claimed: bool
+    pid: int
+    updated: float
+
+    def age(self, now=None):
+        return (time.monotonic() if now is None else now) - self.updated
+
+    @property
+    def live(self):
+        """
+        Vlastník senzor drží a pořád běží - jinak je hodnota zastaralá.
+        kill(pid, 0) místo /proc/<pid>, který s hidepid= cizí procesy skrývá.
+        """
+        return self.claimed and _alive(self.pid)
+
+
+def orientation_state_path(directory=None):
+    directory = directory or runtime_dir()
+    return os.path.join(directory, ORIENTATION_STATE_NAME) if directory else None
+
+
+def write_orientation_state(orientation, claimed, path=None, clock=time.monotonic):
+    """Atomický zápis (rename), čtenář nikdy nevidí půlku záznamu."""
+    path = path or orientation_state_path()
+    if path is None:
+        return None
+    try:
+        code = ORIENTATION_CODES.index(orientation or "")
+    except ValueError:
+        code = 0
+    record = _STATE_RECORD.pack(STATE_MAGIC, STATE_VERSION, code, FLAG_CLAIMED if claimed else 0,
+                                os.getpid(), clock())
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".orientation-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(record)
+        # Systémovou kopii čtou uživatelské procesy
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+    return path
+
+
+def read_orientation_state(path):
+    """OrientationState ze souboru, nebo None (chybí, jiný formát)."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(_STATE_RECORD.size)
+    except OSError:
+        return None
+    if len(data) != _STATE_RECORD.size:
+        return None
+    magic, version, code, flags, pid, updated = _STATE_RECORD.unpack(data)
+    if magic != STATE_MAGIC or version != STATE_VERSION or code >= len(ORIENTATION_CODES):
+        return None
+    return OrientationState(ORIENTATION_CODES[code], bool(flags & FLAG_CLAIMED), pid, updated)
+
+
+def current_orientation(paths=None, max_age=STATE_MAX_AGE_S):
+    """
+    Orientace od živého vlastníka senzoru: nejdřív vlastní agent, pak
+    systémová služba. Zastaralý záznam (vlastník skončil, senzor uvolnil
+    nebo záznam neobnovil déle než `max_age` s) se přeskočí; nic -> ''.
+    """
+    if paths is None:
+        paths = [orientation_state_path(), orientation_state_path(SYSTEM_STATE_DIR)]
+    for path in paths:
+        state = read_orientation_state(path) if path else None
+        if state is None or not state.live:
+            continue
+        if max_age is not None and state.age() > max_age:
+            continue
+        return state.orientation
+    return ""
+
+
+class OrientationPublisher:
+    """
+    Drží soubor stavu aktuální; zapisuje při změně hodnoty nebo claimu
+    a s drženým senzorem ještě každých `heartbeat_s` obnoví čas zápisu.
+    Časovače a hodiny jsou injektovatelné jako u OrientationFilteru.
+    """
+
+    def __init__(self, path=None, heartbeat_s=STATE_HEARTBEAT_S, timer_add=_glib_timer_add,
+                 timer_remove=_glib_timer_remove, clock=time.monotonic):
+        self.path = path or orientation_state_path()
+        self.heartbeat_s = heartbeat_s
+        self._timer_add = timer_add
+        self._timer_remove = timer_remove
+        self._clock = clock
+        self._timer_id = None
+        self._last = None
+
+    def publish(self, orientation, claimed):
+        if self.path is None or (orientation, claimed) == self._last:
+            return
+        self._write(orientation, claimed)
+        self._schedule()
+
+    def _write(self, orientation, claimed):
+        try:
+            write_orientation_state(orientation, claimed, self.path, clock=self._clock)
+            self._last = (orientation, claimed)
+        except OSError as e:
+            # Příští publish() stejné hodnoty zápis zopakuje
+            self._last = None
+            print(f"OrientationPublisher: nelze zapsat {self.path}: {e}")
+
+    def _schedule(self):
+        if self._last is not None and self._last[1]:
+            if self._timer_id is None:
+                self._timer_id = self._timer_add(int(self.heartbeat_s * 1000), self._on_heartbeat)
+        else:
+            self._cancel()
+
+    def _on_heartbeat(self):
+        self._timer_id = None
+        if self._last is not None:
+            self._write(*self._last)
+        self._schedule()
+        return False
+
+    def _cancel(self):
+        if self._timer_id is not None:
+            self._timer_remove(self._timer_id)
+            self._timer_id = None
+
+    def close(self):
+        """Po skončení vlastníka soubor zmizí, čtenáři přejdou na další zdroj."""
+        self._cancel()
+        if self.path is None:
+            return
+        try: os.unlink(self.path)
+        except OSError: pass
+        self._last = None
+
+
+class OrientationClient:
+    """
+    Klient AccelerometerOrientation. Akcelerometr se drží (Claim) jen mezi
+    claim() a release(); změny chodí signálem PropertiesChanged a předávají
+    se rovnou `callback(orientation)`. Bus je injektovatelný (pydbus), takže
+    jde pustit proti zástupné službě na session/privátní sběrnici.
+    Mezi claim() a release() se claim obnovuje sám, kdykoli se
+    iio-sensor-proxy (znovu) objeví na sběrnici - i když první pokus selhal.
+    Ztrátu claimu se zmizelou proxy a jeho obnovení hlásí `claim_changed(claimed)`.
+    """
+
+    def __init__(self, callback, bus=None, claim_changed=None):
+        self.callback = callback
+        self.claim_changed = claim_changed
+        self._bus = bus
+        self._proxy = None
+        self._subscription = None
+        self._name_watch = None
+        self.claimed = False
+        # Claim požadovaný volajícím (claim() bez release()), i když zatím neuspěl
+        self.wanted = False
+        self.orientation = ""
+
+    @property
+    def bus(self):
+        if self._bus is None:
+            from pydbus import SystemBus
+            self._bus = SystemBus()
+        return self._bus
+
+    def claim(self):
+        self.wanted = True
+        if self.claimed:
+            return self.orientation
+        # Sledování jména dřív než první bus.get: proxy, která chybí nebo
+        # startuje až po nás, se převezme, jakmile se objeví; restart
+        # iio-sensor-proxy zahodí claim, po návratu ho obnovíme
+        if self._name_watch is None:
+            self._name_watch = self.bus.watch_name(
+                SENSOR_PROXY_NAME, name_appeared=self._on_proxy_appeared,
+                name_vanished=self._on_proxy_vanished)
+        if self._subscription is None:
+            self._subscription = self.bus.subscribe(
+                sender=SENSOR_PROXY_NAME, iface=PROPS_IFACE, signal="PropertiesChanged",
+                object=SENSOR_PROXY_PATH, signal_fired=self._on_properties_changed)
+        self._proxy = self.bus.get(SENSOR_PROXY_NAME, SENSOR_PROXY_PATH)
+        if not self._proxy.HasAccelerometer:
+            raise RuntimeError("iio-sensor-proxy: akcelerometr není k dispozici")
+        self._proxy.ClaimAccelerometer()
+        self.claimed = True
+        self._set(self._proxy.AccelerometerOrientation)
+        return self.orientation
+
+    def refresh(self):
+        """Znovu přečte orientaci (např. po probuzení, kdy mohl signál chybět)."""
+        if self.claimed and self._proxy is not None:
+            self._set(self._proxy.AccelerometerOrientation)
+
+    def release(self):
+        self.wanted = False
+        if not self.claimed:
+            return
+        self.claimed = False
+        try:
+            self._proxy.ReleaseAccelerometer()
+        except Exception as e:
+            print(f"OrientationClient: ReleaseAccelerometer selhal: {e}")
+
+    def close(self):
+        self.release()
+        try:
+            if self._subscription is not None: self._subscription.unsubscribe()
+            if self._name_watch is not None: self._name_watch.unwatch()
+        except Exception:
+            pass
+        self._subscription = None
+        self._name_watch = None
+
+    def _set(self, value):
+        orientation = parse_orientation(value)
+        if not orientation or orientation == self.orientation:
+            return
+        self.orientation = orientation
+        self.callback(orientation)
+
+    def _on_properties_changed(self, sender, path, iface, signal, params):
+        interface, changed, invalidated = params
+        if interface != SENSOR_PROXY_IFACE or not self.claimed:
+            return
+        if "AccelerometerOrientation" in changed:
+            self._set(changed["AccelerometerOrientation"])
+
+    def _on_proxy_appeared(self, *args):
+        # Zavolá se i hned po watch_name, když proxy už běží - platný claim nechat
+        if not self.wanted or (self.claimed and self._proxy is not None):
+            return
+        self.claimed = False
+        try:
+            self.claim()
+        except Exception as e:
+            print(f"OrientationClient: nový claim selhal: {e}")
+            return
+        if self.claim_changed:
+            self.claim_changed(True)
+
+    def _on_proxy_vanished(self, *args):
+        # Se zmizelou proxy zmizel i claim; poslední hodnota už neplatí
+        self._proxy = None
+        if self.claimed:
+            self.claimed = False
+            if self.claim_changed:
+                self.claim_changed(False)
+
+
+class OrientationFilter:
+    """
+    Mezi OrientationClient a zbytek: `feed(orientation)` dostává surové
+    hodnoty senzoru, `sink(orientation)` jen ustálené. Nová orientace se
+    předá, až vydrží `stable_ms`; návrat do právě opuštěné orientace
+    (kývání left-up <-> normal) musí vydržet ještě `hysteresis_ms` navíc.
+    Dokud `relevant()` vrací False (rotaci nikdo nepoužije), hodnoty se
+    jen zapamatují a nic se nespouští; `resync()` po změně relevance předá
+    poslední hodnotu, pokud se liší. Časovače jsou injektovatelné jako
+    u TriggerScheduleru.
+    """
+
+    def __init__(self, sink, stable_ms=DEFAULT_STABLE_MS, hysteresis_ms=DEFAULT_HYSTERESIS_MS,
+                 relevant=None, timer_add=_glib_timer_add, timer_remove=_glib_timer_remove,
+                 clock=time.monotonic):
+        self.sink = sink
+        self.stable_ms = max(0, int(stable_ms))
+        self.hysteresis_ms = max(0, int(hysteresis_ms))
+        self.relevant = relevant or (lambda: True)
+        self._timer_add = timer_add
+        self._timer_remove = timer_remove
+        self._clock = clock
+        self._timer_id = None
+        self._candidate = ""
+        self._raw = ""
+        self._previous = ""
+        # Poslední předaná (ustálená) orientace
+        self.orientation = ""
+
+        self.received = 0
+        self.forwarded = 0
+        self.filtered = 0
+        self.suppressed = 0
+
+    def feed(self, orientation):
+        self.received += 1
+        self._raw = orientation
+        if not self.relevant():
+            self.suppressed += 1
+            self._cancel()
+            return
+        if orientation == self.orientation:
+            # Kývnutí zpět před uplynutím okna - kandidát se zahodí
+            if self._timer_id is not None:
+                self.filtered += 1
+                self._cancel()
+            return
+        if not self.orientation:
+            # První hodnota po claimu je ustálená
+            self._forward(orientation)
+            return
+        if self._timer_id is not None:
+            # Kandidát se změnil dřív, než se ustálil
+            self.filtered += 1
+            self._cancel()
+        self._candidate = orientation
+        self._timer_id = self._timer_add(self.required_ms(orientation), self._on_stable)
+
+    def required_ms(self, orientation):
+        if orientation == self._previous:
+            return self.stable_ms + self.hysteresis_ms
+        return self.stable_ms
+
+    def resync(self):
+        """Po změně relevance (odpojení klávesnice, změna režimu) předá aktuální hodnotu."""
+        if self._raw and self._raw != self.orientation and self.relevant():
+            self._cancel()
+            self._forward(self._raw)
+
+    def _on_stable(self):
+        self._timer_id = None
+        if not self.relevant():
+            self.suppressed += 1
+            return False
+        self._forward(self._candidate)
+        return False
+
+    def _forward(self, orientation):
+        self._previous = self.orientation
+        self.orientation = orientation
+        self.forwarded += 1
+        self.sink(orientation)
+
+    def _cancel(self):
+        if self._timer_id is not None:
+            self._timer_remove(self._timer_id)
+            self._timer_id = None
+
+    def configure(self, stable_ms, hysteresis_ms):
+        self.stable_ms = max(0, int(stable_ms))
+        self.hysteresis_ms = max(0, int(hysteresis_ms))
+
+    def stats(self):
+        return {"received": self.received, "forwarded": self.forwarded,
+                "filtered": self.filtered, "suppressed": self.suppressed}
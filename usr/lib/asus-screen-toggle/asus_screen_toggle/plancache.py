@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+
+from .backends import OutputState, target_layout
+from .layout import LayoutPlan, ORIENTATIONS, USER_MODES, compute_plan, uses_orientation
+from .state import STATE_DIR
+
+# Předpočítané plány. Vstupů rozhodování je málo (režim × orientace ×
+# klávesnice), takže se plán pro každou dosažitelnou kombinaci spočítá
+# předem a trigger je jen jedno vyhledání. Cílové rozložení s absolutními
+# pozicemi závisí navíc na topologii výstupů (jména, velikosti módů, měřítko),
+# proto se přepočítá, kdykoli se otisk topologie změní.
+#
+# Cache patří jednomu typu sezení (x11 / kde / wlr) - topologie je model
+# jeho backendu, jiný backend v běžícím sezení dosažitelný není.
+
+PLAN_CACHE_FILE = os.path.join(STATE_DIR, "plan-cache.json")
+CACHE_VERSION = 1
+
+
+def cache_key(keyboard_connected, user_mode, orientation):
+    """Vstupy -> klíč; orientace, kterou compute_plan ignoruje, se nerozlišuje."""
+    if not uses_orientation(keyboard_connected, user_mode) or orientation not in ORIENTATIONS:
+        orientation = ""
+    return f"{int(bool(keyboard_connected))}|{user_mode}|{orientation}"
+
+
+def plan_signature(plan):
+    """Jen pole, na kterých závisí target_layout - různé režimy sdílí stejný cíl."""
+    return "|".join(str(v) for v in (plan.primary, plan.secondary, plan.enable_primary, plan.enable_secondary,
+                                     plan.mirror, plan.primary_rotation, plan.secondary_rotation,
+                                     plan.placement))
+
+
+def topology_fingerprint(backend, outputs):
+    topology = sorted((o.name, o.width, o.height, o.scale) for o in outputs.values())
+    return hashlib.sha1(json.dumps([backend, topology]).encode()).hexdigest()
+
+
+def config_fingerprint(config):
+    return "|".join((config.primary_display, config.secondary_display, config.preferred_mode))
+
+
+class PlanCache:
+    """
+    `lookup()` vrací hotový LayoutPlan (nebo None pro neznámý režim),
+    `target(plan, outputs)` hotové cílové rozložení pro aktuální model
+    backendu - volá ho Reconciler z vlákna aplikace, proto zámek.
+    """
+
+    def __init__(self, backend, config, path=PLAN_CACHE_FILE, clock=time.time):
+        self.backend = backend or ""
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._config_key = config_fingerprint(config)
+        self._config = config
+        self.fingerprint = None
+        self.plans = {}
+        self.targets = {}
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+
+    def load(self):
+        """Načte uloženou cache; jiná verze, backend nebo konfigurace = přepočet plánů."""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if (data.get("version") != CACHE_VERSION or data.get("backend") != self.backend
+                    or data.get("config") != self._config_key):
+                raise ValueError("stale")
+            plans = {key: LayoutPlan(**p) for key, p in data["plans"].items()}
+            targets = {sig: {name: OutputState(**o) for name, o in t.items()}
+                       for sig, t in data["targets"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            with self._lock:
+                self._build_plans()
+            return False
+        with self._lock:
+            self.plans, self.targets = plans, targets
+            self.fingerprint = data.get("fingerprint")
+        return True
+
+    def set_config(self, config):
+        key = config_fingerprint(config)
+        with self._lock:
+            self._config = config
+            if key == self._config_key:
+                return
+            self._config_key = key
+            self._build_plans()
+            # Jména výstupů se mohla změnit, cíle se dopočítají při další aplikaci
+            self.targets = {}
+            self.fingerprint = None
+
+    def _build_plans(self):
+        config = self._config
+        plans = {}
+        for keyboard_connected in (False, True):
+            for mode in USER_MODES:
+                for orientation in ("",) + tuple(ORIENTATIONS):
+                    key = cache_key(keyboard_connected, mode, orientation)
+                    if key in plans:
+                        continue
+                    plans[key] = compute_plan(keyboard_connected, mode, orientation, self.backend,
+                                              preferred_mode=config.preferred_mode,
+                                              primary=config.primary_display,
+                                              secondary=config.secondary_display)
+        self.plans = plans
+        self.builds += 1
+
+    def lookup(self, keyboard_connected, user_mode, orientation):
+        with self._lock:
+            plan = self.plans.get(cache_key(keyboard_connected, user_mode, orientation))
+            if plan is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return plan
+
+    def target(self, plan, outputs):
+        """Cíl pro `plan` nad modelem `outputs`; změna topologie přepočítá všechny cíle."""
+        with self._lock:
+            fingerprint = topology_fingerprint(self.backend, outputs)
+            if fingerprint != self.fingerprint:
+                self._build_targets(outputs, fingerprint)
+            target = self.targets.get(plan_signature(plan))
+            if target is None:
+                self.misses += 1
+                target = target_layout(plan, outputs)
+                self.targets[plan_signature(plan)] = target
+        return dict(target)
+
+    def _build_targets(self, outputs, fingerprint):
+        self.targets = {}
+        for plan in self.plans.values():
+            signature = plan_signature(plan)
+            if signature not in self.targets:
+                self.targets[signature] = target_layout(plan, outputs)
+        self.fingerprint = fingerprint
+        self.builds += 1
+        try:
+            self._save()
+        except OSError as e:
+            print(f"PlanCache: nelze uložit {self.path}: {e}")
+
+    def _save(self):
+        data = {
+            "version": CACHE_VERSION,
+            "backend": self.backend,
+            "config": self._config_key,
+            "fingerprint": self.fingerprint,
+            "built": self.clock(),
+            "plans": {key: plan.to_dict() for key, plan in self.plans.items()},
+            "targets": {sig: {name: asdict(o) for name, o in t.items()} for sig, t in self.targets.items()},
+        }
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".plan-cache-", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            try: os.unlink(tmp)
+            except OSError: pass
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "builds": self.builds,
+                    "plans": len(self.plans), "targets": len(self.targets)}
@@ -0,0 +1,85 @@
+import time
+
+from .backends import target_layout
+
+# Porovnání cílového rozložení s posledním známým skutečným stavem.
+# Backendu se pošle jen rozdíl, nebo vůbec nic - opakovaný DRM_CHANGE nebo
+# rotace s připojenou klávesnicí tak nestojí žádný proces ani modeset.
+
+# Model bez živých signálů (xrandr, wlr-randr) může zastarat změnou z jiného
+# nástroje; starší model se před porovnáním jednou znovu načte.
+DEFAULT_MAX_AGE = 10.0
+
+
+def output_matches(target, actual, compare_mirror=False):
+    """
+    Odpovídá skutečný stav výstupu cíli? S `compare_mirror` (backend zná
+    skutečné zrcadlení - xrandr, KScreen) musí sedět i mirror_of, jinak je
+    zrcadlení jen stejná pozice obou výstupů.
+    """
+    if actual is None:
+        return False
+    if not target.enabled:
+        return not actual.enabled
+    if not actual.enabled or target.rotation != actual.rotation:
+        return False
+    if compare_mirror and target.mirror_of != actual.mirror_of:
+        return False
+    return target.x is not None and (target.x, target.y) == (actual.x, actual.y)
+
+
+def diff_layout(target, actual, compare_mirror=False):
+    """Výstupy z `target`, které se liší od `actual`."""
+    return {name: out for name, out in target.items()
+            if not output_matches(out, actual.get(name), compare_mirror)}
+
+
+class Reconciler:
+    """
+    Obal backendu se stejným `apply_plan(plan)`. Počítá, kolik aplikací bylo
+    přeskočeno (nic se neměnilo) a kolik zmenšeno (poslán jen část výstupů).
+    S `plan_cache` (plancache.PlanCache) se cíl nepočítá, jen vyhledá.
+    """
+
+    def __init__(self, backend, max_age=DEFAULT_MAX_AGE, clock=time.monotonic, plan_cache=None):
+        self.backend = backend
+        self.plan_cache = plan_cache
+        self.max_age = max_age
+        self.clock = clock
+        self.applied = 0
+        self.skipped = 0
+        self.reduced = 0
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def stats(self):
+        return {"applied": self.applied, "skipped": self.skipped, "reduced": self.reduced,
+                "transactions": self.backend.transactions}
+
+    def _model(self):
+        backend = self.backend
+        stale = (not backend.live and self.max_age is not None and backend.refreshed_at is not None
+                 and self.clock() - backend.refreshed_at > self.max_age)
+        if not backend.outputs or stale:
+            backend.refresh()
+        return backend.outputs
+
+    def apply_plan(self, plan):
+        actual = self._model()
+        if self.plan_cache is not None:
+            target = self.plan_cache.target(plan, actual)
+        else:
+            target = target_layout(plan, actual)
+        delta = diff_layout(target, actual, self.backend.reports_mirror)
+        if not delta:
+            self.skipped += 1
+            return True
+        # Relativní umístění (neznámé velikosti) potřebuje oba výstupy
+        if any(out.enabled and out.x is None for out in target.values()):
+            delta = target
+        elif len(delta) < len(target):
+            self.reduced += 1
+        self.applied += 1
+        return self.backend.apply(delta, plan.placement)
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import time
+
+from .layout import LayoutPlan
+from .state import STATE_DIR
+
+# Rychlá cesta po probuzení: místo restartu celé systémové služby a čekání
+# na další událost se hned znovu aplikuje poslední úspěšně aplikovaný plán
+# (last-layout.json), klávesnice a orientace se ověří až potom a opraví se
+# jen to, co se liší.
+
+LAST_LAYOUT_FILE = os.path.join(STATE_DIR, "last-layout.json")
+
+LOGIND_NAME = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+MANAGER_IFACE = "org.freedesktop.login1.Manager"
+
+# USB klávesnice se po probuzení znovu enumeruje, senzor posílá první hodnotu
+RECHECK_DELAY_MS = 1000
+
+
+def save_last_layout(plan, path=LAST_LAYOUT_FILE):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".last-layout-", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"saved": time.time(), "plan": plan.to_dict()}, f)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+
+
+def load_last_layout(path=LAST_LAYOUT_FILE):
+    """LayoutPlan z posledního úspěšného běhu, nebo None (chybí / jiná verze formátu)."""
+    try:
+        with open(path, 'r') as f:
+            return LayoutPlan(**json.load(f)["plan"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class SleepMonitor:
+    """`callback(sleeping)` na signál logind PrepareForSleep (False = probuzení)."""
+
+    def __init__(self, callback, bus=None):
+        self.callback = callback
+        self._bus = bus
+        self._subscription = None
+
+    def start(self):
+        if self._bus is None:
+            from pydbus import SystemBus
+            self._bus = SystemBus()
+        self._subscription = self._bus.subscribe(
+            sender=LOGIND_NAME, iface=MANAGER_IFACE, signal="PrepareForSleep",
+            object=LOGIND_PATH, signal_fired=self._on_prepare_for_sleep)
+
+    def stop(self):
+        if self._subscription is not None:
+            try: self._subscription.unsubscribe()
+            except Exception: pass
+            self._subscription = None
+
+    def _on_prepare_for_sleep(self, sender, path, iface, signal, params):
+        self.callback(bool(params[0]))
+
+
+class ResumeTracker:
+    """
+    Fáze jednoho probuzení: 'instant' (aplikace uloženého plánu) ->
+    'waiting' (čeká se na ověření) -> 'recheck' (běh s čerstvým stavem).
+    Doba do správného displeje je konec okamžité aplikace, pokud ověření
+    nic neopravilo, jinak konec opravy.
+
+    `run` je číslo běhu plánovače, který fázi patří - aplikace, která už
+    běžela, když probuzení přišlo, fázi neposune.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.phase = "instant"
+        self.instant_ms = None
+        self.run = None
+
+    def owns(self, run):
+        return self.run is not None and run == self.run
+
+    def elapsed_ms(self):
+        return round((self.clock() - self.started) * 1000.0, 3)
+
+    def instant_done(self):
+        self.instant_ms = self.elapsed_ms()
+        self.phase = "waiting"
+
+    def recheck_started(self):
+        self.phase = "recheck"
+
+    def recheck_done(self, corrected):
+        """Vrací ms od probuzení do správného stavu."""
+        self.phase = "done"
+        if corrected or self.instant_ms is None:
+            return self.elapsed_ms()
+        return self.instant_ms
@@ -0,0 +1,110 @@
+import time
+
+# Single-flight plánovač aplikace rozložení.
+#
+# Nejvýš jedna aplikace běží současně. Triggery během čekání na klid se
+# sloučí do jednoho běhu, triggery během běhu do právě jednoho následného
+# běhu (ten si stav čte až při startu, takže vždy pracuje s posledním stavem).
+
+DEFAULT_QUIET_MS = 50
+DEFAULT_MAX_WAIT_MS = 1000
+
+
+def _glib_timer_add(ms, callback):
+    from gi.repository import GLib
+    return GLib.timeout_add(ms, callback)
+
+
+def _glib_timer_remove(source_id):
+    from gi.repository import GLib
+    GLib.source_remove(source_id)
+
+
+class TriggerScheduler:
+    """
+    `runner(reason, done)` spustí aplikaci a po jejím konci zavolá
+    `done(result)` v hlavní smyčce. Časovače jsou injektovatelné
+    (`timer_add(ms, cb)` / `timer_remove(id)`), výchozí jsou z GLib.
+    """
+
+    def __init__(self, runner, quiet_ms=DEFAULT_QUIET_MS, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 timer_add=_glib_timer_add, timer_remove=_glib_timer_remove, clock=time.monotonic):
+        self.runner = runner
+        self.quiet_ms = max(0, int(quiet_ms))
+        self.max_wait_ms = max(self.quiet_ms, int(max_wait_ms))
+        self._timer_add = timer_add
+        self._timer_remove = timer_remove
+        self._clock = clock
+
+        self._timer_id = None
+        self._first_wait = None
+        self._running = False
+        self._pending = False
+        self._reasons = {}
+
+        self.received = 0
+        self.merged = 0
+        self.runs = 0
+        self.last_result = None
+
+    @property
+    def busy(self):
+        return self._running or self._timer_id is not None
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def pending(self):
+        """Během běhu přišel trigger - po něm proběhne ještě jeden."""
+        return self._pending
+
+    def trigger(self, reason="Internal"):
+        self.received += 1
+        self._reasons[reason] = None
+
+        if self._running:
+            if self._pending:
+                self.merged += 1
+            self._pending = True
+            return
+
+        if self._timer_id is not None:
+            self.merged += 1
+            # Okno klidu se posouvá, ale nejdéle max_wait_ms od prvního triggeru
+            waited_ms = (self._clock() - self._first_wait) * 1000
+            if waited_ms + self.quiet_ms <= self.max_wait_ms:
+                self._timer_remove(self._timer_id)
+                self._timer_id = self._timer_add(self.quiet_ms, self._on_quiet)
+            return
+
+        self._arm()
+
+    def stats(self):
+        return {"received": self.received, "merged": self.merged, "runs": self.runs}
+
+    def _arm(self):
+        self._first_wait = self._clock()
+        self._timer_id = self._timer_add(self.quiet_ms, self._on_quiet)
+
+    def _on_quiet(self):
+        self._timer_id = None
+        self._running = True
+        self.runs += 1
+        reason = "+".join(self._reasons) or "Internal"
+        self._reasons = {}
+        try:
+            self.runner(reason, self._on_done)
+        except Exception as e:
+            print(f"TriggerScheduler: běh selhal: {e}")
+            self._on_done(False)
+        return False
+
+    def _on_done(self, result=None):
+        self.last_result = result
+        self._running = False
+        if self._pending:
+            self._pending = False
+            self._arm()
+        return False
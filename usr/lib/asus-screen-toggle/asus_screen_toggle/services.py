@@ -0,0 +1,133 @@
+# Stav systemd jednotek přes D-Bus (org.freedesktop.systemd1) místo
+# `systemctl is-active` / `is-enabled`. Uživatelské jednotky jdou přes
+# session bus (user manager), systémové přes system bus.
+
+SYSTEMD_NAME = "org.freedesktop.systemd1"
+SYSTEMD_PATH = "/org/freedesktop/systemd1"
+UNIT_IFACE = "org.freedesktop.systemd1.Unit"
+MANAGER_IFACE = "org.freedesktop.systemd1.Manager"
+PROPS_IFACE = "org.freedesktop.DBus.Properties"
+
+
+class UnitStatus:
+    def __init__(self, name, user):
+        self.name = name
+        self.user = user
+        self.path = None
+        self.active_state = "unknown"
+        self.unit_file_state = "unknown"
+
+    @property
+    def active(self):
+        return self.active_state == "active"
+
+    @property
+    def enabled(self):
+        return self.unit_file_state == "enabled"
+
+
+class UnitWatcher:
+    """
+    Drží ActiveState/UnitFileState sledovaných jednotek. Stav se načte
+    jednou (GetAll na každou jednotku) a pak se obnovuje jen ze signálů
+    PropertiesChanged, resp. UnitFilesChanged (enable/disable).
+    `callback(status)` se volá v hlavní smyčce při každé změně.
+    """
+
+    def __init__(self, callback, session_bus=None, system_bus=None):
+        self.callback = callback
+        self.units = {}
+        self._buses = {True: session_bus, False: system_bus}
+        self._subscriptions = []
+
+    def add(self, name, user=True):
+        self.units[name] = UnitStatus(name, user)
+
+    def start(self):
+        for user in (True, False):
+            units = [u for u in self.units.values() if u.user == user]
+            if not units:
+                continue
+            bus = self._bus(user)
+            manager = bus.get(SYSTEMD_NAME, SYSTEMD_PATH)
+            try:
+                # Bez odběratele systemd změny jednotek neposílá
+                manager.Subscribe()
+            except Exception as e:
+                print(f"UnitWatcher: Subscribe selhal: {e}")
+            for unit in units:
+                unit.path = manager.LoadUnit(unit.name)
+                self._subscriptions.append(bus.subscribe(
+                    sender=SYSTEMD_NAME, iface=PROPS_IFACE, signal="PropertiesChanged",
+                    object=unit.path, signal_fired=self._on_properties_changed))
+            self._subscriptions.append(bus.subscribe(
+                sender=SYSTEMD_NAME, iface=MANAGER_IFACE, signal="UnitFilesChanged",
+                object=SYSTEMD_PATH, signal_fired=self._on_unit_files_changed))
+        self.refresh()
+
+    def stop(self):
+        for sub in self._subscriptions:
+            try: sub.unsubscribe()
+            except Exception: pass
+        self._subscriptions = []
+
+    def refresh(self):
+        """Načte stav všech jednotek najednou (jeden GetAll na jednotku, bez forků)."""
+        self.apply(self.fetch())
+
+    def fetch(self):
+        """Jen čtení z D-Bus, bez callbacků - smí běžet i mimo hlavní vlákno."""
+        return {unit.name: self._get_all(unit) for unit in self.units.values() if unit.path is not None}
+
+    def apply(self, props_by_name):
+        for name, props in props_by_name.items():
+            self._update(self.units[name], props)
+
+    def _bus(self, user):
+        if self._buses[user] is None:
+            from pydbus import SessionBus, SystemBus
+            self._buses[user] = SessionBus() if user else SystemBus()
+        return self._buses[user]
+
+    def _get_all(self, unit):
+        return self._bus(unit.user).con.call_sync(
+            SYSTEMD_NAME, unit.path, PROPS_IFACE, "GetAll",
+            _variant("(s)", (UNIT_IFACE,)), None, 0, -1, None).unpack()[0]
+
+    def _read(self, unit):
+        if unit.path is None:
+            return
+        self._update(unit, self._get_all(unit))
+
+    def _update(self, unit, props):
+        changed = False
+        if "ActiveState" in props and props["ActiveState"] != unit.active_state:
+            unit.active_state = props["ActiveState"]
+            changed = True
+        if "UnitFileState" in props and props["UnitFileState"] != unit.unit_file_state:
+            unit.unit_file_state = props["UnitFileState"]
+            changed = True
+        if changed:
+            self.callback(unit)
+
+    def _on_properties_changed(self, sender, path, iface, signal, params):
+        interface, changed, invalidated = params
+        if interface != UNIT_IFACE:
+            return
+        for unit in self.units.values():
+            if unit.path != path:
+                continue
+            if invalidated and ("ActiveState" in invalidated or "UnitFileState" in invalidated):
+                self._read(unit)
+            else:
+                self._update(unit, changed)
+
+    def _on_unit_files_changed(self, sender, path, iface, signal, params):
+        # Enable/disable nemění vlastnosti přes PropertiesChanged
+        for unit in self.units.values():
+            self._read(unit)
+
+
+def _variant(signature, value):
+    from gi.repository import GLib
+    return GLib.Variant(signature, value)
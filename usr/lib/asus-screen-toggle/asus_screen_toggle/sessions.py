@@ -0,0 +1,289 @@
+import json
+import os
+import shlex
+import tempfile
+
+from .config import runtime_dir
+
+# Sezení z org.freedesktop.login1 přímo přes D-Bus místo
+# `loginctl list-sessions` + šesti `loginctl show-session` na každé sezení.
+# Jeden ListSessions a jeden GetAll na sezení; SessionCache se pak udržuje
+# ze signálů SessionNew / SessionRemoved / PropertiesChanged.
+# Systémová sběrnice se bere z DBUS_SYSTEM_BUS_ADDRESS, takže jde pustit
+# proti zástupné službě na privátní sběrnici (utilities/bench/fake-logind.py).
+#
+# Signály odebírá jen rezidentní systémová služba (asus-check-rotation) -
+# dispatcher je nový proces pro každou událost. Služba po každé změně
+# atomicky zapíše snímek sezení do /run/asus-screen-toggle/sessions.json
+# a dispatcher (router i shellové list_sessions) ho jen přečte; ListSessions
+# + GetAll dělá sám, jen když snímek chybí nebo jeho vlastník neběží.
+
+LOGIND_NAME = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+MANAGER_IFACE = "org.freedesktop.login1.Manager"
+SESSION_IFACE = "org.freedesktop.login1.Session"
+PROPS_IFACE = "org.freedesktop.DBus.Properties"
+
+GREETERS = ("sddm", "gdm", "lightdm")
+GRAPHICAL_TYPES = ("x11", "wayland")
+
+SESSIONS_STATE_NAME = "sessions.json"
+SNAPSHOT_VERSION = 1
+# Pole Session ve snímku (stejná jména jako atributy)
+_SNAPSHOT_FIELDS = ("sid", "path", "name", "type", "desktop", "state", "uid", "runtime_path", "display",
+                    "wayland_display")
+
+
+class Session:
+    def __init__(self, sid, path):
+        self.sid = sid
+        self.path = path
+        self.name = ""
+        self.type = ""
+        self.desktop = ""
+        self.state = ""
+        self.uid = 0
+        self.runtime_path = ""
+        self.display = ""
+        self.wayland_display = ""
+
+    def update(self, props):
+        if "Name" in props: self.name = props["Name"]
+        if "Type" in props: self.type = props["Type"]
+        if "Desktop" in props: self.desktop = props["Desktop"]
+        if "State" in props: self.state = props["State"]
+        if "User" in props: self.uid = props["User"][0]
+        if "RuntimePath" in props: self.runtime_path = props["RuntimePath"]
+        if "Display" in props: self.display = props["Display"]
+        # Novější logind, starší verze ji nemají
+        if "WaylandDisplay" in props: self.wayland_display = props["WaylandDisplay"]
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in _SNAPSHOT_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls(str(data["sid"]), str(data["path"]))
+        for field in _SNAPSHOT_FIELDS[2:]:
+            if field in data:
+                setattr(session, field, data[field])
+        return session
+
+    @property
+    def eligible(self):
+        """Stejná pravidla jako prepare_user_context: aktivní grafické sezení, ne greeter."""
+        return (self.state == "active" and self.name not in GREETERS
+                and self.type in GRAPHICAL_TYPES)
+
+    def shell_line(self):
+        """Přiřazení proměnných pro `eval` v dispatcheru (jména jako v helpers.sh)."""
+        values = (
+            ("sid", self.sid),
+            ("user", self.name),
+            ("type", self.type),
+            ("desktop", self.desktop),
+            ("state", self.state),
+            ("USER_UID", self.uid),
+            ("runtime_path", self.runtime_path or f"/run/user/{self.uid}"),
+            ("display", self.display),
+            ("wayland_disp", self.wayland_display),
+        )
+        return " ".join(f"{key}={shlex.quote(str(value))}" for key, value in values)
+
+
+def session_state_path(directory=None):
+    directory = directory or runtime_dir()
+    return os.path.join(directory, SESSIONS_STATE_NAME) if directory else None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshot(path):
+    """{sid: Session} ze snímku živého vlastníka, jinak None (chybí, cizí formát, vlastník skončil)."""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get("version") != SNAPSHOT_VERSION or not _alive(int(data["pid"])):
+            return None
+        return {session.sid: session for session in map(Session.from_dict, data["sessions"])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class SessionCache:
+    """
+    Sezení podle ID. `refresh()` načte všechna najednou, `start()` navíc
+    odebírá signály logind a cache průběžně doplňuje. `callback(session,
+    removed)` se volá při každé změně ze signálu. S `snapshot_path` se po
+    každé změně zapíše snímek pro jiné procesy (`load_snapshot()`).
+    """
+
+    def __init__(self, bus=None, callback=None, snapshot_path=None):
+        self.bus = bus
+        self.callback = callback
+        self.snapshot_path = snapshot_path
+        self.sessions = {}
+        self._subscriptions = []
+
+    def _bus(self):
+        if self.bus is None:
+            from pydbus import SystemBus
+            self.bus = SystemBus()
+        return self.bus
+
+    def start(self):
+        bus = self._bus()
+        # Odběr před načtením, ať se mezi tím neztratí nové sezení
+        self._subscriptions.append(bus.subscribe(
+            sender=LOGIND_NAME, iface=MANAGER_IFACE, signal="SessionNew",
+            object=LOGIND_PATH, signal_fired=self._on_session_new))
+        self._subscriptions.append(bus.subscribe(
+            sender=LOGIND_NAME, iface=MANAGER_IFACE, signal="SessionRemoved",
+            object=LOGIND_PATH, signal_fired=self._on_session_removed))
+        self._subscriptions.append(bus.subscribe(
+            sender=LOGIND_NAME, iface=PROPS_IFACE, signal="PropertiesChanged",
+            signal_fired=self._on_properties_changed))
+        self.refresh()
+
+    def stop(self):
+        for sub in self._subscriptions:
+            try: sub.unsubscribe()
+            except Exception: pass
+        self._subscriptions = []
+        if self.snapshot_path:
+            # Bez vlastníka, který by ho udržoval, už snímek neplatí
+            try: os.unlink(self.snapshot_path)
+            except OSError: pass
+
+    def load_snapshot(self, path=None):
+        """Sezení ze snímku rezidentní služby; False = snímek nepoužitelný, zavolej refresh()."""
+        sessions = read_snapshot(path or session_state_path())
+        if sessions is None:
+            return False
+        self.sessions = sessions
+        return True
+
+    def refresh(self):
+        sessions = {}
+        for sid, uid, user, seat, path in self._call(LOGIND_PATH, MANAGER_IFACE, "ListSessions"):
+            session = self.sessions.get(sid) or Session(sid, path)
+            try:
+                session.update(self._get_all(path))
+            except Exception as e:
+                # Sezení mezi ListSessions a GetAll zaniklo
+                print(f"SessionCache: {sid} nelze načíst: {e}")
+                continue
+            sessions[sid] = session
+        self.sessions = sessions
+        self._save_snapshot()
+        return self.sessions
+
+    def eligible(self):
+        return [s for s in self.sessions.values() if s.eligible]
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        data = {"version": SNAPSHOT_VERSION, "pid": os.getpid(),
+                "sessions": [session.to_dict() for session in self.sessions.values()]}
+        directory = os.path.dirname(self.snapshot_path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".sessions-", dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, indent=1)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, self.snapshot_path)
+            except BaseException:
+                try: os.unlink(tmp)
+                except OSError: pass
+                raise
+        except OSError as e:
+            print(f"SessionCache: {self.snapshot_path} nelze zapsat: {e}")
+
+    def _call(self, path, iface, method, signature=None, args=()):
+        params = _variant(signature, args) if signature else None
+        return self._bus().con.call_sync(
+            LOGIND_NAME, path, iface, method, params, None, 0, -1, None).unpack()[0]
+
+    def _get_all(self, path):
+        return self._call(path, PROPS_IFACE, "GetAll", "(s)", (SESSION_IFACE,))
+
+    def _changed(self, session, removed):
+        self._save_snapshot()
+        if self.callback:
+            self.callback(session, removed)
+
+    def _on_session_new(self, sender, path, iface, signal, params):
+        sid, session_path = params
+        session = Session(sid, session_path)
+        try:
+            session.update(self._get_all(session_path))
+        except Exception as e:
+            print(f"SessionCache: {sid} nelze načíst: {e}")
+            return
+        self.sessions[sid] = session
+        self._changed(session, False)
+
+    def _on_session_removed(self, sender, path, iface, signal, params):
+        sid, session_path = params
+        session = self.sessions.pop(sid, None)
+        if session is not None:
+            self._changed(session, True)
+
+    def _on_properties_changed(self, sender, path, iface, signal, params):
+        interface, changed, invalidated = params
+        if interface != SESSION_IFACE:
+            return
+        for session in self.sessions.values():
+            if session.path != path:
+                continue
+            # State v PropertiesChanged chodit nemusí (mění se spolu s Active) - načte se celé
+            try: changed = self._get_all(path)
+            except Exception: return
+            session.update(changed)
+            self._changed(session, False)
+            return
+
+
+def _variant(signature, value):
+    from gi.repository import GLib
+    return GLib.Variant(signature, value)
+
+
+def main(argv=None):
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(prog="python3 -m asus_screen_toggle.sessions")
+    parser.add_argument("--all", action="store_true", help="include inactive, greeter and non-graphical sessions")
+    parser.add_argument("--shell", action="store_true", help="print eval-able variable assignments (dispatcher)")
+    args = parser.parse_args(argv)
+
+    cache = SessionCache()
+    try:
+        if not cache.load_snapshot():
+            cache.refresh()
+    except Exception as e:
+        print(f"logind nedostupný: {e}", file=sys.stderr)
+        return 1
+    sessions = list(cache.sessions.values()) if args.all else cache.eligible()
+    for session in sessions:
+        if args.shell:
+            print(session.shell_line())
+        else:
+            print(f"{session.sid}\t{session.name}\t{session.uid}\t{session.type}\t"
+                  f"{session.state}\t{session.desktop}\t{session.display or session.wayland_display}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
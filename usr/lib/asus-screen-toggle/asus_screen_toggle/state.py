@@ -0,0 +1,109 @@
+import os
+import tempfile
+
+# Uživatelský režim (~/.local/state/asus-check-keyboard/state) - čtení,
+# atomický zápis a sledování změn z jiných procesů.
+
+STATE_DIR = os.path.expanduser("~/.local/state/asus-check-keyboard")
+STATE_FILE = os.path.join(STATE_DIR, "state")
+DEFAULT_MODE = "automatic-enabled"
+
+POLL_INTERVAL = 2
+
+
+def read_mode(path=STATE_FILE, default=DEFAULT_MODE):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip() or default
+    except OSError:
+        return default
+
+
+def write_mode(mode, path=STATE_FILE):
+    """Zápis přes dočasný soubor + rename, čtenář nikdy nevidí půlku obsahu."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".state-", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(mode + "\n")
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+
+
+class StateWatcher:
+    """
+    Hlásí změny souboru se stavem. Sleduje se adresář (inotify přes
+    Gio.FileMonitor), takže projde i zápis přes rename. Kde inotify není
+    (Gio vrátí polling monitor nebo selže), zůstává polling po POLL_INTERVAL s.
+    """
+
+    def __init__(self, callback, path=STATE_FILE, poll_interval=POLL_INTERVAL):
+        self.callback = callback
+        self.path = path
+        self.poll_interval = poll_interval
+        self.name = os.path.basename(path)
+        self._monitor = None
+        self._poll_id = None
+        self._last_mtime = self._mtime()
+
+    @property
+    def polling(self):
+        return self._poll_id is not None
+
+    def start(self):
+        from gi.repository import GLib, Gio
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            directory = Gio.File.new_for_path(os.path.dirname(self.path))
+            monitor = directory.monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            if type(monitor).__name__ == "GPollFileMonitor":
+                raise OSError("Gio vrátil polling monitor")
+        except (OSError, GLib.Error) as e:
+            print(f"StateWatcher: inotify nedostupné ({e}), polling po {self.poll_interval} s")
+            self._poll_id = GLib.timeout_add_seconds(self.poll_interval, self._poll)
+            return
+
+        self._monitor = monitor
+        self._monitor.connect("changed", self._on_changed)
+
+    def stop(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        if self._poll_id is not None:
+            from gi.repository import GLib
+            GLib.source_remove(self._poll_id)
+            self._poll_id = None
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _on_changed(self, monitor, file, other_file, event_type):
+        from gi.repository import Gio
+        names = (file.get_basename(), other_file.get_basename() if other_file else None)
+        if self.name not in names:
+            return
+        # CHANGED chodí po kouscích, stačí konec zápisu; rename/přesun/vytvoření hned
+        if event_type in (Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+                          Gio.FileMonitorEvent.CREATED,
+                          Gio.FileMonitorEvent.MOVED_IN,
+                          Gio.FileMonitorEvent.RENAMED):
+            self._notify()
+
+    def _poll(self):
+        self._notify()
+        return True
+
+    def _notify(self):
+        mtime = self._mtime()
+        if mtime is None or mtime == self._last_mtime:
+            return
+        self._last_mtime = mtime
+        self.callback()
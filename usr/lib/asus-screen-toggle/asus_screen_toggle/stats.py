@@ -0,0 +1,60 @@
+import time
+
+# Běhové statistiky agenta (rozhraní org.asus.ScreenToggle.Stats) - počty
+# triggerů podle zdroje a histogram doby aplikace, bez nutnosti zvyšovat
+# výřečnost logu.
+
+# Horní meze košů histogramu v ms; poslední koš (UNBOUNDED) je "nad"
+HISTOGRAM_BOUNDS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+UNBOUNDED = 0xFFFFFFFF
+
+FILE_CHANGE = "FileChange"
+
+
+class AgentStats:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.triggers = {}
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.applies = 0
+        self.failures = 0
+        self.last_apply_time = 0.0
+        self.last_apply_result = ""
+        self.last_apply_duration_ms = 0.0
+        self.resumes = 0
+        self.last_resume_ms = 0.0
+        self.last_resume_corrected = False
+        self.since = self.clock()
+
+    def count_trigger(self, source):
+        self.triggers[source] = self.triggers.get(source, 0) + 1
+
+    def record_apply(self, duration, ok):
+        """`duration` v sekundách (monotonic rozdíl)."""
+        ms = duration * 1000.0
+        index = len(HISTOGRAM_BOUNDS_MS)
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if ms <= bound:
+                index = i
+                break
+        self.histogram[index] += 1
+        self.applies += 1
+        if not ok:
+            self.failures += 1
+        self.last_apply_time = self.clock()
+        self.last_apply_result = "ok" if ok else "failed"
+        self.last_apply_duration_ms = round(ms, 3)
+
+    def record_resume(self, duration_ms, corrected):
+        """Probuzení -> správný displej; `corrected` = ověření muselo uložený plán opravit."""
+        self.resumes += 1
+        self.last_resume_ms = duration_ms
+        self.last_resume_corrected = corrected
+
+    def histogram_buckets(self):
+        """[(horní mez ms, počet)], poslední mez je UNBOUNDED."""
+        bounds = list(HISTOGRAM_BOUNDS_MS) + [UNBOUNDED]
+        return list(zip(bounds, self.histogram))
@@ -0,0 +1,217 @@
+import fcntl
+import os
+import re
+import struct
+import time
+from dataclasses import dataclass
+
+from .config import runtime_dir
+
+# Sdílený trasovací kruh přes procesy. Každá komponenta (rotační služba,
+# dispatcher, agent, asus-check-keyboard-user) připisuje záznamy pevné
+# délky do souboru trace.ring v runtime adresáři (root: /run/asus-screen-toggle,
+# uživatel: $XDG_RUNTIME_DIR/asus-screen-toggle). Zápis je pwrite pod flock,
+# nejstarší záznamy se přepisují. Časy jsou CLOCK_MONOTONIC, společné
+# všem procesům, takže kruhy roota a uživatele jdou spojit do jedné osy.
+#
+# Jedna událost (např. odpojení klávesnice) nese 64bitové ID, které putuje
+# v důvodu: "USB_ADD.0123456789abcdef" (tag_reason / split_reason).
+# Export do Chrome trace / Perfetto JSON dělá asus-screen-trace.
+
+TRACE_FILE_NAME = "trace.ring"
+SYSTEM_TRACE_DIR = "/run/asus-screen-toggle"
+MAGIC = b"ASTR"
+VERSION = 1
+DEFAULT_SLOTS = 4096
+
+# magic, verze, rezerva, počet slotů, pořadové číslo dalšího záznamu
+_HEADER = struct.Struct("<4sHHIQ")
+HEADER_SIZE = 64
+# čas začátku ns, ID události, trvání µs, pid, fáze, ok, etapa, důvod, sezení
+_RECORD = struct.Struct("<QQIIcB38s32s32s")
+
+PHASE_COMPLETE = "X"
+PHASE_INSTANT = "i"
+
+_TAG_RE = re.compile(r"^(.*)\.([0-9a-f]{16})$")
+
+
+def new_event_id():
+    return int.from_bytes(os.urandom(8), "little") or 1
+
+
+def tag_reason(reason, event_id):
+    return f"{reason}.{event_id:016x}" if event_id else reason
+
+
+def split_reason(text):
+    """'USB_ADD.<id>+Rotation' -> ('USB_ADD+Rotation', [id]); sloučené důvody nesou víc ID."""
+    reasons, ids = [], []
+    for part in (text or "").split("+"):
+        m = _TAG_RE.match(part)
+        if m:
+            reasons.append(m.group(1))
+            ids.append(int(m.group(2), 16))
+        else:
+            reasons.append(part)
+    return "+".join(reasons), ids
+
+
+def trace_path(directory=None):
+    directory = directory or runtime_dir()
+    return os.path.join(directory, TRACE_FILE_NAME) if directory else None
+
+
+@dataclass(frozen=True)
+class TraceRecord:
+    start_ns: int
+    event_id: int
+    duration_us: int
+    pid: int
+    phase: str
+    ok: bool
+    stage: str
+    reason: str
+    session: str
+
+
+def _text(value, size):
+    return (value or "").encode("utf-8", "replace")[:size]
+
+
+class TraceRing:
+    """
+    Kruh v jednom souboru. `append()` nikdy nevyhodí výjimku - trasování
+    nesmí shodit komponentu; při chybě se jednou vypíše a vypne.
+    """
+
+    def __init__(self, path=None, slots=DEFAULT_SLOTS, enabled=True, clock=time.monotonic_ns):
+        self.path = path if path is not None else trace_path()
+        self.slots = slots
+        self.clock = clock
+        self.enabled = enabled and self.path is not None
+        self._fd = None
+
+    def _open(self):
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                header = os.pread(fd, _HEADER.size, 0)
+                if len(header) < _HEADER.size or header[:4] != MAGIC:
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, HEADER_SIZE + self.slots * _RECORD.size)
+                    os.pwrite(fd, _HEADER.pack(MAGIC, VERSION, 0, self.slots, 0), 0)
+                else:
+                    # Velikost určil ten, kdo soubor založil
+                    self.slots = _HEADER.unpack(header)[3]
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._fd = fd
+        return self._fd
+
+    def append(self, event_id, stage, reason="", session="", start_ns=None, duration_ns=0,
+               phase=PHASE_COMPLETE, ok=True):
+        if not self.enabled:
+            return
+        if start_ns is None:
+            start_ns = self.clock()
+        record = _RECORD.pack(start_ns, event_id or 0, min(duration_ns // 1000, 0xFFFFFFFF), os.getpid(),
+                              phase.encode(), 1 if ok else 0, _text(stage, 38), _text(reason, 32),
+                              _text(session, 32))
+        try:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                magic, version, _r, slots, seq = _HEADER.unpack(os.pread(fd, _HEADER.size, 0))
+                os.pwrite(fd, record, HEADER_SIZE + (seq % slots) * _RECORD.size)
+                os.pwrite(fd, _HEADER.pack(magic, version, 0, slots, seq + 1), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        except (OSError, struct.error) as e:
+            print(f"TraceRing: {self.path}: {e}, trasování vypnuto")
+            self.enabled = False
+
+    def span(self, event_ids, stage, reason="", session="", start_ns=None, ok=True):
+        """Úsek od `start_ns` do teď, jeden záznam pro každé ID (sloučené triggery)."""
+        now = self.clock()
+        start_ns = now if start_ns is None else start_ns
+        for event_id in event_ids or [0]:
+            self.append(event_id, stage, reason, session, start_ns, now - start_ns, PHASE_COMPLETE, ok)
+
+    def mark(self, event_ids, stage, reason="", session=""):
+        for event_id in event_ids or [0]:
+            self.append(event_id, stage, reason, session, phase=PHASE_INSTANT)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def read_ring(path):
+    """Záznamy od nejstaršího; chybějící nebo cizí soubor -> []."""
+    try:
+        with open(path, 'rb') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+            data = f.read()
+    except OSError:
+        return []
+    if len(data) < HEADER_SIZE or data[:4] != MAGIC:
+        return []
+    _magic, version, _r, slots, seq = _HEADER.unpack_from(data, 0)
+    if version != VERSION:
+        return []
+    records = []
+    for n in range(max(0, seq - slots), seq):
+        offset = HEADER_SIZE + (n % slots) * _RECORD.size
+        if offset + _RECORD.size > len(data):
+            continue
+        start_ns, event_id, duration_us, pid, phase, ok, stage, reason, session = \
+            _RECORD.unpack_from(data, offset)
+        records.append(TraceRecord(start_ns, event_id, duration_us, pid, phase.decode("ascii", "replace"),
+                                   bool(ok), *(v.rstrip(b"\0").decode("utf-8", "replace")
+                                               for v in (stage, reason, session))))
+    return records
+
+
+def chrome_trace(records):
+    """Záznamy -> dict pro chrome://tracing / ui.perfetto.dev (časy v µs)."""
+    events = []
+    for r in sorted(records, key=lambda r: r.start_ns):
+        event = {
+            "name": r.stage,
+            "cat": r.reason.split("+")[0] or "trace",
+            "ph": r.phase,
+            "ts": r.start_ns / 1000.0,
+            "pid": r.pid,
+            "tid": r.pid,
+            "args": {"event": f"{r.event_id:016x}", "reason": r.reason, "session": r.session, "ok": r.ok},
+        }
+        if r.phase == PHASE_COMPLETE:
+            event["dur"] = r.duration_us
+        else:
+            event["s"] = "p"
+        events.append(event)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def critical_paths(records):
+    """
+    {ID události: (celkem µs, [(etapa, sezení, µs)], nejpomalejší etapa)} -
+    od prvního záznamu události po konec posledního.
+    """
+    by_event = {}
+    for r in records:
+        if r.event_id:
+            by_event.setdefault(r.event_id, []).append(r)
+    paths = {}
+    for event_id, items in by_event.items():
+        items.sort(key=lambda r: r.start_ns)
+        first = items[0].start_ns
+        last = max(r.start_ns + r.duration_us * 1000 for r in items)
+        hops = [(r.stage, r.session, r.duration_us) for r in items]
+        slowest = max((h for h in hops if h[2]), key=lambda h: h[2], default=None)
+        paths[event_id] = ((last - first) // 1000, hops, slowest)
+    return paths
@@ -1,20 +1,41 @@
 #!/bin/bash
 
+ASUS_PYTHONPATH=/usr/lib/asus-screen-toggle
+
+# Vypíše jeden řádek na sezení. SESSION_SOURCE=logind: přiřazení proměnných
+# z asus_screen_toggle.sessions (jeden průchod přes D-Bus, jen způsobilá
+# sezení); jinak / při selhání jen "sid=..." z loginctl a zbytek dočte
+# prepare_user_context.
+list_sessions() {
+    local out
+    if [[ "${SESSION_SOURCE:-loginctl}" == "logind" ]] && \
+        out=$(PYTHONPATH="$ASUS_PYTHONPATH" python3 -m asus_screen_toggle.sessions --shell 2>/dev/null); then
+        [[ -n "$out" ]] && printf '%s\n' "$out"
+        return 0
+    fi
+    loginctl list-sessions --no-legend | awk '{print "sid=" $1}'
+}
+
 prepare_user_context() {
-    local sid="$1"
+    local line="$1"
+
+    sid="" user="" type="" desktop="" state="" USER_UID="" runtime_path="" display="" wayland_disp=""
+    eval "$line"
 
-    user=$(loginctl show-session "$sid" -p Name --value)
-    type=$(loginctl show-session "$sid" -p Type --value)
-    desktop=$(loginctl show-session "$sid" -p Desktop --value)
-    state=$(loginctl show-session "$sid" -p State --value)
+    if [[ -z "$user" ]]; then
+        user=$(loginctl show-session "$sid" -p Name --value)
+        type=$(loginctl show-session "$sid" -p Type --value)
+        desktop=$(loginctl show-session "$sid" -p Desktop --value)
+        state=$(loginctl show-session "$sid" -p State --value)
+    fi
 
     [[ "$state" == "active" ]] || return 1
     [[ "$user" != "sddm" && "$user" != "gdm" && "$user" != "lightdm" ]] || return 1
     [[ "$type" == "x11" || "$type" == "wayland" ]] || return 1
 
-    USER_UID=$(loginctl show-session "$sid" -p User --value)
+    [[ -n "$USER_UID" ]] || USER_UID=$(loginctl show-session "$sid" -p User --value)
 
-    runtime_path=$(loginctl show-session "$sid" -p RuntimePath --value)
+    [[ -n "$runtime_path" ]] || runtime_path=$(loginctl show-session "$sid" -p RuntimePath --value)
     [[ -z "$runtime_path" ]] && runtime_path="/run/user/$USER_UID"
 
     dbus_address="unix:path=$runtime_path/bus"
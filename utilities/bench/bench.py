@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# Benchmark latence trigger -> aplikované rozložení.
+#
+# Na PATH podstrčí zástupné xrandr / kscreen-doctor / wlr-randr / lsusb /
+# monitor-sensor (fake-tool.py), klávesnici simuluje falešným sysfs
+# (ASUS_SCREEN_TOGGLE_SYSFS) a pro každý typ sezení projede scénáře:
+#
+#   cli-detach   odpojení/připojení klávesnice + asus-check-keyboard-user
+#   cli-noop     opakované spuštění beze změny
+#   agent-dbus   D-Bus SetMode (střídá režimy -> vždy skutečná změna)
+#   agent-signal SIGUSR1 beze změny stavu
+#   agent-wait   D-Bus TriggerAndWait - latence, jak ji vidí volající
+#   agent-storm  dávka SIGUSR1 najednou (kolik aplikací a za jak dlouho)
+#
+# Agent běží na vlastní session sběrnici (dbus-daemon); bez displeje nebo
+# tray knihoven se jeho scénáře přeskočí s důvodem.
+#
+#   utilities/bench/bench.py --runs 20 --json results.json
+import argparse
+import json
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+ROOT = os.path.normpath(os.path.join(HERE, "..", ".."))
+CLI = os.path.join(ROOT, "usr", "bin", "asus-check-keyboard-user.sh")
+AGENT = os.path.join(ROOT, "usr", "bin", "asus-user-agent.py")
+TOOLS = ("xrandr", "kscreen-doctor", "wlr-randr", "lsusb", "monitor-sensor")
+
+SESSIONS = {
+    "x11": {"XDG_SESSION_TYPE": "x11", "XDG_CURRENT_DESKTOP": "XFCE"},
+    "kde": {"XDG_SESSION_TYPE": "wayland", "XDG_CURRENT_DESKTOP": "KDE"},
+    "wlr": {"XDG_SESSION_TYPE": "wayland", "XDG_CURRENT_DESKTOP": "sway"},
+}
+
+INITIAL_DISPLAY = {
+    "eDP-1": {"enabled": True, "rotation": "normal", "x": 0, "y": 0, "width": 2880, "height": 1800},
+    "eDP-2": {"enabled": True, "rotation": "normal", "x": 0, "y": 1800, "width": 2880, "height": 1800},
+}
+
+
+def percentile(values, p):
+    """Percentil metodou nejbližšího pořadí (ms)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return round(ordered[index] * 1000.0, 2)
+
+
+def summarize(latencies, spawns, wall, extra=None):
+    result = {
+        "runs": len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "spawns_per_trigger": round(sum(spawns) / len(spawns), 2) if spawns else 0,
+        "wall_s": round(wall, 3),
+    }
+    result.update(extra or {})
+    return result
+
+
+class Sandbox:
+    """Dočasný HOME, PATH se zástupnými nástroji, falešné sysfs a stav displeje."""
+
+    def __init__(self, session, delay_scale):
+        self.dir = tempfile.mkdtemp(prefix="asus-bench-")
+        self.bin = os.path.join(self.dir, "bin")
+        self.sysfs = os.path.join(self.dir, "sysfs")
+        self.home = os.path.join(self.dir, "home")
+        self.runtime = os.path.join(self.dir, "run")
+        self.log = os.path.join(self.dir, "calls.jsonl")
+        self.display = os.path.join(self.dir, "display.json")
+        for path in (self.bin, self.sysfs, self.home, self.runtime):
+            os.makedirs(path)
+        os.chmod(self.runtime, 0o700)
+        for tool in TOOLS:
+            os.symlink(os.path.join(HERE, "fake-tool.py"), os.path.join(self.bin, tool))
+        with open(self.display, 'w') as f:
+            json.dump(INITIAL_DISPLAY, f)
+        open(self.log, 'w').close()
+
+        self.env = dict(os.environ)
+        self.env.update(SESSIONS[session])
+        self.env.update({
+            "PATH": self.bin + os.pathsep + os.environ.get("PATH", ""),
+            "HOME": self.home,
+            "XDG_RUNTIME_DIR": self.runtime,
+            "LANG": "C", "LC_ALL": "C",
+            "PYTHONUNBUFFERED": "1",
+            "ASUS_SCREEN_TOGGLE_SYSFS": self.sysfs,
+            "BENCH_LOG": self.log,
+            "BENCH_DISPLAY": self.display,
+            "BENCH_DELAY_SCALE": str(delay_scale),
+        })
+        self.set_keyboard(True)
+
+    def set_keyboard(self, attached):
+        dev = os.path.join(self.sysfs, "3-2")
+        if attached and not os.path.isdir(dev):
+            os.makedirs(dev)
+            for attr, value in (("idVendor", "0b05"), ("idProduct", "1bf2")):
+                with open(os.path.join(dev, attr), 'w') as f:
+                    f.write(value + "\n")
+        elif not attached and os.path.isdir(dev):
+            shutil.rmtree(dev)
+        self.env["BENCH_KEYBOARD"] = "1" if attached else "0"
+
+    def calls(self):
+        with open(self.log, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def cleanup(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def _changes_after(calls, t0):
+    return [c for c in calls if c["start"] >= t0 and not c["query"]]
+
+
+def bench_cli(sandbox, runs, noop):
+    latencies, spawns = [], []
+    attached = True
+    wall0 = time.monotonic()
+    for _ in range(runs):
+        if not noop:
+            attached = not attached
+            sandbox.set_keyboard(attached)
+        before = len(sandbox.calls())
+        t0 = time.monotonic()
+        subprocess.run([CLI], env=sandbox.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        t_exit = time.monotonic()
+        calls = sandbox.calls()[before:]
+        changes = _changes_after(calls, t0)
+        # Latence = konec poslední změny displeje, bez změny = doběhnutí skriptu
+        latencies.append((max(c["end"] for c in changes) if changes else t_exit) - t0)
+        # +1 za samotný asus-check-keyboard-user (bash -> exec python3)
+        spawns.append(len(calls) + 1)
+    return summarize(latencies, spawns, time.monotonic() - wall0)
+
+
+class Agent:
+    """asus-user-agent.py na privátní session sběrnici, stdout čte vlákno."""
+
+    DONE_MARK = "Aplikace dokon"
+
+    def __init__(self, sandbox, timeout=10.0):
+        self.sandbox = sandbox
+        self.dbus = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+                                     stdout=subprocess.PIPE, text=True)
+        address = self.dbus.stdout.readline().strip()
+        self.env = dict(sandbox.env, DBUS_SESSION_BUS_ADDRESS=address)
+        self.done = []
+        self.cond = threading.Condition()
+        self.proc = subprocess.Popen([sys.executable, "-u", AGENT], env=self.env,
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        threading.Thread(target=self._reader, daemon=True).start()
+        try:
+            self._wait_ready(address, timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    def _wait_ready(self, address, timeout):
+        # Vlastní spojení - SessionBus() by vrátil sdílenou sběrnici z prvního běhu
+        from pydbus import connect
+        self.bus = connect(address)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"agent skončil (exit {self.proc.returncode})")
+            if self.bus.dbus.NameHasOwner("org.asus.ScreenToggle"):
+                self.proxy = self.bus.get("org.asus.ScreenToggle")
+                return
+            time.sleep(0.05)
+        raise RuntimeError("agent se nepřihlásil na D-Bus")
+
+    def _reader(self):
+        for line in self.proc.stdout:
+            if self.DONE_MARK in line:
+                with self.cond:
+                    self.done.append(time.monotonic())
+                    self.cond.notify_all()
+
+    def wait_done(self, count, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while len(self.done) < count:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return None
+                self.cond.wait(left)
+            return self.done[count - 1]
+
+    def settle(self, quiet=0.5):
+        """Počká, až agent přestane hlásit dokončené aplikace."""
+        seen = -1
+        while seen != len(self.done):
+            seen = len(self.done)
+            time.sleep(quiet)
+
+    def close(self):
+        for proc in (self.proc, self.dbus):
+            try:
+                proc.terminate()
+                proc.wait(timeout=3)
+            except Exception:
+                proc.kill()
+
+
+def bench_agent(sandbox, runs, storm_size):
+    results = {}
+    agent = Agent(sandbox)
+    try:
+        agent.settle()
+
+        def measure(send, expect_change):
+            latencies, spawns = [], []
+            wall0 = time.monotonic()
+            for i in range(runs):
+                count = len(agent.done)
+                before = len(sandbox.calls())
+                t0 = time.monotonic()
+                send(i)
+                t_done = agent.wait_done(count + 1)
+                if t_done is None:
+                    continue
+                calls = sandbox.calls()[before:]
+                changes = _changes_after(calls, t0)
+                end = max(c["end"] for c in changes) if (changes and expect_change) else t_done
+                latencies.append(max(end, t_done) - t0)
+                spawns.append(len(calls))
+            return summarize(latencies, spawns, time.monotonic() - wall0)
+
+        modes = ("enforce-desktop", "automatic-enabled")
+        results["agent-dbus"] = measure(lambda i: agent.proxy.SetMode(modes[i % 2]), True)
+        agent.proxy.SetMode("automatic-enabled")
+        agent.settle()
+        results["agent-signal"] = measure(lambda i: agent.proc.send_signal(signal.SIGUSR1), False)
+
+        agent.settle()
+        latencies, spawns, failed = [], [], 0
+        wall0 = time.monotonic()
+        for _ in range(runs):
+            before = len(sandbox.calls())
+            t0 = time.monotonic()
+            ok, result, plan, duration_ms = agent.proxy.TriggerAndWait("Bench", 5000)
+            latencies.append(time.monotonic() - t0)
+            spawns.append(len(sandbox.calls()) - before)
+            failed += 0 if ok else 1
+        results["agent-wait"] = summarize(latencies, spawns, time.monotonic() - wall0, {"failed": failed})
+
+        agent.settle()
+        count = len(agent.done)
+        before = len(sandbox.calls())
+        t0 = time.monotonic()
+        for _ in range(storm_size):
+            agent.proc.send_signal(signal.SIGUSR1)
+        agent.wait_done(count + 1)
+        agent.settle()
+        wall = (agent.done[-1] if len(agent.done) > count else time.monotonic()) - t0
+        results["agent-storm"] = summarize([wall], [len(sandbox.calls()) - before], wall,
+                                           {"triggers": storm_size, "applies": len(agent.done) - count})
+    finally:
+        agent.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trigger -> applied latency benchmark")
+    parser.add_argument("--sessions", default=",".join(SESSIONS), help="comma separated: x11,kde,wlr")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--storm", type=int, default=20, help="SIGUSR1 burst size")
+    parser.add_argument("--delay-scale", type=float, default=1.0, help="multiply stand-in tool delays")
+    parser.add_argument("--no-agent", action="store_true", help="skip agent scenarios")
+    parser.add_argument("--json", metavar="PATH", help="write machine-readable results ('-' = stdout)")
+    args = parser.parse_args()
+
+    report = {"timestamp": time.time(), "runs": args.runs, "delay_scale": args.delay_scale, "sessions": {}}
+    for session in args.sessions.split(","):
+        sandbox = Sandbox(session, args.delay_scale)
+        results = {}
+        try:
+            results["cli-detach"] = bench_cli(sandbox, args.runs, noop=False)
+            results["cli-noop"] = bench_cli(sandbox, args.runs, noop=True)
+            if not args.no_agent:
+                sandbox.set_keyboard(True)
+                try:
+                    results.update(bench_agent(sandbox, args.runs, args.storm))
+                except Exception as e:
+                    results["agent"] = {"skipped": str(e)}
+        finally:
+            sandbox.cleanup()
+        report["sessions"][session] = results
+
+    for session, results in report["sessions"].items():
+        print(f"== {session}")
+        for scenario, r in results.items():
+            if "skipped" in r:
+                print(f"  {scenario:<13} přeskočeno: {r['skipped']}")
+                continue
+            extra = f"  applies {r['applies']}/{r['triggers']}" if "applies" in r else ""
+            print(f"  {scenario:<13} p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  "
+                  f"spawns {r['spawns_per_trigger']}  wall {r['wall_s']} s{extra}")
+
+    if args.json:
+        data = json.dumps(report, indent=2)
+        if args.json == "-":
+            print(data)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(data + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
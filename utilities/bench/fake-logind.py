@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# Zástupná služba org.freedesktop.login1 pro zkoušení výčtu sezení
+# (asus_screen_toggle.sessions, SESSION_SOURCE=logind) bez skutečného logind.
+# Běží na sběrnici z DBUS_SYSTEM_BUS_ADDRESS (typicky privátní dbus-daemon),
+# sezení čte z JSON souboru; SIGHUP soubor znovu načte a rozdíl ohlásí
+# signály SessionNew / SessionRemoved.
+#
+#   dbus-daemon --session --nofork --print-address=1 &   # -> adresa
+#   DBUS_SYSTEM_BUS_ADDRESS=<adresa> utilities/bench/fake-logind.py sessions.json &
+#   DBUS_SYSTEM_BUS_ADDRESS=<adresa> PYTHONPATH=usr/lib/asus-screen-toggle \
+#       python3 -m asus_screen_toggle.sessions --shell
+#
+# sessions.json: [{"id": "2", "uid": 1000, "name": "alice", "type": "x11",
+#                  "desktop": "XFCE", "state": "active", "display": ":0"}, ...]
+import json
+import os
+import signal
+import sys
+
+from gi.repository import GLib
+from pydbus import connect
+from pydbus.generic import signal as dbus_signal
+
+NAME = "org.freedesktop.login1"
+PATH = "/org/freedesktop/login1"
+
+
+def session_path(sid):
+    return f"{PATH}/session/_{sid}"
+
+
+class FakeSession:
+    """
+    <node>
+      <interface name="org.freedesktop.login1.Session">
+        <property name="Id" type="s" access="read"/>
+        <property name="Name" type="s" access="read"/>
+        <property name="User" type="(uo)" access="read"/>
+        <property name="Type" type="s" access="read"/>
+        <property name="Desktop" type="s" access="read"/>
+        <property name="State" type="s" access="read"/>
+        <property name="RuntimePath" type="s" access="read"/>
+        <property name="Display" type="s" access="read"/>
+        <property name="Seat" type="(so)" access="read"/>
+      </interface>
+    </node>
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def Id(self): return str(self.data["id"])
+    @property
+    def Name(self): return self.data.get("name", "")
+    @property
+    def User(self):
+        uid = int(self.data.get("uid", 1000))
+        return (uid, f"{PATH}/user/_{uid}")
+    @property
+    def Type(self): return self.data.get("type", "tty")
+    @property
+    def Desktop(self): return self.data.get("desktop", "")
+    @property
+    def State(self): return self.data.get("state", "active")
+    @property
+    def RuntimePath(self): return self.data.get("runtime_path", f"/run/user/{self.User[0]}")
+    @property
+    def Display(self): return self.data.get("display", "")
+    @property
+    def Seat(self):
+        seat = self.data.get("seat", "seat0")
+        return (seat, f"{PATH}/seat/{seat}")
+
+
+class FakeManager:
+    """
+    <node>
+      <interface name="org.freedesktop.login1.Manager">
+        <method name="ListSessions">
+          <arg type="a(susso)" name="sessions" direction="out"/>
+        </method>
+        <signal name="SessionNew">
+          <arg type="s" name="session_id"/>
+          <arg type="o" name="object_path"/>
+        </signal>
+        <signal name="SessionRemoved">
+          <arg type="s" name="session_id"/>
+          <arg type="o" name="object_path"/>
+        </signal>
+      </interface>
+    </node>
+    """
+    SessionNew = dbus_signal()
+    SessionRemoved = dbus_signal()
+
+    def __init__(self, bus, path):
+        self.bus = bus
+        self.path = path
+        self.sessions = {}
+        self.registrations = {}
+
+    def ListSessions(self):
+        return [(s.Id, s.User[0], s.Name, s.Seat[0], session_path(s.Id)) for s in self.sessions.values()]
+
+    def load(self, announce=True):
+        with open(self.path, 'r') as f:
+            wanted = {str(item["id"]): item for item in json.load(f)}
+        for sid in list(self.sessions):
+            if sid not in wanted:
+                del self.sessions[sid]
+                self.registrations.pop(sid).unregister()
+                if announce:
+                    self.SessionRemoved(sid, session_path(sid))
+        for sid, data in wanted.items():
+            if sid in self.sessions:
+                self.sessions[sid].data = data
+                continue
+            session = FakeSession(data)
+            self.sessions[sid] = session
+            self.registrations[sid] = self.bus.register_object(session_path(sid), session, None)
+            if announce:
+                self.SessionNew(sid, session_path(sid))
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(f"použití: {sys.argv[0]} sessions.json", file=sys.stderr)
+        return 2
+    address = os.environ.get("DBUS_SYSTEM_BUS_ADDRESS")
+    if not address:
+        print("DBUS_SYSTEM_BUS_ADDRESS není nastaven", file=sys.stderr)
+        return 2
+
+    bus = connect(address)
+    manager = FakeManager(bus, sys.argv[1])
+    manager.load(announce=False)
+    bus.register_object(PATH, manager, None)
+    bus.request_name(NAME)
+
+    loop = GLib.MainLoop()
+
+    def reload():
+        manager.load()
+        return GLib.SOURCE_CONTINUE
+
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGHUP, reload)
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGTERM, lambda: loop.quit() or GLib.SOURCE_REMOVE)
+    print("ready", flush=True)
+    loop.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# Zástupný nástroj pro benchmark: bench.py na něj dělá symlinky xrandr,
+# kscreen-doctor, wlr-randr, lsusb a monitor-sensor. Podle jména volání:
+#   - zapíše záznam {tool, argv, start, end, pid} do $BENCH_LOG (JSON řádek),
+#   - počká realistickou dobu (násobeno $BENCH_DELAY_SCALE),
+#   - dotazy zodpoví ze stavu v $BENCH_DISPLAY, změny do něj zapíše.
+import json
+import os
+import sys
+import time
+
+TOOL = os.path.basename(sys.argv[0])
+ARGS = sys.argv[1:]
+
+# (dotaz, změna) v sekundách - řádově jako na skutečném stroji
+DELAYS = {
+    "xrandr": (0.030, 0.120),
+    "kscreen-doctor": (0.150, 0.250),
+    "wlr-randr": (0.015, 0.060),
+    "lsusb": (0.020, 0.020),
+    "monitor-sensor": (0.050, 0.050),
+}
+
+WLR_TRANSFORMS = {"normal": "normal", "left": "90", "inverted": "180", "right": "270"}
+KSCREEN_ROTATIONS = {"normal": 1, "left": 2, "inverted": 4, "right": 8}
+
+
+def load_state():
+    try:
+        with open(os.environ["BENCH_DISPLAY"], 'r') as f:
+            return json.load(f)
+    except (KeyError, OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    path = os.environ.get("BENCH_DISPLAY")
+    if not path:
+        return
+    with open(path + ".tmp", 'w') as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def size(out):
+    w, h = out["width"], out["height"]
+    return (h, w) if out["rotation"] in ("left", "right") else (w, h)
+
+
+def xrandr_query(state):
+    lines = ["Screen 0: minimum 8 x 8, current 2880 x 3600, maximum 32767 x 32767"]
+    for name, out in state.items():
+        geometry = ""
+        if out["enabled"]:
+            w, h = size(out)
+            geometry = f" {w}x{h}+{out['x']}+{out['y']}"
+            if out["rotation"] != "normal":
+                geometry += " " + out["rotation"]
+        lines.append(f"{name} connected{' primary' if name == 'eDP-1' else ''}{geometry} "
+                     "(normal left inverted right x axis y axis) 309mm x 193mm")
+        lines.append(f"   {out['width']}x{out['height']}     60.00{'*' if out['enabled'] else ' '}+  48.00")
+    return "\n".join(lines)
+
+
+def xrandr_apply(state, args):
+    current = None
+    it = iter(args)
+    for arg in it:
+        if arg == "--output":
+            current = state.setdefault(next(it), {"enabled": False, "rotation": "normal", "x": 0, "y": 0,
+                                                  "width": 2880, "height": 1800})
+        elif current is None:
+            continue
+        elif arg == "--off":
+            current["enabled"] = False
+        elif arg in ("--auto", "--preferred", "--on"):
+            current["enabled"] = True
+        elif arg in ("--rotate", "--transform"):
+            value = next(it)
+            current["rotation"] = {v: k for k, v in WLR_TRANSFORMS.items()}.get(value, value)
+        elif arg == "--pos":
+            x, y = next(it).replace(",", "x").split("x")
+            current["x"], current["y"] = int(x), int(y)
+        elif arg == "--same-as":
+            other = state.get(next(it), {})
+            current["x"], current["y"] = other.get("x", 0), other.get("y", 0)
+        elif arg in ("--above", "--below", "--left-of", "--right-of"):
+            other = state.get(next(it), {"x": 0, "y": 0, "width": 0, "height": 0, "rotation": "normal"})
+            ow, oh = size(other)
+            w, h = size(current)
+            current["x"], current["y"] = {
+                "--above": (other["x"], other["y"] - h), "--below": (other["x"], other["y"] + oh),
+                "--left-of": (other["x"] - w, other["y"]), "--right-of": (other["x"] + ow, other["y"]),
+            }[arg]
+
+
+def wlr_json(state):
+    return json.dumps([{
+        "name": name, "enabled": out["enabled"],
+        "modes": [{"width": out["width"], "height": out["height"], "refresh": 60.0,
+                   "preferred": True, "current": out["enabled"]}],
+        "position": {"x": out["x"], "y": out["y"]},
+        "transform": WLR_TRANSFORMS[out["rotation"]], "scale": 1.0,
+    } for name, out in state.items()])
+
+
+def kscreen_json(state):
+    return json.dumps({"outputs": [{
+        "id": i + 1, "name": name, "connected": True, "enabled": out["enabled"],
+        "rotation": KSCREEN_ROTATIONS[out["rotation"]], "pos": {"x": out["x"], "y": out["y"]},
+        "currentModeId": "1", "modes": [{"id": "1", "size": {"width": out["width"], "height": out["height"]}}],
+        "scale": 1.0,
+    } for i, (name, out) in enumerate(state.items())]})
+
+
+def kscreen_apply(state, args):
+    for arg in args:
+        parts = arg.split(".")
+        if len(parts) < 3 or parts[0] != "output" or parts[1] not in state:
+            continue
+        out = state[parts[1]]
+        if parts[2] == "enable":
+            out["enabled"] = True
+        elif parts[2] == "disable":
+            out["enabled"] = False
+        elif parts[2] == "rotation":
+            out["rotation"] = parts[3]
+        elif parts[2] == "position":
+            out["x"], out["y"] = (int(v) for v in parts[3].split(","))
+
+
+def main():
+    start = time.monotonic()
+    scale = float(os.environ.get("BENCH_DELAY_SCALE", "1"))
+    query_delay, change_delay = DELAYS.get(TOOL, (0, 0))
+    state = load_state()
+    output = ""
+    query = True
+
+    if TOOL == "xrandr":
+        if ARGS and ARGS != ["--query"]:
+            query = False
+            xrandr_apply(state, ARGS)
+        else:
+            output = xrandr_query(state)
+    elif TOOL == "wlr-randr":
+        if ARGS and ARGS != ["--json"]:
+            query = False
+            xrandr_apply(state, ARGS)
+        else:
+            output = wlr_json(state)
+    elif TOOL == "kscreen-doctor":
+        if ARGS in (["-j"], ["--json"]):
+            output = kscreen_json(state)
+        elif ARGS and ARGS != ["-o"]:
+            query = False
+            kscreen_apply(state, ARGS)
+    elif TOOL == "lsusb":
+        if os.environ.get("BENCH_KEYBOARD") == "1":
+            output = "Bus 003 Device 004: ID 0b05:1bf2 ASUSTek Computer, Inc. ASUS Zenbook Duo Keyboard"
+    elif TOOL == "monitor-sensor":
+        output = ("    Waiting for iio-sensor-proxy to appear\n+++ iio-sensor-proxy appeared\n"
+                  "=== Has accelerometer (orientation: normal)")
+
+    time.sleep((query_delay if query else change_delay) * scale)
+    if not query:
+        save_state(state)
+    if output:
+        print(output, flush=True)
+
+    log = os.environ.get("BENCH_LOG")
+    if log:
+        record = {"tool": TOOL, "argv": ARGS, "query": query, "start": start,
+                  "end": time.monotonic(), "pid": os.getpid()}
+        with open(log, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+    if TOOL == "monitor-sensor":
+        # Jako skutečný monitor-sensor běží, dokud ho nic neukončí
+        while True:
+            time.sleep(60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())